@@ -4,22 +4,229 @@ API Gateway Service - Entry point for frontend requests
 """
 
 import os
-from flask import Flask, request, jsonify
+import sys
+import json
+import time
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
 import requests
 from dotenv import load_dotenv
 
+# Shared modules live in backend-foursquare/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tracing import init_tracing, trace_headers
+from common.metrics import init_metrics, CallbackGauge
+from common.serialization import use_orjson
+from common.compression import init_compression
+from common.health import init_health, CachedProbe
+from common.admission import init_admission, admission_headers, remaining_time, PRIORITY_HEADER
+from common.compression import decompress
+from common import service_client
+from response_cache import ResponseCache, CachedResponse, canonical_key
+from capture import init_capture
+from prefetch import Prefetcher, prefetch_requests
+
 # Load environment variables
 load_dotenv()
 
 app = Flask(__name__)
 CORS(app)
+init_tracing(app, "api-gateway")
+init_metrics(app, "api-gateway")
+use_orjson(app)
+init_compression(app)
 
 # Service URLs - would be environment variables in production
 TRIP_PLANNER_URL = os.getenv("TRIP_PLANNER_URL", "http://localhost:6001")
 ROUTER_URL = os.getenv("ROUTER_URL", "http://localhost:6002")
 RECOMMENDATION_URL = os.getenv("RECOMMENDATION_URL", "http://localhost:6003")
 BOOKING_URL = os.getenv("BOOKING_URL", "http://localhost:6004")
+SERVICE_URLS = {
+    "trip-planner": TRIP_PLANNER_URL,
+    "router": ROUTER_URL,
+    "recommendation": RECOMMENDATION_URL,
+    "booking": BOOKING_URL
+}
+
+# Readiness probes every upstream service in parallel; results are cached for
+# HEALTH_CACHE_TTL seconds so frequent polls don't fan out to every service each time
+upstream_probe = CachedProbe(
+    SERVICE_URLS,
+    timeout=float(os.getenv("HEALTH_PROBE_TIMEOUT", 1)),
+    ttl=float(os.getenv("HEALTH_CACHE_TTL", 2))
+)
+init_health(app, "api-gateway", checks={"upstreams": upstream_probe.check})
+
+# Every request gets a deadline REQUEST_TIMEOUT seconds out (or the caller's, if earlier)
+# which is passed upstream so services drop work once the client has given up
+REQUEST_TIMEOUT = float(os.getenv("REQUEST_TIMEOUT", 120))
+init_admission(app, default_timeout=REQUEST_TIMEOUT)
+
+# Capture mode: GATEWAY_CAPTURE=capture.jsonl records anonymized traffic for tools/replay.py
+GATEWAY_CAPTURE = os.getenv("GATEWAY_CAPTURE")
+if GATEWAY_CAPTURE:
+    init_capture(
+        app,
+        GATEWAY_CAPTURE,
+        salt=os.getenv("GATEWAY_CAPTURE_SALT"),
+        capture_bodies=os.getenv("GATEWAY_CAPTURE_BODIES", "0") == "1"
+    )
+
+# Upstream bodies are relayed as received, without decoding and re-encoding the JSON. The
+# client's Accept-Encoding is forwarded, so a compressed upstream body can be passed on as is.
+RELAYED_HEADERS = ("Content-Type", "Content-Encoding", "Content-Length", "ETag", "Vary", "Retry-After")
+RELAY_CHUNK_SIZE = 64 * 1024
+
+def upstream_headers(accept_encoding=None, conditional=True):
+    """Trace context, deadline, priority and content negotiation headers for an upstream call"""
+    headers = admission_headers(trace_headers())
+    headers["Accept-Encoding"] = accept_encoding or request.headers.get("Accept-Encoding", "identity")
+    if conditional and "If-None-Match" in request.headers:
+        headers["If-None-Match"] = request.headers["If-None-Match"]
+    return headers
+
+def upstream_timeout():
+    return remaining_time(REQUEST_TIMEOUT)
+
+def relay(response, on_complete=None):
+    """
+    Stream an upstream response (requested with stream=True) to the client byte for byte.
+    on_complete(body) is called with the decoded body once it has all been sent.
+    """
+    headers = {name: response.headers[name] for name in RELAYED_HEADERS if name in response.headers}
+    body = response.raw.stream(RELAY_CHUNK_SIZE, decode_content=False)
+    if on_complete is not None:
+        body = tee_body(body, response.headers.get("Content-Encoding"), on_complete)
+    relayed = Response(
+        body,
+        status=response.status_code,
+        headers=headers,
+        direct_passthrough=True
+    )
+    relayed.call_on_close(response.close)
+    return relayed, response.status_code
+
+def tee_body(chunks, content_encoding, on_complete):
+    """Pass chunks through, then hand the whole decoded body to on_complete"""
+    received = []
+    for chunk in chunks:
+        received.append(chunk)
+        yield chunk
+    try:
+        on_complete(decompress(b"".join(received), content_encoding))
+    except Exception as e:
+        print(f"Relayed body callback failed: {str(e)}")
+
+# Speculative prefetch (GATEWAY_PREFETCH=1): once a plan is relayed, each day's
+# recommendations, restaurants and hotels are fetched in the background into the response
+# cache, see prefetch.py. It needs the cache, so it turns GATEWAY_CACHE on.
+GATEWAY_PREFETCH = os.getenv("GATEWAY_PREFETCH", "0") == "1"
+PREFETCH_TIMEOUT = float(os.getenv("PREFETCH_TIMEOUT", 60))
+
+# Opt-in response cache (GATEWAY_CACHE=1) for lookups the frontend repeats on re-render.
+# TTLs are per route in seconds, override with e.g. GATEWAY_CACHE_TTLS="recommendations=300,food=0"
+GATEWAY_CACHE = os.getenv("GATEWAY_CACHE", "0") == "1" or GATEWAY_PREFETCH
+CACHE_TTLS = {"recommendations": 600, "food": 600, "accommodation": 120, "transport": 60, "optimize": 300, "legs": 300, "recommendations_batch": 600}
+for rule in os.getenv("GATEWAY_CACHE_TTLS", "").split(","):
+    if "=" in rule:
+        route, ttl = rule.split("=", 1)
+        CACHE_TTLS[route.strip()] = float(ttl)
+CACHE_COORD_PRECISION = int(os.getenv("GATEWAY_CACHE_COORD_PRECISION", 4))
+CACHED_HEADERS = ("Content-Type", "ETag", "Retry-After")
+
+response_cache = ResponseCache(
+    max_entries=int(os.getenv("GATEWAY_CACHE_SIZE", 2000)),
+    max_bytes=int(os.getenv("GATEWAY_CACHE_MAX_MB", 64)) * 1024 * 1024
+)
+CallbackGauge(
+    "horizon_gateway_cache", "Gateway response cache lookups, size and hit ratio", ("stat",),
+    lambda: [({"stat": stat}, value) for stat, value in response_cache.stats().items()]
+)
+
+prefetcher = None
+if GATEWAY_PREFETCH:
+    # Few workers and a bounded queue: prefetching must never crowd out real requests
+    prefetcher = Prefetcher(
+        response_cache,
+        workers=int(os.getenv("PREFETCH_WORKERS", 2)),
+        max_queue=int(os.getenv("PREFETCH_QUEUE", 200))
+    )
+    CallbackGauge(
+        "horizon_gateway_prefetch", "Speculative prefetches queued, fetched, used and wasted", ("stat",),
+        lambda: [({"stat": stat}, value) for stat, value in prefetcher.stats().items()]
+    )
+
+PREFETCH_UPSTREAMS = {"recommendations": RECOMMENDATION_URL, "food": BOOKING_URL, "accommodation": BOOKING_URL}
+
+def cache_fetch(url, data, headers, timeout):
+    """Fetch function for the response cache: one upstream POST, kept decoded"""
+    def fetch():
+        # Stored bodies are decoded, the gateway compresses them for each client on the way out
+        upstream = service_client.post(url, json=data, headers=headers, timeout=timeout)
+        cached_headers = {name: upstream.headers[name] for name in CACHED_HEADERS if name in upstream.headers}
+        return CachedResponse(upstream.status_code, upstream.content, cached_headers)
+    return fetch
+
+def schedule_prefetch(body, preferences):
+    """Queue the lookups a freshly relayed plan is likely to lead to"""
+    trip_plan = json.loads(body)
+    for route, path, data in prefetch_requests(trip_plan, preferences):
+        prefetcher.submit(
+            canonical_key(route, data, CACHE_COORD_PRECISION),
+            cache_fetch(
+                f"{PREFETCH_UPSTREAMS[route]}{path}", data,
+                {"Accept-Encoding": "gzip", PRIORITY_HEADER: "background"}, PREFETCH_TIMEOUT
+            ),
+            CACHE_TTLS.get(route, 0)
+        )
+
+def cached_post(route, url, data):
+    """POST to an upstream service, through the response cache when it is enabled for the route"""
+    ttl = CACHE_TTLS.get(route, 0) if GATEWAY_CACHE else 0
+    if not ttl:
+        return relay(service_client.post(url, json=data, headers=upstream_headers(), timeout=upstream_timeout(), stream=True))
+    
+    if "no-cache" in request.headers.get("Cache-Control", ""):
+        relayed, status_code = relay(service_client.post(url, json=data, headers=upstream_headers(), timeout=upstream_timeout(), stream=True))
+        relayed.headers["X-Cache"] = "BYPASS"
+        return relayed, status_code
+    
+    fetch = cache_fetch(url, data, upstream_headers(accept_encoding="gzip", conditional=False), upstream_timeout())
+    key = canonical_key(route, data, CACHE_COORD_PRECISION)
+    cached, cache_status = response_cache.get_or_fetch(key, fetch, ttl)
+    if cache_status == "HIT" and prefetcher is not None:
+        prefetcher.mark_used(key)
+    response = Response(cached.body, status=cached.status_code, headers=cached.headers)
+    response.headers["X-Cache"] = cache_status
+    if cache_status == "HIT":
+        response.headers["Age"] = str(int(time.monotonic() - cached.created_at))
+    return response
+
+def proxy(service, path, ttl_key=None, on_success=None):
+    """
+    Forward the current request to an upstream service and relay its answer, the same way
+    for every route. GET requests pass their query string on, POST requests their JSON
+    body. With ttl_key, POST answers go through the response cache under that route's TTL
+    (see cached_post). on_success(body) gets the decoded body of a relayed 200 answer.
+    """
+    url = f"{SERVICE_URLS[service]}{path}"
+    try:
+        if request.method == 'GET':
+            response = service_client.get(url, params=request.args.to_dict(), headers=upstream_headers(), timeout=upstream_timeout(), stream=True)
+            return relay(response)
+        
+        data = request.get_json(silent=True)
+        if ttl_key is not None:
+            return cached_post(ttl_key, url, data)
+        
+        response = service_client.post(url, json=data, headers=upstream_headers(), timeout=upstream_timeout(), stream=True)
+        if on_success is not None and response.status_code == 200:
+            return relay(response, on_complete=on_success)
+        return relay(response)
+    except requests.Timeout:
+        return jsonify({"error": "Upstream service did not answer before the request deadline"}), 504
+    except requests.RequestException as e:
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -29,32 +236,73 @@ def health_check():
 @app.route('/api/trip/plan', methods=['POST'])
 def plan_trip():
     """Create a new trip plan based on user requirements"""
-    data = request.json
-    try:
-        response = requests.post(f"{TRIP_PLANNER_URL}/plan", json=data)
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+    if prefetcher is None:
+        return proxy("trip-planner", "/plan")
+    preferences = (request.get_json(silent=True) or {}).get('preferences') or {}
+    return proxy("trip-planner", "/plan", on_success=lambda body: schedule_prefetch(body, preferences))
+
+@app.route('/api/trip/plan/jobs', methods=['POST'])
+def submit_plan_job():
+    """Queue a trip plan and get a job id to poll instead of waiting for it"""
+    return proxy("trip-planner", "/plan/jobs")
+
+@app.route('/api/trip/plan/jobs/<job_id>', methods=['GET'])
+def get_plan_job(job_id):
+    """Status, progress and partial days of a queued trip plan; ?wait=&version= to long-poll"""
+    return proxy("trip-planner", f"/plan/jobs/{job_id}")
+
+@app.route('/api/trip/plan/<plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    """Fetch a saved trip plan"""
+    return proxy("trip-planner", f"/plan/{plan_id}")
+
+@app.route('/api/trip/plan/<plan_id>/replan', methods=['POST'])
+def replan_trip(plan_id):
+    """Re-plan only the affected days of a saved trip"""
+    return proxy("trip-planner", f"/plan/{plan_id}/replan")
+
+@app.route('/api/trip/plan/<plan_id>/budget', methods=['GET'])
+def get_plan_budget(plan_id):
+    """Get the per-day budget ledger of a saved trip"""
+    return proxy("trip-planner", f"/plan/{plan_id}/budget")
+
+@app.route('/api/trip/plan/<plan_id>/budget/items', methods=['POST'])
+def update_budget_item(plan_id):
+    """Set one cost item (and its alternatives) of a saved trip's budget ledger"""
+    return proxy("trip-planner", f"/plan/{plan_id}/budget/items")
+
+@app.route('/api/trip/plan/<plan_id>/budget/repair', methods=['POST'])
+def repair_budget(plan_id):
+    """Swap cheaper alternatives into the over-budget days of a saved trip"""
+    return proxy("trip-planner", f"/plan/{plan_id}/budget/repair")
+
+@app.route('/api/trip/plan/<plan_id>/route', methods=['GET'])
+def get_plan_route(plan_id):
+    """Fetch the optimized route of a plan that was returned before it was ready"""
+    return proxy("trip-planner", f"/plan/{plan_id}/route")
 
 @app.route('/api/trip/optimize', methods=['POST'])
 def optimize_route():
     """Optimize the route for a given trip plan"""
-    data = request.json
-    try:
-        response = requests.post(f"{ROUTER_URL}/optimize", json=data)
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+    # Free-text constraints are parsed by Gemini and silently ignored when that fails,
+    # so those answers aren't cached; structured hints are part of the cache key
+    constraints = (request.get_json(silent=True) or {}).get('constraints')
+    return proxy("router", "/optimize", ttl_key="optimize_constraints" if constraints else "optimize")
+
+@app.route('/api/trip/legs', methods=['POST'])
+def plan_route_legs():
+    """Choose the transportation mode of every leg of an ordered route"""
+    return proxy("router", "/legs", ttl_key="legs")
 
 @app.route('/api/recommendations', methods=['POST'])
 def get_recommendations():
     """Get personalized recommendations for a trip"""
-    data = request.json
-    try:
-        response = requests.post(f"{RECOMMENDATION_URL}/recommend", json=data)
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+    return proxy("recommendation", "/recommend", ttl_key="recommendations")
+
+@app.route('/api/recommendations/batch', methods=['POST'])
+def get_batch_recommendations():
+    """Get personalized recommendations for many locations with shared preferences"""
+    return proxy("recommendation", "/recommend/batch", ttl_key="recommendations_batch")
 
 @app.route('/api/booking/<service_type>', methods=['POST'])
 def booking(service_type):
@@ -63,23 +311,19 @@ def booking(service_type):
     if service_type not in valid_services:
         return jsonify({"error": "Invalid service type"}), 400
     
-    data = request.json
-    try:
-        response = requests.post(f"{BOOKING_URL}/{service_type}", json=data)
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+    return proxy("booking", f"/{service_type}", ttl_key=service_type)
+
+@app.route('/api/booking/transport/calendar', methods=['POST'])
+def transport_fare_calendar():
+    """Get the cheapest fare per day for a date range"""
+    return proxy("booking", "/transport/calendar")
 
 @app.route('/api/chat/message', methods=['POST'])
 def chat_message():
     """Handle chat messages from the frontend"""
-    data = request.json
-    try:
-        response = requests.post(f"{TRIP_PLANNER_URL}/chat", json=data)
-        return jsonify(response.json()), response.status_code
-    except requests.RequestException as e:
-        return jsonify({"error": str(e)}), 500
+    return proxy("trip-planner", "/chat")
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 6000))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server with FLASK_DEBUG=1 for the reloader and debugger; use serve.py in production
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,110 @@
+"""
+backend/api_gateway/capture.py
+Traffic Capture - Records the gateway's requests as anonymized JSONL for tools/replay.py
+
+Set GATEWAY_CAPTURE=/path/to/capture.jsonl to append one line per request:
+    {"time": 1757493000.123, "method": "POST", "path": "/api/recommendations",
+     "route": "/api/recommendations", "priority": null, "request": {...},
+     "status": 200, "latency_ms": 8123.4, "response_bytes": 5321, "x_cache": null}
+Latency is measured until the response headers are ready. With GATEWAY_CAPTURE_BODIES=1
+buffered response bodies are recorded too (relayed upstream bodies are streamed, so only
+their size is known).
+
+Anonymization: user ids become a salted hash (the same user keeps the same pseudonym, so
+sessions can still be replayed in order), contact fields are dropped and email addresses
+or phone numbers in free text are masked. Set GATEWAY_CAPTURE_SALT to keep pseudonyms
+stable across restarts.
+"""
+
+import hashlib
+import json
+import queue
+import re
+import secrets
+import threading
+import time
+
+PSEUDONYM_KEYS = {"user_id", "trip_id", "session_id"}
+REDACTED_KEYS = {"email", "phone", "mobile", "contact", "guest_name", "full_name", "first_name", "last_name", "passport"}
+
+EMAIL_RE = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+PHONE_RE = re.compile(r"(?<!\d)(?:\+?\d{1,3}[\s-]?)?[6-9]\d{9}(?!\d)")
+
+
+def anonymize(value, salt, key=None):
+    if isinstance(value, dict):
+        return {k: anonymize(v, salt, k) for k, v in value.items() if k not in REDACTED_KEYS}
+    if isinstance(value, list):
+        return [anonymize(item, salt) for item in value]
+    if key in PSEUDONYM_KEYS and value is not None:
+        return "anon-" + hashlib.sha256(f"{salt}:{value}".encode("utf-8")).hexdigest()[:16]
+    if isinstance(value, str):
+        return PHONE_RE.sub("<phone>", EMAIL_RE.sub("<email>", value))
+    return value
+
+
+class CaptureWriter:
+    """Appends records from a background thread so requests never wait on disk"""
+
+    def __init__(self, path):
+        self.path = path
+        self.queue = queue.Queue(maxsize=10000)
+        self.thread = threading.Thread(target=self.run, name="capture-writer", daemon=True)
+        self.thread.start()
+
+    def write(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass  # Drop records rather than slow the gateway down
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                with open(self.path, "a") as f:
+                    for record in batch:
+                        f.write(json.dumps(record, ensure_ascii=False) + "\n")
+            except OSError as e:
+                print(f"Capture write failed: {str(e)}")
+
+
+def init_capture(app, path, salt=None, capture_bodies=False):
+    """Record every /api request handled by the gateway to path"""
+    from flask import g, request
+
+    salt = salt or secrets.token_hex(16)
+    writer = CaptureWriter(path)
+
+    @app.before_request
+    def start_capture():
+        g.capture_started = time.perf_counter()
+
+    @app.after_request
+    def capture_request(response):
+        started = g.pop("capture_started", None)
+        if started is None or not request.path.startswith("/api/"):
+            return response
+
+        record = {
+            "time": time.time(),
+            "method": request.method,
+            "path": request.path,
+            "route": request.url_rule.rule if request.url_rule is not None else None,
+            "priority": request.headers.get("X-Priority"),
+            "request": anonymize(request.get_json(silent=True), salt),
+            "status": response.status_code,
+            "latency_ms": round((time.perf_counter() - started) * 1000, 1),
+            "response_bytes": response.content_length,
+            "content_encoding": response.headers.get("Content-Encoding"),
+            "x_cache": response.headers.get("X-Cache")
+        }
+        if capture_bodies and not response.direct_passthrough and not record["content_encoding"]:
+            record["response"] = anonymize(response.get_json(silent=True), salt)
+        writer.write(record)
+        return response
\ No newline at end of file
@@ -0,0 +1,147 @@
+"""
+backend/api_gateway/prefetch.py
+Prefetch - Warms the gateway response cache with the lookups a new plan leads to
+
+After a plan is returned the user opens hotels, restaurants and things to do for each
+day. With GATEWAY_PREFETCH=1 the gateway queues those requests for each day's primary
+(first) location as soon as the plan has been relayed. A few worker threads send them
+upstream with X-Priority: background, so they wait behind interactive traffic. The
+answers go into the response cache under the key the same request from the client
+would have, and that request is then a cache hit.
+
+Prefetched bodies, so clients can send the same ones:
+    /api/recommendations        {"location": {name, lat, lng}, "preferences": <plan preferences>}
+    /api/booking/food           {"location": {name, lat, lng}}
+    /api/booking/accommodation  {"location": {name, lat, lng}, "check_in": ..., "check_out": ...}
+Accommodation is only prefetched when the plan request has preferences.start_date
+("2025-10-01"), from which day N stays the night of start_date + N - 1.
+
+Every prefetched entry is counted once: as used when a client request hits it or joins
+the prefetch while it is still in flight, or as wasted when it expires or is evicted first.
+"""
+
+import datetime
+import queue
+import threading
+import time
+
+
+def day_locations(trip_plan):
+    """(day number, primary location) of every day with a location"""
+    primaries = []
+    for day in trip_plan.get('days', []):
+        locations = [location for location in day.get('locations', []) if 'lat' in location and 'lng' in location]
+        if locations:
+            location = locations[0]
+            primaries.append((day.get('day'), {"name": location.get('name', ''), "lat": location['lat'], "lng": location['lng']}))
+    return primaries
+
+
+def prefetch_requests(trip_plan, preferences):
+    """(route, upstream path, body) of the lookups a plan is likely to lead to"""
+    start_date = None
+    if preferences.get('start_date'):
+        try:
+            start_date = datetime.date.fromisoformat(preferences['start_date'])
+        except (TypeError, ValueError):
+            pass
+
+    prefetches = []
+    for number, location in day_locations(trip_plan):
+        prefetches.append(("recommendations", "/recommend", {"location": location, "preferences": preferences}))
+        prefetches.append(("food", "/food", {"location": location}))
+        if start_date is not None and isinstance(number, int):
+            check_in = start_date + datetime.timedelta(days=number - 1)
+            prefetches.append(("accommodation", "/accommodation", {
+                "location": location,
+                "check_in": check_in.isoformat(),
+                "check_out": (check_in + datetime.timedelta(days=1)).isoformat()
+            }))
+    return prefetches
+
+
+class Prefetcher:
+    def __init__(self, cache, workers=2, max_queue=200):
+        self.cache = cache
+        self.jobs = queue.Queue(maxsize=max_queue)
+        self.pending_use = {}  # cache key -> monotonic time the prefetched entry expires
+        self.in_flight = {}  # cache key -> whether a client request has joined the prefetch
+        self.lock = threading.Lock()
+        self.counters = {"queued": 0, "dropped": 0, "already_cached": 0, "fetched": 0, "failed": 0, "used": 0, "wasted": 0}
+        for i in range(workers):
+            threading.Thread(target=self.run, name=f"prefetch-{i}", daemon=True).start()
+
+    def count(self, counter, amount=1):
+        with self.lock:
+            self.counters[counter] += amount
+
+    def submit(self, key, fetch, ttl):
+        """Queue a fetch for a cache key; dropped when the queue is full"""
+        try:
+            self.jobs.put_nowait((key, fetch, ttl))
+            self.count("queued")
+        except queue.Full:
+            self.count("dropped")
+
+    def run(self):
+        while True:
+            key, fetch, ttl = self.jobs.get()
+            try:
+                if self.cache.contains(key):
+                    self.count("already_cached")
+                    continue
+                with self.lock:
+                    self.in_flight[key] = False
+                try:
+                    response, status = self.cache.get_or_fetch(key, fetch, ttl)
+                finally:
+                    with self.lock:
+                        joined = self.in_flight.pop(key)
+                if status != "MISS":
+                    # A client request fetched it first, the entry isn't the prefetch's
+                    self.count("already_cached")
+                    continue
+                if response.status_code != 200:
+                    self.count("failed")
+                    continue
+                with self.lock:
+                    self.counters["fetched"] += 1
+                    if joined:
+                        self.counters["used"] += 1
+                    else:
+                        self.pending_use[key] = time.monotonic() + ttl
+            except Exception as e:
+                print(f"Prefetch failed: {str(e)}")
+                self.count("failed")
+
+    def mark_used(self, key):
+        """
+        Called on cache hits: the first hit of a prefetched entry counts as used. A hit
+        that joined a prefetch still in flight is counted once that prefetch has finished.
+        """
+        with self.lock:
+            if self.pending_use.pop(key, None) is not None:
+                self.counters["used"] += 1
+            elif key in self.in_flight:
+                self.in_flight[key] = True
+
+    def expire(self):
+        """Count prefetched entries that expired or were evicted unused as wasted"""
+        now = time.monotonic()
+        with self.lock:
+            keys = list(self.pending_use.items())
+        wasted = [key for key, expires_at in keys if expires_at <= now or not self.cache.contains(key)]
+        with self.lock:
+            for key in wasted:
+                if self.pending_use.pop(key, None) is not None:
+                    self.counters["wasted"] += 1
+
+    def stats(self):
+        self.expire()
+        with self.lock:
+            counters = dict(self.counters)
+            counters["waiting"] = self.jobs.qsize()
+            counters["unused"] = len(self.pending_use)
+        settled = counters["used"] + counters["wasted"]
+        counters["hit_ratio"] = round(counters["used"] / settled, 3) if settled else 0.0
+        return counters
@@ -0,0 +1,148 @@
+"""
+backend/api_gateway/response_cache.py
+Response Cache - Gateway cache for repeated POST bodies
+
+The frontend fires identical /api/recommendations and /api/booking/* requests on every
+re-render. Bodies are canonicalized before hashing so requests that only differ in key
+order, coordinate noise or the order of preference lists share one entry:
+- dict keys are sorted
+- lat/lng values are rounded to `coord_precision` decimals (4 decimals is about 11 m)
+- the set-like preference lists in SET_KEYS (interests, amenities, cuisine, dietary) are
+  trimmed, lowercased, deduplicated and sorted; every other list keeps its order and
+  case, since precedence pairs, route stops or transport modes mean something else
+  when reordered or recased
+Concurrent identical requests are collapsed into a single upstream call. A request that
+joined one counts as a hit only when the shared answer is a 200 that gets cached;
+otherwise it is labelled COLLAPSED and counted apart, so errors never lift the hit ratio.
+"""
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+
+COORDINATE_KEYS = {"lat", "lng", "lon", "latitude", "longitude"}
+SET_KEYS = {"interests", "amenities", "cuisine", "dietary"}
+
+
+def canonicalize(value, coord_precision=4, key=None):
+    if isinstance(value, dict):
+        return {k: canonicalize(v, coord_precision, k) for k, v in sorted(value.items())}
+    if isinstance(value, list):
+        if key in SET_KEYS and all(isinstance(item, str) for item in value):
+            return sorted({item.strip().lower() for item in value})
+        return [canonicalize(item, coord_precision) for item in value]
+    if isinstance(value, float) and key in COORDINATE_KEYS:
+        return round(value, coord_precision)
+    return value
+
+
+def canonical_key(route, body, coord_precision=4):
+    """Cache key of a request body for a route"""
+    canonical = json.dumps(canonicalize(body, coord_precision), sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return route + ":" + hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CachedResponse:
+    def __init__(self, status_code, body, headers):
+        self.status_code = status_code
+        self.body = body  # bytes
+        self.headers = headers  # Upstream headers worth relaying, e.g. Content-Type, Retry-After
+        self.created_at = time.monotonic()
+        self.expires_at = None
+
+
+class InflightFetch:
+    def __init__(self):
+        self.done = threading.Event()
+        self.response = None
+        self.error = None
+
+
+class ResponseCache:
+    def __init__(self, max_entries=2000, max_bytes=64 * 1024 * 1024):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.size = 0
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "collapsed": 0, "collapsed_errors": 0, "evictions": 0}
+
+    def get_or_fetch(self, key, fetch, ttl):
+        """
+        Return (CachedResponse, cache status) for key, calling fetch() on a miss.
+        Only 200 responses are stored; errors from fetch propagate and are not cached.
+        Status is HIT, MISS, or COLLAPSED for a request that shared a non-200 answer.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                if entry.expires_at > time.monotonic():
+                    self.entries.move_to_end(key)
+                    self.counters["hits"] += 1
+                    return entry, "HIT"
+                self.remove(key)
+
+            pending = self.inflight.get(key)
+            if pending is not None:
+                owner = False
+            else:
+                pending = self.inflight[key] = InflightFetch()
+                self.counters["misses"] += 1
+                owner = True
+
+        if not owner:
+            pending.done.wait()
+            shared_hit = pending.error is None and pending.response.status_code == 200
+            with self.lock:
+                self.counters["collapsed" if shared_hit else "collapsed_errors"] += 1
+            if pending.error is not None:
+                raise pending.error
+            return pending.response, "HIT" if shared_hit else "COLLAPSED"
+
+        try:
+            pending.response = fetch()
+            if pending.response.status_code == 200:
+                self.store(key, pending.response, ttl)
+        except Exception as e:
+            pending.error = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            pending.done.set()
+
+        return pending.response, "MISS"
+
+    def contains(self, key):
+        """Whether a fresh entry exists for key, without counting a lookup"""
+        with self.lock:
+            entry = self.entries.get(key)
+            return entry is not None and entry.expires_at > time.monotonic()
+
+    def store(self, key, response, ttl):
+        with self.lock:
+            if key in self.entries:
+                self.remove(key)
+            response.expires_at = time.monotonic() + ttl
+            self.entries[key] = response
+            self.size += len(response.body)
+            while self.entries and (len(self.entries) > self.max_entries or self.size > self.max_bytes):
+                self.remove(next(iter(self.entries)))
+                self.counters["evictions"] += 1
+
+    def remove(self, key):
+        # Caller holds the lock
+        entry = self.entries.pop(key)
+        self.size -= len(entry.body)
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            counters["entries"] = len(self.entries)
+            counters["bytes"] = self.size
+        lookups = counters["hits"] + counters["misses"] + counters["collapsed"] + counters["collapsed_errors"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["collapsed"]) / lookups, 3) if lookups else 0.0
+        return counters
\ No newline at end of file
@@ -0,0 +1,140 @@
+"""
+backend/benchmarks/bench_endpoints.py
+Per-endpoint overhead of every service with the fake model backend (common/llm.py),
+i.e. request parsing, prompt building, response parsing, caching, routing and encoding,
+excluding time spent inside the model
+
+Usage: python benchmarks/bench_endpoints.py [iterations] [--latency-scale 0.01]
+
+Requests go through each app's Flask test client, so there is no socket or gateway hop.
+Inputs are varied per iteration (city, dates, guests) so the booking caches are not
+always warm. Model time is subtracted per request; with --latency-scale above 0 the fake
+model also sleeps, which is subtracted as well but makes the run slower.
+/plan is run with ROUTER_URL pointing at a closed port, so its route request fails at once
+and the plan is returned without routes.
+"""
+
+import argparse
+import os
+import sys
+import time
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+
+os.environ["MODEL_BACKEND"] = "fake"
+os.environ.setdefault("FAKE_LLM_LATENCY_SCALE", "0")
+os.environ.setdefault("TRIP_STORE_URL", "memory://")
+os.environ.setdefault("ROUTER_URL", "http://127.0.0.1:9")
+
+CITIES = [
+    {"name": "Delhi", "lat": 28.6139, "lng": 77.209},
+    {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873},
+    {"name": "Agra", "lat": 27.1767, "lng": 78.0081},
+    {"name": "Udaipur", "lat": 24.5854, "lng": 73.7125},
+    {"name": "Mumbai", "lat": 19.076, "lng": 72.8777},
+]
+
+
+def city(i, offset=0):
+    return CITIES[(i + offset) % len(CITIES)]
+
+
+def date(i):
+    return f"2025-10-{1 + i % 28:02d}"
+
+
+def stops(i, count):
+    center = city(i)
+    return [
+        {"name": f"Stop {n}", "lat": center["lat"] + 0.01 * ((n * 7 + i) % 11), "lng": center["lng"] + 0.01 * ((n * 3 + i) % 13)}
+        for n in range(count)
+    ]
+
+
+CASES = [
+    ("trip_planner", "POST /plan", "/plan", lambda i: {
+        "query": f"Plan a 3-day trip to {city(i)['name']}",
+        "preferences": {"budget": 20000 + i, "duration": 3, "interests": ["history", "food"]}
+    }),
+    ("trip_planner", "POST /chat", "/chat", lambda i: {
+        "message": f"What should I see in {city(i)['name']}?",
+        "conversation_history": [
+            {"role": "user", "content": "Hi"},
+            {"role": "assistant", "content": "Hello! Where would you like to go?"}
+        ]
+    }),
+    ("recommendation", "POST /recommend", "/recommend", lambda i: {
+        "location": city(i),
+        "preferences": {"interests": ["history", "food"], "budget": "medium"},
+        "trip_context": {"duration": 1 + i % 5}
+    }),
+    ("booking", "POST /accommodation", "/accommodation", lambda i: {
+        "location": city(i),
+        "check_in": date(i),
+        "check_out": date(i + 2),
+        "guests": {"adults": 1 + i % 3, "children": 0},
+        "preferences": {"type": "hotel", "budget": "medium"}
+    }),
+    ("booking", "POST /food", "/food", lambda i: {
+        "location": city(i),
+        "date": date(i),
+        "time": "19:30",
+        "guests": 1 + i % 4,
+        "preferences": {"cuisine": ["Indian"], "budget": "medium"}
+    }),
+    ("booking", "POST /transport", "/transport", lambda i: {
+        "origin": city(i),
+        "destination": city(i, 1),
+        "date": date(i),
+        "passengers": 1 + i % 3
+    }),
+    ("router", "POST /optimize (5 stops)", "/optimize", lambda i: {"locations": stops(i, 5), "mode": "car"}),
+    ("router", "POST /optimize (12 stops)", "/optimize", lambda i: {"locations": stops(i, 12), "mode": "car"}),
+]
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Per-endpoint overhead excluding model time")
+    parser.add_argument("iterations", type=int, nargs="?", default=200)
+    parser.add_argument("--latency-scale", type=float, help="Fake model latency multiplier (default 0)")
+    args = parser.parse_args()
+    if args.latency_scale is not None:
+        os.environ["FAKE_LLM_LATENCY_SCALE"] = str(args.latency_scale)
+
+    from common import llm
+    from monolith import load_service
+
+    clients = {}
+    for service, _, _, _ in CASES:
+        if service not in clients:
+            clients[service] = load_service(service).app.test_client()
+
+    print(f"{'endpoint':28s} {'status':>8s} {'llm calls':>9s} {'p50 ms':>8s} {'p95 ms':>8s} {'mean ms':>8s}")
+    for service, name, path, payload in CASES:
+        client = clients[service]
+        client.post(path, json=payload(0))  # Warm up imports and lazy state
+
+        overheads = []
+        statuses = set()
+        llm_calls = 0
+        for i in range(args.iterations):
+            body = payload(i)
+            model_calls, model_seconds = llm.fake_model_time["calls"], llm.fake_model_time["seconds"]
+            started = time.perf_counter()
+            response = client.post(path, json=body)
+            elapsed = time.perf_counter() - started
+            statuses.add(response.status_code)
+            llm_calls += llm.fake_model_time["calls"] - model_calls
+            overheads.append((elapsed - (llm.fake_model_time["seconds"] - model_seconds)) * 1000)
+
+        overheads.sort()
+        status = ",".join(str(code) for code in sorted(statuses))
+        print(f"{name:28s} {status:>8s} {llm_calls / args.iterations:9.2f} {percentile(overheads, 50):8.2f} "
+              f"{percentile(overheads, 95):8.2f} {sum(overheads) / len(overheads):8.2f}")
+    print()
+    print("llm calls = model calls per request; 0 means the answer came from a cache or a fallback")
\ No newline at end of file
@@ -0,0 +1,62 @@
+"""
+backend/benchmarks/bench_geo.py
+Compares common.geo against constructing geopy great_circle objects per call
+
+Usage: python benchmarks/bench_geo.py [points]
+"""
+
+import os
+import random
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common import geo
+
+try:
+    from geopy.distance import great_circle
+except ImportError:
+    great_circle = None
+
+
+def report(name, seconds, calls):
+    print(f"{name:40s} {seconds / calls * 1e6:9.3f} us/distance")
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    rng = random.Random(42)
+    # Points spread over India, like a large itinerary
+    locations = [{"lat": rng.uniform(8, 35), "lng": rng.uniform(68, 97)} for _ in range(n)]
+    pairs = n * n
+
+    if great_circle is not None:
+        seconds = min(timeit.repeat(
+            lambda: [[great_circle((p["lat"], p["lng"]), (q["lat"], q["lng"])).kilometers for q in locations] for p in locations],
+            number=1, repeat=3))
+        report("geopy great_circle (per call)", seconds, pairs)
+    else:
+        print("geopy not installed, skipping the baseline")
+
+    seconds = min(timeit.repeat(
+        lambda: [[geo.haversine_km(p["lat"], p["lng"], q["lat"], q["lng"]) for q in locations] for p in locations],
+        number=1, repeat=3))
+    report("geo.haversine_km (scalar)", seconds, pairs)
+
+    points = [geo.GeoPoint.from_location(location) for location in locations]
+    seconds = min(timeit.repeat(
+        lambda: [[p.distance_to(q) for q in points] for p in points],
+        number=1, repeat=3))
+    report("geo.GeoPoint.distance_to (precomputed)", seconds, pairs)
+
+    if geo.load_numpy() is not None:
+        for dtype in ("float64", "float32"):
+            seconds = min(timeit.repeat(lambda: geo.distance_matrix(locations, dtype), number=5, repeat=3)) / 5
+            report(f"geo.distance_matrix ({dtype})", seconds, pairs)
+
+        # Accuracy of the float32 mode against float64
+        error = abs(geo.distance_matrix(locations, "float32") - geo.distance_matrix(locations, "float64")).max()
+        print(f"max float32 error: {error:.4f} km")
+    else:
+        print("numpy not installed, skipping the array benchmarks")
@@ -0,0 +1,153 @@
+"""
+backend/benchmarks/bench_hops.py
+Inter-service hop overhead: the same gateway requests against the five services running
+as separate HTTP processes, then against monolith.py where they call each other in-process
+
+Usage: python benchmarks/bench_hops.py [iterations]
+
+Both stacks run with the fake model answering instantly (MODEL_BACKEND=fake), so the
+difference between the two columns is what the HTTP hops behind the gateway cost:
+gateway -> trip_planner -> router for /api/trip/plan, one hop for the others.
+Requests are sent one at a time over HTTP to the gateway in both modes.
+"""
+
+import os
+import subprocess
+import sys
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+# Ports away from the defaults, so a development stack can keep running
+SERVICE_PORTS = {"api_gateway": 6100, "trip_planner": 6101, "router": 6102, "recommendation": 6103, "booking": 6104}
+MONOLITH_PORT = 6110
+
+RUN_APP = "import os, app; app.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"
+
+STOPS = [
+    {"name": "Amber Fort", "lat": 26.9855, "lng": 75.8513},
+    {"name": "Hawa Mahal", "lat": 26.9239, "lng": 75.8267},
+    {"name": "City Palace", "lat": 26.9258, "lng": 75.8237},
+    {"name": "Jantar Mantar", "lat": 26.9248, "lng": 75.8246},
+    {"name": "Nahargarh Fort", "lat": 26.9373, "lng": 75.8155},
+]
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+
+CASES = [
+    ("POST /api/trip/plan", "/api/trip/plan", lambda i: {
+        "query": f"Plan a {2 + i % 3}-day trip to Jaipur", "preferences": {"duration": 2 + i % 3}
+    }),
+    ("POST /api/trip/optimize", "/api/trip/optimize", lambda i: {"locations": STOPS[i % 3:] + STOPS[:i % 3]}),
+    ("POST /api/recommendations", "/api/recommendations", lambda i: {
+        "location": JAIPUR, "preferences": {"interests": ["history"]}, "trip_context": {"duration": 1 + i % 4}
+    }),
+    ("POST /api/booking/transport", "/api/booking/transport", lambda i: {
+        "origin": DELHI, "destination": JAIPUR, "date": f"2025-10-{1 + i % 28:02d}"
+    }),
+]
+
+
+def stack_env(**extra):
+    env = dict(os.environ)
+    env.update({"MODEL_BACKEND": "fake", "FAKE_LLM_LATENCY_SCALE": "0", "TRIP_STORE_URL": "memory://", "GATEWAY_CACHE": "0"})
+    env.update(extra)
+    return env
+
+
+def wait_until_live(port, processes, timeout=60):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                return
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop(processes)
+    raise RuntimeError(f"Nothing answering on port {port}")
+
+
+def start_microservices():
+    urls = {
+        "TRIP_PLANNER_URL": f"http://127.0.0.1:{SERVICE_PORTS['trip_planner']}",
+        "ROUTER_URL": f"http://127.0.0.1:{SERVICE_PORTS['router']}",
+        "RECOMMENDATION_URL": f"http://127.0.0.1:{SERVICE_PORTS['recommendation']}",
+        "BOOKING_URL": f"http://127.0.0.1:{SERVICE_PORTS['booking']}",
+    }
+    processes = [
+        subprocess.Popen(
+            [sys.executable, "-c", RUN_APP],
+            cwd=os.path.join(BACKEND_DIR, service),
+            env=stack_env(PORT=str(port), **urls),
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        for service, port in SERVICE_PORTS.items()
+    ]
+    for port in SERVICE_PORTS.values():
+        wait_until_live(port, processes)
+    return processes, SERVICE_PORTS["api_gateway"]
+
+
+def start_monolith():
+    processes = [subprocess.Popen(
+        [sys.executable, "monolith.py"],
+        cwd=BACKEND_DIR,
+        env=stack_env(PORT=str(MONOLITH_PORT)),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )]
+    wait_until_live(MONOLITH_PORT, processes)
+    return processes, MONOLITH_PORT
+
+
+def stop(processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def measure(port, iterations):
+    """{case: sorted latencies in ms}"""
+    session = requests.Session()
+    results = {}
+    for name, path, payload in CASES:
+        session.post(f"http://127.0.0.1:{port}{path}", json=payload(0))  # Warm up
+        latencies = []
+        for i in range(iterations):
+            started = time.perf_counter()
+            response = session.post(f"http://127.0.0.1:{port}{path}", json=payload(i))
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code != 200:
+                raise RuntimeError(f"{name} answered {response.status_code}: {response.text[:200]}")
+        results[name] = sorted(latencies)
+    return results
+
+
+def percentile(sorted_values, p):
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+
+    report = {}
+    for mode, start in (("http", start_microservices), ("monolith", start_monolith)):
+        processes, port = start()
+        try:
+            report[mode] = measure(port, iterations)
+        finally:
+            stop(processes)
+
+    print(f"{'endpoint':30s} {'http p50':>9s} {'mono p50':>9s} {'http p95':>9s} {'mono p95':>9s} {'saved p50':>10s}")
+    for name, _, _ in CASES:
+        http, mono = report["http"][name], report["monolith"][name]
+        print(f"{name:30s} {percentile(http, 50):9.2f} {percentile(mono, 50):9.2f} "
+              f"{percentile(http, 95):9.2f} {percentile(mono, 95):9.2f} {percentile(http, 50) - percentile(mono, 50):10.2f}")
+    print()
+    print("Latencies in ms, model time excluded (the fake model answers instantly)")
\ No newline at end of file
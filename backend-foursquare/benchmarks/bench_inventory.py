@@ -0,0 +1,35 @@
+"""
+backend/benchmarks/bench_inventory.py
+Measures the per-request CPU cost of the booking service's fallback inventory
+
+Usage: python benchmarks/bench_inventory.py [iterations]
+"""
+
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'booking'))
+
+import inventory
+
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+
+CASES = {
+    "accommodation": lambda: inventory.generate_fallback_accommodations(DELHI, "medium", 3, 1, "2025-09-10"),
+    "train": lambda: inventory.generate_train_options(DELHI, JAIPUR, "2025-09-10", 2),
+    "bus": lambda: inventory.generate_bus_options(DELHI, JAIPUR, "2025-09-10", 2),
+    "flight": lambda: inventory.generate_flight_options(DELHI, JAIPUR, "2025-09-10", 2),
+    "food": lambda: inventory.generate_fallback_restaurants(DELHI, "medium", 2, "2025-09-10"),
+}
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+
+    for name, case in CASES.items():
+        # Identical requests must produce identical options
+        assert case() == case(), f"{name} is not deterministic"
+        seconds = min(timeit.repeat(case, number=iterations, repeat=3))
+        print(f"{name:15s} {seconds / iterations * 1e6:8.1f} us/request")
@@ -0,0 +1,103 @@
+"""
+backend/benchmarks/bench_payloads.py
+Payload size and serialization cost of typical responses, before and after compact
+orjson encoding, gzip/brotli compression and the gateway's pass-through relay
+
+Usage: python benchmarks/bench_payloads.py [iterations]
+"""
+
+import gzip
+import json
+import os
+import sys
+import timeit
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'booking'))
+
+import inventory
+from common import compression
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+
+
+def itinerary(days=7, stops=5):
+    """An itinerary shaped like the trip planner's Gemini output"""
+    return {
+        "plan_id": "0f8fad5b-d9cb-469f-a165-70867728950e",
+        "title": f"{days}-day Rajasthan heritage trip",
+        "summary": "Forts, palaces and local food across Rajasthan's heritage cities. " * 3,
+        "total_budget": 45000,
+        "days": [
+            {
+                "day": day,
+                "title": f"Day {day} in Jaipur",
+                "locations": [
+                    {
+                        "name": f"Stop {day}-{stop}",
+                        "lat": 26.9124 + day * 0.01 + stop * 0.001,
+                        "lng": 75.7873 + day * 0.01 + stop * 0.001,
+                        "description": "A landmark known for its architecture, history and views over the old city. " * 2,
+                        "duration": "2 hours",
+                        "cost": 500 + stop * 100,
+                        "tips": ["Go early to avoid crowds", "Carry water", "Hire a licensed guide"]
+                    }
+                    for stop in range(stops)
+                ],
+                "meals": [{"type": meal, "suggestion": "Dal baati churma at a local dhaba", "cost": 300} for meal in ("breakfast", "lunch", "dinner")],
+                "accommodation": {"name": "Heritage Haveli", "cost": 3500},
+                "transport": {"mode": "car", "cost": 1500}
+            }
+            for day in range(1, days + 1)
+        ]
+    }
+
+
+PAYLOADS = {
+    "itinerary (7 days)": itinerary(),
+    "accommodation": {"accommodation_options": inventory.generate_fallback_accommodations(DELHI, "medium", 3, 1, "2025-09-10")},
+    "transport (all modes)": {"options": (
+        inventory.generate_train_options(DELHI, JAIPUR, "2025-09-10", 2)
+        + inventory.generate_bus_options(DELHI, JAIPUR, "2025-09-10", 2)
+        + inventory.generate_flight_options(DELHI, JAIPUR, "2025-09-10", 2)
+    )},
+    "food": {"restaurant_options": inventory.generate_fallback_restaurants(DELHI, "medium", 2, "2025-09-10")},
+}
+
+
+def per_call_us(fn, iterations):
+    return min(timeit.repeat(fn, number=iterations, repeat=3)) / iterations * 1e6
+
+
+if __name__ == '__main__':
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+
+    print("Sizes in bytes")
+    print(f"{'payload':24s} {'pretty':>8s} {'compact':>8s} {'gzip':>8s} {'brotli':>8s}")
+    for name, payload in PAYLOADS.items():
+        # Flask's jsonify indents with 2 spaces in debug mode, which is how the services run
+        pretty = json.dumps(payload, indent=2, sort_keys=True).encode()
+        compact = json.dumps(payload, separators=(",", ":"), sort_keys=True, ensure_ascii=False).encode()
+        gzipped = len(compression.compress(compact, "gzip"))
+        brotlied = len(compression.compress(compact, "br")) if compression.brotli is not None else "-"
+        print(f"{name:24s} {len(pretty):8d} {len(compact):8d} {gzipped:8d} {brotlied:>8}")
+
+    print()
+    print("Time per response in microseconds")
+    print(f"{'payload':24s} {'json':>8s} {'orjson':>8s} {'gzip':>8s} {'relay':>8s}")
+    for name, payload in PAYLOADS.items():
+        compact = json.dumps(payload, separators=(",", ":"), sort_keys=True).encode()
+        encode_json = per_call_us(lambda: json.dumps(payload, separators=(",", ":"), sort_keys=True).encode(), iterations)
+        encode_orjson = per_call_us(lambda: orjson.dumps(payload, option=orjson.OPT_SORT_KEYS), iterations) if orjson else float("nan")
+        gzip_time = per_call_us(lambda: gzip.compress(compact, compresslevel=6), iterations)
+        # What the gateway used to do with every upstream body: response.json() + jsonify
+        reencode = per_call_us(lambda: json.dumps(json.loads(compact), separators=(",", ":"), sort_keys=True).encode(), iterations)
+        print(f"{name:24s} {encode_json:8.1f} {encode_orjson:8.1f} {gzip_time:8.1f} {reencode:8.1f}")
+    print()
+    print("relay = decode + re-encode an upstream body, the work the gateway's pass-through skips")
\ No newline at end of file
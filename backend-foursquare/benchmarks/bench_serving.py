@@ -0,0 +1,166 @@
+"""
+backend/benchmarks/bench_serving.py
+Requests/second and latency of one service under the development server and under the
+production servers of serve.py, with the fake model standing in for Gemini
+
+Usage:
+    python benchmarks/bench_serving.py                                 # /recommend, 64 clients, 20s each
+    python benchmarks/bench_serving.py --service booking --clients 128 --latency-scale 0
+    python benchmarks/bench_serving.py --only gunicorn-gthread waitress
+
+Each server is started in turn on the same port and driven by --clients closed-loop
+clients for --duration seconds. The fake model sleeps for its per-prompt latency times
+--latency-scale (0.05 puts /recommend around 0.6s), which is the I/O-bound load the
+services see with Gemini. Admission limits are raised so they don't cap the comparison.
+Servers that aren't installed are skipped.
+"""
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+
+import requests
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+PORT = 6120
+
+CASES = {
+    "recommendation": ("/recommend", lambda i: {
+        "location": {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873 + (i % 50) * 0.001},
+        "preferences": {"interests": ["history", "food"]}
+    }),
+    "booking": ("/transport", lambda i: {
+        "origin": {"name": "Delhi", "lat": 28.6139, "lng": 77.209},
+        "destination": {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873},
+        "date": f"2025-10-{1 + i % 28:02d}"
+    }),
+    "router": ("/optimize", lambda i: {"locations": [
+        {"name": f"Stop {n}", "lat": 26.9 + ((n * 7 + i) % 11) * 0.01, "lng": 75.8 + ((n * 3 + i) % 13) * 0.01}
+        for n in range(8)
+    ]}),
+}
+
+# name -> (module that must be importable, command)
+SERVERS = {
+    "app.py (debug)": (None, lambda service: [sys.executable, os.path.join(service, "app.py")]),
+    "dev": (None, lambda service: [sys.executable, "serve.py", service, "--server", "dev"]),
+    "gunicorn-gthread": ("gunicorn", lambda service: [sys.executable, "serve.py", service, "--server", "gunicorn"]),
+    "gunicorn-gevent": ("gevent", lambda service: [sys.executable, "serve.py", service, "--server", "gunicorn", "--worker-class", "gevent"]),
+    "waitress": ("waitress", lambda service: [sys.executable, "serve.py", service, "--server", "waitress"]),
+}
+
+
+def installed(module):
+    if module is None:
+        return True
+    try:
+        __import__(module)
+        return True
+    except ImportError:
+        return False
+
+
+def start(command, latency_scale):
+    env = dict(os.environ)
+    env.pop("GOOGLE_API_KEY", None)
+    env.update({
+        "PORT": str(PORT),
+        "FLASK_DEBUG": "1",  # Only read by app.py: the old default
+        "MODEL_BACKEND": "fake",
+        "FAKE_LLM_LATENCY_SCALE": str(latency_scale),
+        "TRIP_STORE_URL": "memory://",
+        "RECOMMEND_CONCURRENCY": "10000", "RECOMMEND_QUEUE": "10000",
+        "ACCOMMODATION_CONCURRENCY": "10000", "FOOD_CONCURRENCY": "10000",
+    })
+    process = subprocess.Popen(
+        command, cwd=BACKEND_DIR, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        try:
+            if requests.get(f"http://127.0.0.1:{PORT}/health/live", timeout=1).status_code == 200:
+                return process
+        except requests.RequestException:
+            pass
+        time.sleep(0.2)
+    stop(process)
+    raise RuntimeError(f"{' '.join(command)} did not start")
+
+
+def stop(process):
+    # The whole process group, so the debug reloader's child goes too
+    os.killpg(process.pid, signal.SIGTERM)
+    try:
+        process.wait(timeout=30)
+    except subprocess.TimeoutExpired:
+        os.killpg(process.pid, signal.SIGKILL)
+        process.wait()
+
+
+def load(path, payload, clients, duration):
+    """Closed-loop load; returns (latencies in seconds, errors)"""
+    latencies, errors = [], [0]
+    lock = threading.Lock()
+    stop_at = time.monotonic() + duration
+
+    def client(offset):
+        session = requests.Session()
+        i = offset
+        while time.monotonic() < stop_at:
+            started = time.monotonic()
+            try:
+                ok = session.post(f"http://127.0.0.1:{PORT}{path}", json=payload(i), timeout=60).status_code == 200
+            except requests.RequestException:
+                ok = False
+            with lock:
+                if ok:
+                    latencies.append(time.monotonic() - started)
+                else:
+                    errors[0] += 1
+            i += clients
+
+    threads = [threading.Thread(target=client, args=(n,)) for n in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sorted(latencies), errors[0]
+
+
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return float("nan")
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Dev server vs production servers")
+    parser.add_argument("--service", choices=sorted(CASES), default="recommendation")
+    parser.add_argument("--clients", type=int, default=64)
+    parser.add_argument("--duration", type=float, default=20)
+    parser.add_argument("--latency-scale", type=float, default=0.05)
+    parser.add_argument("--only", nargs="*", choices=sorted(SERVERS), help="Servers to run, default all installed")
+    args = parser.parse_args()
+
+    path, payload = CASES[args.service]
+    print(f"{args.service} {path}, {args.clients} clients, {args.duration:.0f}s per server, latency scale {args.latency_scale}")
+    print(f"{'server':18s} {'req/s':>8s} {'p50 ms':>8s} {'p95 ms':>8s} {'p99 ms':>8s} {'errors':>7s}")
+    for name, (module, command) in SERVERS.items():
+        if args.only and name not in args.only:
+            continue
+        if not installed(module):
+            print(f"{name:18s} skipped, {module} is not installed")
+            continue
+        process = start(command(args.service), args.latency_scale)
+        try:
+            load(path, payload, min(args.clients, 8), 2)  # Warm up
+            latencies, errors = load(path, payload, args.clients, args.duration)
+        finally:
+            stop(process)
+        print(f"{name:18s} {len(latencies) / args.duration:8.1f} {percentile(latencies, 50) * 1000:8.1f} "
+              f"{percentile(latencies, 95) * 1000:8.1f} {percentile(latencies, 99) * 1000:8.1f} {errors:7d}")
\ No newline at end of file
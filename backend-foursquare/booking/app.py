@@ -4,41 +4,151 @@ Booking Service - Handles all booking related operations
 """
 
 import os
+import sys
 import json
 from datetime import datetime, timedelta
-import random
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
 import requests
 
+# Shared modules live in backend-foursquare/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tracing import init_tracing, span
+from common.metrics import init_metrics, track_llm, count_fallback, CallbackGauge
+from common.serialization import use_orjson
+from common.compression import init_compression
+from common.health import init_health, executor_queue_depth
+from common.admission import AdmissionController, init_admission
+from common.llm import LazyModel, start_prewarm
+from inventory import generate_fallback_accommodations, generate_fallback_restaurants, location_key
+from inventory_cache import InventoryCache
+from providers import IRCTCProvider, RedBusProvider, MakeMyTripProvider, search_transport, fare_calendar, provider_executor, request_executor
+
 # Load environment variables
 load_dotenv()
 
 # Initialize the Flask application
 app = Flask(__name__)
 CORS(app)
+init_tracing(app, "booking")
+init_metrics(app, "booking")
+use_orjson(app)
+init_compression(app)
 
-# Initialize Gemini AI with API key
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("No GOOGLE_API_KEY found in environment variables")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(model_name="gemini-2.5-pro")
+# Gemini model, or the offline stand-in with MODEL_BACKEND=fake (see common/llm.py).
+# Created on first use so startup stays fast; start_prewarm does it ahead of traffic.
+model = LazyModel()
 
 # External API URLs (mock for now)
 MAKEMYTRIP_API = os.getenv("MAKEMYTRIP_API", "https://api.makemytrip.com")
 IRCTC_API = os.getenv("IRCTC_API", "https://api.irctc.co.in")
 REDBUS_API = os.getenv("REDBUS_API", "https://api.redbus.in")
 
+# Availability cache: static content (hotel catalogs) lives for hours, volatile data
+# (room rates, fares, seats) only for minutes. Hot entries are refreshed in the background,
+# at most INVENTORY_REFRESH_BUDGET per pass. Fallback fares served because a live provider
+# failed are kept for PROVIDER_FALLBACK_TTL seconds (0 to not cache them).
+STATIC_TTL = float(os.getenv("INVENTORY_STATIC_TTL", 6 * 3600))
+FARE_TTL = float(os.getenv("INVENTORY_FARE_TTL", 120))
+FALLBACK_FARE_TTL = float(os.getenv("PROVIDER_FALLBACK_TTL", 10))
+inventory_cache = InventoryCache(
+    max_entries=int(os.getenv("INVENTORY_CACHE_SIZE", 5000)),
+    refresh_budget=int(os.getenv("INVENTORY_REFRESH_BUDGET", 10))
+)
+inventory_cache.start_refresher()
+
+CallbackGauge(
+    "horizon_inventory_cache", "Inventory cache lookups, size and hit ratio", ("stat",),
+    lambda: [({"stat": stat}, value) for stat, value in inventory_cache.stats().items()]
+)
+
+# One adapter per transport mode; each gets its own deadline in multi-mode searches.
+# LIVE_PROVIDERS lists the modes whose real provider API is called (e.g. "train,bus" or "all"),
+# the others are served from the fallback inventory. PROVIDER_HEDGE_AFTER sends a duplicate
+# request when a provider hasn't answered after that many seconds.
+PROVIDER_TIMEOUT = float(os.getenv("PROVIDER_TIMEOUT", 5))
+PROVIDER_HEDGE_AFTER = float(os.getenv("PROVIDER_HEDGE_AFTER", 0)) or None
+LIVE_PROVIDERS = [mode.strip() for mode in os.getenv("LIVE_PROVIDERS", "").split(",") if mode.strip()]
+
+def provider_options(mode):
+    return {
+        "timeout": PROVIDER_TIMEOUT,
+        "live": "all" in LIVE_PROVIDERS or mode in LIVE_PROVIDERS,
+        "hedge_after": PROVIDER_HEDGE_AFTER,
+        "cache": inventory_cache,
+        "fare_ttl": FARE_TTL,
+        "fallback_ttl": FALLBACK_FARE_TTL
+    }
+
+TRANSPORT_PROVIDERS = {
+    "train": IRCTCProvider(IRCTC_API, **provider_options("train")),
+    "bus": RedBusProvider(REDBUS_API, **provider_options("bus")),
+    "flight": MakeMyTripProvider(MAKEMYTRIP_API, **provider_options("flight"))
+}
+
+CIRCUIT_STATES = {"closed": 0, "half-open": 1, "open": 2}
+CallbackGauge(
+    "horizon_provider_circuit", "Circuit breaker state (0 closed, 1 half-open, 2 open), error rate and fallbacks per provider",
+    ("provider", "stat"),
+    lambda: [
+        ({"provider": provider.name, "stat": stat}, value)
+        for provider in TRANSPORT_PROVIDERS.values()
+        for stat, value in (
+            ("state", CIRCUIT_STATES[provider.breaker.state]),
+            ("error_rate", provider.breaker.error_rate()),
+            ("fallbacks", provider.fallbacks)
+        )
+    ]
+)
+
+init_health(
+    app, "booking", queue_depth=executor_queue_depth(provider_executor, request_executor),
+    checks={"model": start_prewarm(model)}
+)
+
+# Admission control for the Gemini-bound endpoints: at most *_CONCURRENCY requests run at
+# once, up to *_QUEUE more wait for a slot, the rest get 503 with Retry-After
+init_admission(app)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+accommodation_admission = AdmissionController(
+    "accommodation", int(os.getenv("ACCOMMODATION_CONCURRENCY", 8)), int(os.getenv("ACCOMMODATION_QUEUE", 32)), ADMISSION_QUEUE_TIMEOUT
+)
+food_admission = AdmissionController(
+    "food", int(os.getenv("FOOD_CONCURRENCY", 8)), int(os.getenv("FOOD_QUEUE", 32)), ADMISSION_QUEUE_TIMEOUT
+)
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "booking"})
 
+@app.route('/providers/stats', methods=['GET'])
+def provider_stats():
+    """Circuit breaker state, error rate and latency histogram of each transport provider"""
+    return jsonify({mode: provider.stats() for mode, provider in TRANSPORT_PROVIDERS.items()})
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Hit ratio and size of the inventory cache"""
+    return jsonify(inventory_cache.stats())
+
+def conditional_jsonify(payload):
+    """
+    jsonify with an ETag, answering 304 Not Modified when the client sends
+    If-None-Match with the ETag of an identical earlier response
+    """
+    response = jsonify(payload)
+    response.add_etag()
+    etag, _ = response.get_etag()
+    # Weak comparison, since compressed responses carry the ETag as a weak one
+    if request.if_none_match.contains_weak(etag):
+        response = app.response_class(status=304)
+        response.set_etag(etag)
+    return response
+
 @app.route('/accommodation', methods=['POST'])
+@accommodation_admission.admit()
 def book_accommodation():
     """
     Book accommodation
@@ -91,23 +201,23 @@ def book_accommodation():
             "accommodation_options": accommodation_options
         }
         
-        return jsonify(response), 200
+        return conditional_jsonify(response)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 def generate_accommodation_options(location, check_in, check_out, guests, rooms, preferences):
     """
-    Generate accommodation options using Gemini
+    Generate accommodation options using Gemini.
+    The hotel catalog (names, descriptions, amenities) is static and cached for hours per
+    location and preferences, without prices. Nightly rates for the requested stay are
+    volatile: they are cached briefly and asked for again once they expire.
     """
     # Extract preferences
     accom_type = preferences.get('type', 'hotel')
     budget = preferences.get('budget', 'medium')
     amenities = preferences.get('amenities', [])
     
-    # Build preference strings
-    amenities_str = ', '.join(amenities) if amenities else 'no specific amenities'
-    
     # Calculate number of nights
     try:
         check_in_date = datetime.strptime(check_in, "%Y-%m-%d")
@@ -116,15 +226,48 @@ def generate_accommodation_options(location, check_in, check_out, guests, rooms,
     except:
         nights = 1  # Default if date parsing fails
     
+    party_size = guests.get('adults', 1) + guests.get('children', 0)
+    catalog_key = ("accommodation", location_key(location), accom_type, budget, tuple(sorted(amenities)))
+    rates_key = ("accommodation_rates", catalog_key, check_in, check_out, party_size, rooms)
+    
+    # The catalog prompt also answers with prices. They are used when the catalog was
+    # loaded for this very rates load, and never cached with the catalog.
+    catalog_rates = {}
+    
+    def load_catalog():
+        catalog = load_accommodation_catalog(location, accom_type, budget, amenities)
+        catalog_rates["rates"] = {hotel.get("name"): hotel.get("price_per_night") for hotel in catalog}
+        return [{field: value for field, value in hotel.items() if field != "price_per_night"} for hotel in catalog]
+    
+    def load_rates():
+        catalog_rates.clear()
+        catalog = inventory_cache.get_or_load(catalog_key, load_catalog, STATIC_TTL, admission=accommodation_admission)
+        rates = catalog_rates.pop("rates", None)
+        if rates is None:
+            rates = load_accommodation_rates(location, catalog, check_in, check_out, party_size, rooms, budget)
+        return price_accommodations(catalog, rates, check_in, check_out, nights, rooms)
+    
+    try:
+        return inventory_cache.get_or_load(rates_key, load_rates, FARE_TTL, admission=accommodation_admission)
+    
+    except Exception as e:
+        # If JSON parsing fails, return a simple fallback response
+        print(f"Accommodation generation failed: {str(e)}")
+        count_fallback("accommodation")
+        return generate_fallback_accommodations(location, budget, nights, rooms, check_in)
+
+def load_accommodation_catalog(location, accom_type, budget, amenities):
+    """
+    Ask Gemini for the accommodations at a location. The prices in the answer only hold
+    for the stay being asked about; the catalog is cached without them.
+    """
+    # Build preference strings
+    amenities_str = ', '.join(amenities) if amenities else 'no specific amenities'
+    
     prompt = f"""
     You are a travel booking expert. I need recommendations for {accom_type} accommodations in {location['name']} (coordinates: {location['lat']}, {location['lng']}).
     
     Here are the details:
-    - Check-in: {check_in}
-    - Check-out: {check_out} ({nights} nights)
-    - Number of adults: {guests.get('adults', 1)}
-    - Number of children: {guests.get('children', 0)}
-    - Number of rooms: {rooms}
     - Budget level: {budget}
     - Desired amenities: {amenities_str}
     
@@ -141,10 +284,9 @@ def generate_accommodation_options(location, check_in, check_out, guests, rooms,
         "lng": longitude,
         "rating": rating_out_of_5,
         "price_per_night": price_in_INR,
-        "total_price": total_price_for_stay,
         "amenities": ["amenity1", "amenity2", ...],
         "image_query": "search query to find image",
-        "cancellation_policy": "Free cancellation until [date]"
+        "free_cancellation_days": days_before_check_in_with_free_cancellation
       }}
     ]
     ```
@@ -152,7 +294,7 @@ def generate_accommodation_options(location, check_in, check_out, guests, rooms,
     Ensure all options have realistic latitude and longitude coordinates close to the location specified. The prices should be in Indian Rupees (INR) and should reflect the {budget} budget level. Each option should have at least 3-5 amenities listed.
     """
     
-    try:
+    with span("llm.generate_content", prompt="accommodation"), track_llm("accommodation") as llm_call:
         response = model.generate_content(
             prompt,
             generation_config={
@@ -162,105 +304,102 @@ def generate_accommodation_options(location, check_in, check_out, guests, rooms,
                 "max_output_tokens": 8192,
             }
         )
-        
-        # Extract the JSON response from Gemini
-        json_start = response.text.find('```json') + 7
-        if json_start < 7:  # If no ```json marker is found
-            json_start = response.text.find('[')
-            json_end = response.text.rfind(']') + 1
-        else:
-            json_end = response.text.find('```', json_start)
-        
-        json_str = response.text[json_start:json_end].strip()
-        accommodation_options = json.loads(json_str)
-        
-        # Add booking information
-        for option in accommodation_options:
-            option["check_in"] = check_in
-            option["check_out"] = check_out
-            option["rooms"] = rooms
-            option["availability"] = "Available"
-            
-            # Add a mock booking URL
-            hotel_name_slug = option["name"].lower().replace(' ', '-')
-            option["booking_url"] = f"https://www.makemytrip.com/hotels/{hotel_name_slug}"
-        
-        return accommodation_options
-    
-    except Exception as e:
-        # If JSON parsing fails, return a simple fallback response
-        print(f"Accommodation generation failed: {str(e)}")
-        return generate_fallback_accommodations(location, budget, nights, rooms)
+        llm_call.record(response)
+    
+    # Extract the JSON response from Gemini
+    json_start = response.text.find('```json') + 7
+    if json_start < 7:  # If no ```json marker is found
+        json_start = response.text.find('[')
+        json_end = response.text.rfind(']') + 1
+    else:
+        json_end = response.text.find('```', json_start)
+    
+    json_str = response.text[json_start:json_end].strip()
+    with span("parse.accommodation"):
+        return json.loads(json_str)
 
-def generate_fallback_accommodations(location, budget, nights, rooms):
-    """
-    Generate fallback accommodation options when Gemini fails
-    """
-    # Set price ranges based on budget
-    if budget == "low":
-        price_range = (1000, 3000)
-    elif budget == "high":
-        price_range = (8000, 20000)
-    else:  # medium
-        price_range = (3000, 8000)
-    
-    # Generic accommodation types
-    accommodation_types = [
-        {"name": f"Hotel {location['name']} Palace", "type": "hotel"},
-        {"name": f"{location['name']} Grand Resort", "type": "resort"},
-        {"name": f"{location['name']} Luxury Suites", "type": "hotel"},
-        {"name": f"Budget Stay {location['name']}", "type": "hostel"},
-        {"name": f"{location['name']} Apartment Rental", "type": "apartment"}
-    ]
+def load_accommodation_rates(location, catalog, check_in, check_out, party_size, rooms, budget):
+    """Ask Gemini for the current nightly rate of each cached accommodation for a stay"""
+    hotels_str = "\n".join(f"    {i + 1}. {hotel['name']}" for i, hotel in enumerate(catalog))
     
-    # Common amenities
-    all_amenities = [
-        "Free WiFi", "Breakfast included", "Swimming pool", "Air conditioning",
-        "Room service", "Gym", "Spa", "Restaurant", "Bar", "Parking",
-        "24-hour front desk", "Airport shuttle", "Laundry service"
-    ]
+    prompt = f"""
+    You are a hotel rates expert. I need current nightly rates for a stay in {location['name']} (coordinates: {location['lat']}, {location['lng']}) at these accommodations:
     
-    accommodations = []
+{hotels_str}
     
-    for i in range(min(5, len(accommodation_types))):
-        # Generate a random price within the budget range
-        price_per_night = random.randint(price_range[0], price_range[1])
-        total_price = price_per_night * nights * rooms
-        
-        # Random coordinates near the location
-        lat_offset = (random.random() - 0.5) * 0.05
-        lng_offset = (random.random() - 0.5) * 0.05
-        
-        # Random amenities (3-5)
-        num_amenities = random.randint(3, 5)
-        amenities = random.sample(all_amenities, num_amenities)
-        
-        # Random rating (3-5 stars)
-        rating = round(random.uniform(3.0, 5.0), 1)
-        
-        # Cancellation date (2 days before check-in)
-        cancellation_date = (datetime.now() + timedelta(days=random.randint(1, 5))).strftime("%Y-%m-%d")
-        
-        accommodation = {
-            "name": accommodation_types[i]["name"],
-            "type": accommodation_types[i]["type"],
-            "description": f"A comfortable {accommodation_types[i]['type']} in {location['name']} with {amenities[0].lower()} and {amenities[1].lower()}.",
-            "address": f"{random.randint(1, 100)} Main Street, {location['name']}",
-            "lat": location["lat"] + lat_offset,
-            "lng": location["lng"] + lng_offset,
-            "rating": rating,
-            "price_per_night": price_per_night,
-            "total_price": total_price,
-            "amenities": amenities,
-            "image_query": f"{accommodation_types[i]['name']} exterior",
-            "cancellation_policy": f"Free cancellation until {cancellation_date}",
-            "availability": "Available",
-            "booking_url": f"https://www.makemytrip.com/hotels/{accommodation_types[i]['name'].lower().replace(' ', '-')}"
-        }
-        
-        accommodations.append(accommodation)
+    Here are the details:
+    - Check-in: {check_in}
+    - Check-out: {check_out}
+    - Guests: {party_size}
+    - Rooms: {rooms}
+    - Budget level: {budget}
     
-    return accommodations
+    Format your response as a JSON object mapping each accommodation name to its price per night in Indian Rupees (INR):
+    
+    ```json
+    {{
+      "Accommodation name": price_in_INR
+    }}
+    ```
+    """
+    
+    with span("llm.generate_content", prompt="accommodation_rates"), track_llm("accommodation_rates") as llm_call:
+        response = model.generate_content(
+            prompt,
+            generation_config={
+                "temperature": 0.2,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            }
+        )
+        llm_call.record(response)
+    
+    json_start = response.text.find('{')
+    json_end = response.text.rfind('}') + 1
+    with span("parse.accommodation_rates"):
+        rates = json.loads(response.text[json_start:json_end])
+    if not isinstance(rates, dict):
+        raise ValueError("Accommodation rates are not a JSON object")
+    return rates
+
+def price_accommodations(catalog, rates, check_in, check_out, nights, rooms):
+    """
+    Add stay-specific prices and booking information to the cached catalog. rates maps
+    accommodation names to nightly prices; accommodations without a rate are left out.
+    """
+    accommodation_options = []
+    
+    for hotel in catalog:
+        try:
+            price_per_night = int(rates[hotel["name"]])
+        except (KeyError, TypeError, ValueError):
+            continue
+        
+        option = dict(hotel)
+        option["price_per_night"] = price_per_night
+        option["total_price"] = price_per_night * nights * rooms
+        option["check_in"] = check_in
+        option["check_out"] = check_out
+        option["rooms"] = rooms
+        option["availability"] = "Available"
+        
+        try:
+            cancellation_days = int(option.pop("free_cancellation_days", 2))
+            cancellation_date = datetime.strptime(check_in, "%Y-%m-%d") - timedelta(days=cancellation_days)
+            option["cancellation_policy"] = f"Free cancellation until {cancellation_date.strftime('%Y-%m-%d')}"
+        except (TypeError, ValueError):
+            option["cancellation_policy"] = "Free cancellation until 2 days before check-in"
+        
+        # Add a mock booking URL
+        hotel_name_slug = option["name"].lower().replace(' ', '-')
+        option["booking_url"] = f"https://www.makemytrip.com/hotels/{hotel_name_slug}"
+        
+        accommodation_options.append(option)
+    
+    if not accommodation_options:
+        raise ValueError("No accommodation rates for the stay")
+    return accommodation_options
 
 @app.route('/transport', methods=['POST'])
 def book_transport():
@@ -280,9 +419,14 @@ def book_transport():
         },
         "date": "2025-09-10",
         "passengers": 2,
-        "mode": "train",  // train, bus, flight
-        "class": "AC Chair Car"  // Optional, for trains
+        "mode": "train",  // train, bus, flight, a list like ["train", "bus"], or "all"
+        "class": "AC Chair Car",  // Optional, for trains
+        "sort_by": "price"  // Optional, for multiple modes: price, duration or departure
     }
+    
+    With several modes the providers are searched concurrently and the response has
+    the merged "options" plus a per-provider "providers" status. Providers that miss
+    their deadline are skipped and the response is marked "partial".
     """
     data = request.json
     origin = data.get('origin', {})
@@ -291,23 +435,28 @@ def book_transport():
     passengers = data.get('passengers', 1)
     mode = data.get('mode', 'train')
     travel_class = data.get('class')
+    sort_by = data.get('sort_by', 'price')
     
     if not origin or not destination or not date:
         return jsonify({"error": "Origin, destination, and date are required"}), 400
     
+    if mode == "all":
+        modes = list(TRANSPORT_PROVIDERS)
+    elif isinstance(mode, list):
+        modes = mode
+    else:
+        modes = None
+    
     try:
-        # In a real implementation, you would call external APIs for transportation options
-        # For now, we'll generate realistic options based on the mode of transport
+        if modes is not None:
+            return search_transport_modes(origin, destination, date, passengers, modes, travel_class, sort_by)
         
-        if mode == "train":
-            options = generate_train_options(origin, destination, date, passengers, travel_class)
-        elif mode == "bus":
-            options = generate_bus_options(origin, destination, date, passengers)
-        elif mode == "flight":
-            options = generate_flight_options(origin, destination, date, passengers)
-        else:
+        provider = TRANSPORT_PROVIDERS.get(mode)
+        if provider is None:
             return jsonify({"error": f"Unsupported transport mode: {mode}"}), 400
         
+        options = provider.search(origin, destination, date, passengers, travel_class)
+        
         response = {
             "origin": origin,
             "destination": destination,
@@ -320,301 +469,113 @@ def book_transport():
         if travel_class:
             response["class"] = travel_class
         
-        return jsonify(response), 200
+        return conditional_jsonify(response)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
-def generate_train_options(origin, destination, date, passengers, travel_class=None):
-    """
-    Generate train options
-    """
-    # Mock train classes
-    train_classes = ["Sleeper", "AC 3 Tier", "AC 2 Tier", "AC First Class", "AC Chair Car"]
-    if travel_class and travel_class not in train_classes:
-        train_classes.append(travel_class)
-    
-    # Mock train operators
-    train_operators = ["Indian Railways", "Rajdhani Express", "Shatabdi Express", "Duronto Express", "Vande Bharat Express"]
-    
-    # Calculate distance
-    try:
-        import math
-        lat1, lon1 = origin["lat"], origin["lng"]
-        lat2, lon2 = destination["lat"], destination["lng"]
-        
-        # Rough distance calculation using Haversine formula
-        R = 6371  # Earth radius in km
-        dLat = math.radians(lat2 - lat1)
-        dLon = math.radians(lon2 - lon1)
-        a = math.sin(dLat/2) * math.sin(dLat/2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon/2) * math.sin(dLon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        # Rough travel time calculation (50 km/h average speed)
-        travel_hours = distance / 50
-    except:
-        # Default values if calculation fails
-        distance = 300
-        travel_hours = 6
-    
-    options = []
-    
-    # Generate 3-5 train options
-    num_options = random.randint(3, 5)
+def search_transport_modes(origin, destination, date, passengers, modes, travel_class, sort_by):
+    """Search several transport modes at once and merge the results"""
+    unsupported = [mode for mode in modes if mode not in TRANSPORT_PROVIDERS]
+    if unsupported or not modes:
+        return jsonify({"error": f"Unsupported transport mode: {', '.join(map(str, unsupported)) or 'none given'}"}), 400
+    
+    providers = [TRANSPORT_PROVIDERS[mode] for mode in dict.fromkeys(modes)]
+    options, provider_status = search_transport(
+        providers, origin, destination, date, passengers, travel_class, sort_by
+    )
+    
+    response = {
+        "origin": origin,
+        "destination": destination,
+        "date": date,
+        "passengers": passengers,
+        "modes": [provider.mode for provider in providers],
+        "sort_by": sort_by,
+        "options": options,
+        "providers": provider_status,
+        "partial": any(status["status"] != "ok" for status in provider_status.values())
+    }
     
-    for i in range(num_options):
-        # Random departure time between 5 AM and 10 PM
-        departure_hour = random.randint(5, 22)
-        departure_minute = random.choice([0, 15, 30, 45])
-        departure_time = f"{departure_hour:02d}:{departure_minute:02d}"
-        
-        # Calculate arrival time
-        departure_datetime = datetime.strptime(f"{date} {departure_time}", "%Y-%m-%d %H:%M")
-        arrival_datetime = departure_datetime + timedelta(hours=travel_hours)
-        arrival_time = arrival_datetime.strftime("%H:%M")
-        arrival_date = arrival_datetime.strftime("%Y-%m-%d")
-        
-        # Random train class if not specified
-        if travel_class:
-            selected_class = travel_class
-        else:
-            selected_class = random.choice(train_classes)
-        
-        # Price calculation based on distance and class
-        base_price = distance * 0.8  # Base price per km
-        
-        # Adjust price based on class
-        class_factors = {
-            "Sleeper": 1.0,
-            "AC 3 Tier": 1.5,
-            "AC 2 Tier": 2.0,
-            "AC First Class": 3.0,
-            "AC Chair Car": 1.3
-        }
-        class_factor = class_factors.get(selected_class, 1.5)
-        
-        price = int(base_price * class_factor)
-        total_price = price * passengers
-        
-        # Generate train number
-        train_number = f"{random.randint(10000, 99999)}"
-        
-        # Generate train name
-        operator = random.choice(train_operators)
-        train_name = f"{operator} ({origin['name']} - {destination['name']})"
-        
-        option = {
-            "train_number": train_number,
-            "train_name": train_name,
-            "departure_date": date,
-            "departure_time": departure_time,
-            "arrival_date": arrival_date,
-            "arrival_time": arrival_time,
-            "duration": f"{int(travel_hours)}h {int((travel_hours % 1) * 60)}m",
-            "class": selected_class,
-            "price": price,
-            "total_price": total_price,
-            "availability": random.choice(["Available", "Few Seats Left", "Waitlist"]),
-            "booking_url": f"https://www.irctc.co.in/nget/train-search?trainNo={train_number}"
-        }
-        
-        options.append(option)
+    if travel_class:
+        response["class"] = travel_class
     
-    return options
+    return conditional_jsonify(response)
 
-def generate_bus_options(origin, destination, date, passengers):
+MAX_CALENDAR_DAYS = 90
+
+@app.route('/transport/calendar', methods=['POST'])
+def transport_fare_calendar():
     """
-    Generate bus options
+    Cheapest and median fare per day for a date range, in one call
+    Expected input:
+    {
+        "origin": {"name": "Delhi", "lat": 28.6139, "lng": 77.209},
+        "destination": {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873},
+        "start_date": "2025-09-10",
+        "end_date": "2025-10-09",  // Optional, defaults to 30 days from start_date
+        "modes": ["train", "bus"],  // Optional, defaults to "all"
+        "passengers": 1,
+        "class": "AC Chair Car"  // Optional, for trains
+    }
     """
-    # Mock bus operators
-    bus_operators = ["RedBus", "Volvo Express", "Shrinath Travels", "Neeta Tours", "Prasanna Purple"]
+    data = request.json
+    origin = data.get('origin', {})
+    destination = data.get('destination', {})
+    start_date = data.get('start_date')
+    end_date = data.get('end_date')
+    modes = data.get('modes', 'all')
+    passengers = data.get('passengers', 1)
+    travel_class = data.get('class')
     
-    # Mock bus types
-    bus_types = ["AC Sleeper", "Non-AC Sleeper", "AC Seater", "Non-AC Seater", "Deluxe"]
+    if not origin or not destination or not start_date:
+        return jsonify({"error": "Origin, destination, and start date are required"}), 400
     
-    # Calculate distance
     try:
-        import math
-        lat1, lon1 = origin["lat"], origin["lng"]
-        lat2, lon2 = destination["lat"], destination["lng"]
-        
-        # Rough distance calculation using Haversine formula
-        R = 6371  # Earth radius in km
-        dLat = math.radians(lat2 - lat1)
-        dLon = math.radians(lon2 - lon1)
-        a = math.sin(dLat/2) * math.sin(dLat/2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon/2) * math.sin(dLon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        # Rough travel time calculation (40 km/h average speed)
-        travel_hours = distance / 40
-    except:
-        # Default values if calculation fails
-        distance = 200
-        travel_hours = 5
-    
-    options = []
-    
-    # Generate 3-5 bus options
-    num_options = random.randint(3, 5)
+        first_day = datetime.strptime(start_date, "%Y-%m-%d")
+        last_day = datetime.strptime(end_date, "%Y-%m-%d") if end_date else first_day + timedelta(days=29)
+    except ValueError:
+        return jsonify({"error": "Dates must be in YYYY-MM-DD format"}), 400
     
-    for i in range(num_options):
-        # Random departure time between 6 AM and 11 PM
-        departure_hour = random.randint(6, 23)
-        departure_minute = random.choice([0, 15, 30, 45])
-        departure_time = f"{departure_hour:02d}:{departure_minute:02d}"
-        
-        # Calculate arrival time
-        departure_datetime = datetime.strptime(f"{date} {departure_time}", "%Y-%m-%d %H:%M")
-        arrival_datetime = departure_datetime + timedelta(hours=travel_hours)
-        arrival_time = arrival_datetime.strftime("%H:%M")
-        arrival_date = arrival_datetime.strftime("%Y-%m-%d")
-        
-        # Random bus type
-        bus_type = random.choice(bus_types)
-        
-        # Price calculation based on distance and bus type
-        base_price = distance * 1.2  # Base price per km
-        
-        # Adjust price based on bus type
-        type_factors = {
-            "AC Sleeper": 1.5,
-            "Non-AC Sleeper": 1.2,
-            "AC Seater": 1.3,
-            "Non-AC Seater": 1.0,
-            "Deluxe": 1.8
-        }
-        type_factor = type_factors.get(bus_type, 1.2)
-        
-        price = int(base_price * type_factor)
-        total_price = price * passengers
-        
-        # Generate bus ID
-        bus_id = f"BUS{random.randint(10000, 99999)}"
-        
-        # Generate bus operator
-        operator = random.choice(bus_operators)
-        
-        option = {
-            "bus_id": bus_id,
-            "operator": operator,
-            "bus_type": bus_type,
-            "departure_date": date,
-            "departure_time": departure_time,
-            "arrival_date": arrival_date,
-            "arrival_time": arrival_time,
-            "duration": f"{int(travel_hours)}h {int((travel_hours % 1) * 60)}m",
-            "price": price,
-            "total_price": total_price,
-            "seats_available": random.randint(5, 40),
-            "boarding_point": f"{origin['name']} Bus Stand",
-            "dropping_point": f"{destination['name']} Bus Stand",
-            "amenities": random.sample(["WiFi", "Charging Point", "Water Bottle", "Blanket", "TV"], random.randint(2, 4)),
-            "booking_url": f"https://www.redbus.in/search?fromCityName={origin['name']}&toCityName={destination['name']}&busId={bus_id}"
-        }
-        
-        options.append(option)
+    num_days = (last_day - first_day).days + 1
+    if num_days < 1 or num_days > MAX_CALENDAR_DAYS:
+        return jsonify({"error": f"Date range must cover 1 to {MAX_CALENDAR_DAYS} days"}), 400
     
-    return options
-
-def generate_flight_options(origin, destination, date, passengers):
-    """
-    Generate flight options
-    """
-    # Mock airlines
-    airlines = ["IndiGo", "Air India", "SpiceJet", "Vistara", "GoAir", "AirAsia India"]
+    if modes == "all":
+        modes = list(TRANSPORT_PROVIDERS)
+    elif isinstance(modes, str):
+        modes = [modes]
     
-    # Mock flight classes
-    flight_classes = ["Economy", "Premium Economy", "Business"]
+    unsupported = [mode for mode in modes if mode not in TRANSPORT_PROVIDERS]
+    if unsupported or not modes:
+        return jsonify({"error": f"Unsupported transport mode: {', '.join(map(str, unsupported)) or 'none given'}"}), 400
     
-    # Calculate distance
     try:
-        import math
-        lat1, lon1 = origin["lat"], origin["lng"]
-        lat2, lon2 = destination["lat"], destination["lng"]
-        
-        # Rough distance calculation using Haversine formula
-        R = 6371  # Earth radius in km
-        dLat = math.radians(lat2 - lat1)
-        dLon = math.radians(lon2 - lon1)
-        a = math.sin(dLat/2) * math.sin(dLat/2) + math.cos(math.radians(lat1)) * math.cos(math.radians(lat2)) * math.sin(dLon/2) * math.sin(dLon/2)
-        c = 2 * math.atan2(math.sqrt(a), math.sqrt(1-a))
-        distance = R * c
-        
-        # Rough flight time calculation (500 km/h average speed)
-        travel_hours = distance / 500
-        if travel_hours < 1:
-            travel_hours = 1  # Minimum flight time
-    except:
-        # Default values if calculation fails
-        distance = 800
-        travel_hours = 2
-    
-    options = []
-    
-    # Generate 3-5 flight options
-    num_options = random.randint(3, 5)
-    
-    for i in range(num_options):
-        # Random departure time between 6 AM and 10 PM
-        departure_hour = random.randint(6, 22)
-        departure_minute = random.choice([0, 15, 30, 45])
-        departure_time = f"{departure_hour:02d}:{departure_minute:02d}"
-        
-        # Calculate arrival time
-        departure_datetime = datetime.strptime(f"{date} {departure_time}", "%Y-%m-%d %H:%M")
-        arrival_datetime = departure_datetime + timedelta(hours=travel_hours)
-        arrival_time = arrival_datetime.strftime("%H:%M")
-        arrival_date = arrival_datetime.strftime("%Y-%m-%d")
-        
-        # Random airline and flight number
-        airline = random.choice(airlines)
-        flight_number = f"{airline[:2]}{random.randint(100, 999)}"
-        
-        # Random flight class
-        flight_class = random.choice(flight_classes)
+        providers = [TRANSPORT_PROVIDERS[mode] for mode in dict.fromkeys(modes)]
+        dates = [(first_day + timedelta(days=i)).strftime("%Y-%m-%d") for i in range(num_days)]
+        calendar, cheapest = fare_calendar(providers, origin, destination, dates, passengers, travel_class)
         
-        # Price calculation based on distance and class
-        base_price = distance * 3.5  # Base price per km
-        
-        # Adjust price based on class
-        class_factors = {
-            "Economy": 1.0,
-            "Premium Economy": 1.7,
-            "Business": 3.0
+        response = {
+            "origin": origin,
+            "destination": destination,
+            "start_date": dates[0],
+            "end_date": dates[-1],
+            "passengers": passengers,
+            "modes": [provider.mode for provider in providers],
+            "calendar": calendar,
+            "cheapest": cheapest
         }
-        class_factor = class_factors.get(flight_class, 1.0)
-        
-        price = int(base_price * class_factor)
-        total_price = price * passengers
         
-        option = {
-            "flight_number": flight_number,
-            "airline": airline,
-            "departure_date": date,
-            "departure_time": departure_time,
-            "arrival_date": arrival_date,
-            "arrival_time": arrival_time,
-            "duration": f"{int(travel_hours)}h {int((travel_hours % 1) * 60)}m",
-            "class": flight_class,
-            "price": price,
-            "total_price": total_price,
-            "refundable": random.choice([True, False]),
-            "baggage_allowance": {
-                "cabin": "7 kg",
-                "check_in": "15 kg"
-            },
-            "origin_airport": f"{origin['name']} Airport",
-            "destination_airport": f"{destination['name']} Airport",
-            "booking_url": f"https://www.makemytrip.com/flight/search?itinerary={origin['name']}-{destination['name']}-{date}&tripType=O&paxType=A-{passengers}_C-0_I-0&intl=false&cabinClass={flight_class.lower()}"
-        }
+        if travel_class:
+            response["class"] = travel_class
         
-        options.append(option)
+        return conditional_jsonify(response)
     
-    return options
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
 
 @app.route('/food', methods=['POST'])
+@food_admission.admit()
 def book_food():
     """
     Get restaurant recommendations and booking options
@@ -659,7 +620,7 @@ def book_food():
             "restaurants": restaurants
         }
         
-        return jsonify(response), 200
+        return conditional_jsonify(response)
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -714,15 +675,17 @@ def generate_restaurant_recommendations(location, date, time, guests, preference
     """
     
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 8192,
-            }
-        )
+        with span("llm.generate_content", prompt="restaurants"), track_llm("restaurants") as llm_call:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": 0.7,
+                    "top_p": 0.95,
+                    "top_k": 40,
+                    "max_output_tokens": 8192,
+                }
+            )
+            llm_call.record(response)
         
         # Extract the JSON response from Gemini
         json_start = response.text.find('```json') + 7
@@ -733,7 +696,8 @@ def generate_restaurant_recommendations(location, date, time, guests, preference
             json_end = response.text.find('```', json_start)
         
         json_str = response.text[json_start:json_end].strip()
-        restaurants = json.loads(json_str)
+        with span("parse.restaurants"):
+            restaurants = json.loads(json_str)
         
         # Add booking information
         for restaurant in restaurants:
@@ -758,85 +722,10 @@ def generate_restaurant_recommendations(location, date, time, guests, preference
     except Exception as e:
         # If JSON parsing fails, return a simple fallback response
         print(f"Restaurant recommendation generation failed: {str(e)}")
-        return generate_fallback_restaurants(location, budget, guests)
-
-def generate_fallback_restaurants(location, budget, guests):
-    """
-    Generate fallback restaurant options when Gemini fails
-    """
-    # Set price ranges based on budget
-    if budget == "low":
-        price_range = (200, 500)
-        price_symbol = "₹"
-    elif budget == "high":
-        price_range = (1000, 2500)
-        price_symbol = "₹₹₹"
-    else:  # medium
-        price_range = (500, 1000)
-        price_symbol = "₹₹"
-    
-    # Generic restaurant types
-    restaurant_types = [
-        {"name": f"{location['name']} Spice Garden", "cuisine": "Indian"},
-        {"name": f"Royal {location['name']} Kitchen", "cuisine": "North Indian"},
-        {"name": f"China Town {location['name']}", "cuisine": "Chinese"},
-        {"name": f"{location['name']} Pizza House", "cuisine": "Italian"},
-        {"name": f"South Flavors of {location['name']}", "cuisine": "South Indian"}
-    ]
-    
-    # Common Indian dishes
-    indian_dishes = ["Butter Chicken", "Paneer Tikka", "Dal Makhani", "Biryani", "Naan", "Tandoori Roti", "Malai Kofta"]
-    chinese_dishes = ["Kung Pao Chicken", "Hakka Noodles", "Manchurian", "Spring Rolls", "Fried Rice", "Chilli Paneer"]
-    italian_dishes = ["Margherita Pizza", "Pasta Carbonara", "Risotto", "Tiramisu", "Bruschetta", "Lasagna"]
-    south_indian_dishes = ["Dosa", "Idli", "Sambar", "Vada", "Uttapam", "Appam", "Rasam"]
-    
-    cuisine_dishes = {
-        "Indian": indian_dishes,
-        "North Indian": indian_dishes,
-        "Chinese": chinese_dishes,
-        "Italian": italian_dishes,
-        "South Indian": south_indian_dishes
-    }
-    
-    restaurants = []
-    
-    for i in range(min(5, len(restaurant_types))):
-        # Generate a random price within the budget range
-        price_per_person = random.randint(price_range[0], price_range[1])
-        total_price = price_per_person * guests
-        
-        # Random coordinates near the location
-        lat_offset = (random.random() - 0.5) * 0.05
-        lng_offset = (random.random() - 0.5) * 0.05
-        
-        # Random rating (3.5-4.8 stars)
-        rating = round(random.uniform(3.5, 4.8), 1)
-        
-        # Menu highlights based on cuisine
-        cuisine = restaurant_types[i]["cuisine"]
-        highlights = random.sample(cuisine_dishes.get(cuisine, indian_dishes), min(3, len(cuisine_dishes.get(cuisine, indian_dishes))))
-        
-        restaurant = {
-            "name": restaurant_types[i]["name"],
-            "cuisine": cuisine,
-            "description": f"A popular {cuisine} restaurant in {location['name']} known for its {highlights[0]} and {highlights[1]}.",
-            "address": f"{random.randint(1, 100)} Food Street, {location['name']}",
-            "lat": location["lat"] + lat_offset,
-            "lng": location["lng"] + lng_offset,
-            "rating": rating,
-            "price_range": price_symbol,
-            "average_cost": price_per_person,
-            "total_cost": total_price,
-            "menu_highlights": highlights,
-            "image_query": f"{restaurant_types[i]['name']} restaurant",
-            "booking_available": random.choice([True, False]),
-            "booking_url": f"https://www.dineout.co.in/{location['name'].lower()}/{restaurant_types[i]['name'].lower().replace(' ', '-')}"
-        }
-        
-        restaurants.append(restaurant)
-    
-    return restaurants
+        count_fallback("restaurants")
+        return generate_fallback_restaurants(location, budget, guests, date)
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 6004))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server with FLASK_DEBUG=1 for the reloader and debugger; use serve.py in production
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,326 @@
+"""
+backend/booking/inventory.py
+Fallback Inventory - Mock accommodation, transport and restaurant options used when
+Gemini or the booking providers are unavailable.
+
+Results are derived from a hash of the request, so the same search always returns the
+same options (which keeps ETags stable) while different searches still look different.
+"""
+
+import hashlib
+import json
+import random
+from datetime import datetime, timedelta
+
+from common.geo import location_distance_km
+
+# Catalogs are built once at import instead of on every request
+
+ACCOMMODATION_TEMPLATES = (
+    ("Hotel {name} Palace", "hotel"),
+    ("{name} Grand Resort", "resort"),
+    ("{name} Luxury Suites", "hotel"),
+    ("Budget Stay {name}", "hostel"),
+    ("{name} Apartment Rental", "apartment")
+)
+
+ACCOMMODATION_AMENITIES = (
+    "Free WiFi", "Breakfast included", "Swimming pool", "Air conditioning",
+    "Room service", "Gym", "Spa", "Restaurant", "Bar", "Parking",
+    "24-hour front desk", "Airport shuttle", "Laundry service"
+)
+
+ACCOMMODATION_PRICE_RANGES = {
+    "low": (1000, 3000),
+    "medium": (3000, 8000),
+    "high": (8000, 20000)
+}
+
+TRAIN_CLASSES = ("Sleeper", "AC 3 Tier", "AC 2 Tier", "AC First Class", "AC Chair Car")
+TRAIN_OPERATORS = ("Indian Railways", "Rajdhani Express", "Shatabdi Express", "Duronto Express", "Vande Bharat Express")
+TRAIN_CLASS_FACTORS = {
+    "Sleeper": 1.0,
+    "AC 3 Tier": 1.5,
+    "AC 2 Tier": 2.0,
+    "AC First Class": 3.0,
+    "AC Chair Car": 1.3
+}
+TRAIN_AVAILABILITY = ("Available", "Few Seats Left", "Waitlist")
+
+BUS_OPERATORS = ("RedBus", "Volvo Express", "Shrinath Travels", "Neeta Tours", "Prasanna Purple")
+BUS_TYPE_FACTORS = {
+    "AC Sleeper": 1.5,
+    "Non-AC Sleeper": 1.2,
+    "AC Seater": 1.3,
+    "Non-AC Seater": 1.0,
+    "Deluxe": 1.8
+}
+BUS_TYPES = tuple(BUS_TYPE_FACTORS)
+BUS_AMENITIES = ("WiFi", "Charging Point", "Water Bottle", "Blanket", "TV")
+
+AIRLINES = ("IndiGo", "Air India", "SpiceJet", "Vistara", "GoAir", "AirAsia India")
+FLIGHT_CLASS_FACTORS = {
+    "Economy": 1.0,
+    "Premium Economy": 1.7,
+    "Business": 3.0
+}
+FLIGHT_CLASSES = tuple(FLIGHT_CLASS_FACTORS)
+
+DEPARTURE_MINUTES = (0, 15, 30, 45)
+
+RESTAURANT_TEMPLATES = (
+    ("{name} Spice Garden", "Indian"),
+    ("Royal {name} Kitchen", "North Indian"),
+    ("China Town {name}", "Chinese"),
+    ("{name} Pizza House", "Italian"),
+    ("South Flavors of {name}", "South Indian")
+)
+
+RESTAURANT_PRICE_RANGES = {
+    "low": ((200, 500), "₹"),
+    "medium": ((500, 1000), "₹₹"),
+    "high": ((1000, 2500), "₹₹₹")
+}
+
+INDIAN_DISHES = ("Butter Chicken", "Paneer Tikka", "Dal Makhani", "Biryani", "Naan", "Tandoori Roti", "Malai Kofta")
+CUISINE_DISHES = {
+    "Indian": INDIAN_DISHES,
+    "North Indian": INDIAN_DISHES,
+    "Chinese": ("Kung Pao Chicken", "Hakka Noodles", "Manchurian", "Spring Rolls", "Fried Rice", "Chilli Paneer"),
+    "Italian": ("Margherita Pizza", "Pasta Carbonara", "Risotto", "Tiramisu", "Bruschetta", "Lasagna"),
+    "South Indian": ("Dosa", "Idli", "Sambar", "Vada", "Uttapam", "Appam", "Rasam")
+}
+
+def request_rng(*parts):
+    """
+    Random generator seeded from a hash of the request parts, so the same
+    (location, date, mode, ...) always produces the same options
+    """
+    key = json.dumps(parts, sort_keys=True, default=str)
+    seed = int.from_bytes(hashlib.sha256(key.encode()).digest()[:8], "big")
+    return random.Random(seed)
+
+
+def location_key(location):
+    """Identify a location by name and rounded coordinates"""
+    return (location.get("name"), round(location.get("lat", 0), 4), round(location.get("lng", 0), 4))
+
+
+def route_distance(origin, destination, default):
+    """Great-circle distance between two locations in km, or default if they have no coordinates"""
+    try:
+        return location_distance_km(origin, destination)
+    except (KeyError, TypeError):
+        return default
+
+
+def schedule(rng, travel_date, first_hour, last_hour, travel_hours):
+    """Pick a departure time on travel_date (a parsed datetime) and work out the arrival"""
+    hour = rng.randint(first_hour, last_hour)
+    minute = rng.choice(DEPARTURE_MINUTES)
+    arrival_datetime = travel_date + timedelta(hours=hour + travel_hours, minutes=minute)
+    return f"{hour:02d}:{minute:02d}", arrival_datetime.strftime("%Y-%m-%d"), arrival_datetime.strftime("%H:%M")
+
+
+def format_duration(travel_hours):
+    return f"{int(travel_hours)}h {int((travel_hours % 1) * 60)}m"
+
+
+def generate_fallback_accommodations(location, budget, nights, rooms, check_in=None):
+    """
+    Generate fallback accommodation options when Gemini fails
+    """
+    rng = request_rng("accommodation", location_key(location), budget, nights, rooms, check_in)
+    price_range = ACCOMMODATION_PRICE_RANGES.get(budget, ACCOMMODATION_PRICE_RANGES["medium"])
+
+    # Free cancellation until 2 days before check-in
+    try:
+        cancellation_date = (datetime.strptime(check_in, "%Y-%m-%d") - timedelta(days=2)).strftime("%Y-%m-%d")
+    except (TypeError, ValueError):
+        cancellation_date = (datetime.now() + timedelta(days=rng.randint(1, 5))).strftime("%Y-%m-%d")
+
+    accommodations = []
+
+    for name_template, accom_type in ACCOMMODATION_TEMPLATES:
+        name = name_template.format(name=location["name"])
+        price_per_night = rng.randint(price_range[0], price_range[1])
+        amenities = rng.sample(ACCOMMODATION_AMENITIES, rng.randint(3, 5))
+
+        accommodations.append({
+            "name": name,
+            "type": accom_type,
+            "description": f"A comfortable {accom_type} in {location['name']} with {amenities[0].lower()} and {amenities[1].lower()}.",
+            "address": f"{rng.randint(1, 100)} Main Street, {location['name']}",
+            "lat": location["lat"] + (rng.random() - 0.5) * 0.05,
+            "lng": location["lng"] + (rng.random() - 0.5) * 0.05,
+            "rating": round(rng.uniform(3.0, 5.0), 1),
+            "price_per_night": price_per_night,
+            "total_price": price_per_night * nights * rooms,
+            "amenities": amenities,
+            "image_query": f"{name} exterior",
+            "cancellation_policy": f"Free cancellation until {cancellation_date}",
+            "availability": "Available",
+            "booking_url": f"https://www.makemytrip.com/hotels/{name.lower().replace(' ', '-')}"
+        })
+
+    return accommodations
+
+
+def generate_train_options(origin, destination, date, passengers, travel_class=None):
+    """
+    Generate train options
+    """
+    rng = request_rng("train", location_key(origin), location_key(destination), date, passengers, travel_class)
+    distance = route_distance(origin, destination, 300)
+    travel_hours = distance / 50  # 50 km/h average speed
+    base_price = distance * 0.8  # Base price per km
+    travel_date = datetime.strptime(date, "%Y-%m-%d")
+
+    options = []
+
+    # Generate 3-5 train options
+    for _ in range(rng.randint(3, 5)):
+        departure_time, arrival_date, arrival_time = schedule(rng, travel_date, 5, 22, travel_hours)
+
+        selected_class = travel_class or rng.choice(TRAIN_CLASSES)
+        price = int(base_price * TRAIN_CLASS_FACTORS.get(selected_class, 1.5))
+
+        train_number = f"{rng.randint(10000, 99999)}"
+        operator = rng.choice(TRAIN_OPERATORS)
+
+        options.append({
+            "train_number": train_number,
+            "train_name": f"{operator} ({origin['name']} - {destination['name']})",
+            "departure_date": date,
+            "departure_time": departure_time,
+            "arrival_date": arrival_date,
+            "arrival_time": arrival_time,
+            "duration": format_duration(travel_hours),
+            "class": selected_class,
+            "price": price,
+            "total_price": price * passengers,
+            "availability": rng.choice(TRAIN_AVAILABILITY),
+            "booking_url": f"https://www.irctc.co.in/nget/train-search?trainNo={train_number}"
+        })
+
+    return options
+
+
+def generate_bus_options(origin, destination, date, passengers):
+    """
+    Generate bus options
+    """
+    rng = request_rng("bus", location_key(origin), location_key(destination), date, passengers)
+    distance = route_distance(origin, destination, 200)
+    travel_hours = distance / 40  # 40 km/h average speed
+    base_price = distance * 1.2  # Base price per km
+    travel_date = datetime.strptime(date, "%Y-%m-%d")
+
+    options = []
+
+    # Generate 3-5 bus options
+    for _ in range(rng.randint(3, 5)):
+        departure_time, arrival_date, arrival_time = schedule(rng, travel_date, 6, 23, travel_hours)
+
+        bus_type = rng.choice(BUS_TYPES)
+        price = int(base_price * BUS_TYPE_FACTORS[bus_type])
+        bus_id = f"BUS{rng.randint(10000, 99999)}"
+
+        options.append({
+            "bus_id": bus_id,
+            "operator": rng.choice(BUS_OPERATORS),
+            "bus_type": bus_type,
+            "departure_date": date,
+            "departure_time": departure_time,
+            "arrival_date": arrival_date,
+            "arrival_time": arrival_time,
+            "duration": format_duration(travel_hours),
+            "price": price,
+            "total_price": price * passengers,
+            "seats_available": rng.randint(5, 40),
+            "boarding_point": f"{origin['name']} Bus Stand",
+            "dropping_point": f"{destination['name']} Bus Stand",
+            "amenities": rng.sample(BUS_AMENITIES, rng.randint(2, 4)),
+            "booking_url": f"https://www.redbus.in/search?fromCityName={origin['name']}&toCityName={destination['name']}&busId={bus_id}"
+        })
+
+    return options
+
+
+def generate_flight_options(origin, destination, date, passengers):
+    """
+    Generate flight options
+    """
+    rng = request_rng("flight", location_key(origin), location_key(destination), date, passengers)
+    distance = route_distance(origin, destination, 800)
+    travel_hours = max(distance / 500, 1)  # 500 km/h average speed, 1 hour minimum
+    base_price = distance * 3.5  # Base price per km
+    travel_date = datetime.strptime(date, "%Y-%m-%d")
+
+    options = []
+
+    # Generate 3-5 flight options
+    for _ in range(rng.randint(3, 5)):
+        departure_time, arrival_date, arrival_time = schedule(rng, travel_date, 6, 22, travel_hours)
+
+        airline = rng.choice(AIRLINES)
+        flight_class = rng.choice(FLIGHT_CLASSES)
+        price = int(base_price * FLIGHT_CLASS_FACTORS[flight_class])
+
+        options.append({
+            "flight_number": f"{airline[:2]}{rng.randint(100, 999)}",
+            "airline": airline,
+            "departure_date": date,
+            "departure_time": departure_time,
+            "arrival_date": arrival_date,
+            "arrival_time": arrival_time,
+            "duration": format_duration(travel_hours),
+            "class": flight_class,
+            "price": price,
+            "total_price": price * passengers,
+            "refundable": rng.random() < 0.5,
+            "baggage_allowance": {
+                "cabin": "7 kg",
+                "check_in": "15 kg"
+            },
+            "origin_airport": f"{origin['name']} Airport",
+            "destination_airport": f"{destination['name']} Airport",
+            "booking_url": f"https://www.makemytrip.com/flight/search?itinerary={origin['name']}-{destination['name']}-{date}&tripType=O&paxType=A-{passengers}_C-0_I-0&intl=false&cabinClass={flight_class.lower()}"
+        })
+
+    return options
+
+
+def generate_fallback_restaurants(location, budget, guests, date=None):
+    """
+    Generate fallback restaurant options when Gemini fails
+    """
+    rng = request_rng("food", location_key(location), budget, guests, date)
+    price_range, price_symbol = RESTAURANT_PRICE_RANGES.get(budget, RESTAURANT_PRICE_RANGES["medium"])
+
+    restaurants = []
+
+    for name_template, cuisine in RESTAURANT_TEMPLATES:
+        name = name_template.format(name=location["name"])
+        price_per_person = rng.randint(price_range[0], price_range[1])
+        dishes = CUISINE_DISHES.get(cuisine, INDIAN_DISHES)
+        highlights = rng.sample(dishes, min(3, len(dishes)))
+
+        restaurants.append({
+            "name": name,
+            "cuisine": cuisine,
+            "description": f"A popular {cuisine} restaurant in {location['name']} known for its {highlights[0]} and {highlights[1]}.",
+            "address": f"{rng.randint(1, 100)} Food Street, {location['name']}",
+            "lat": location["lat"] + (rng.random() - 0.5) * 0.05,
+            "lng": location["lng"] + (rng.random() - 0.5) * 0.05,
+            "rating": round(rng.uniform(3.5, 4.8), 1),
+            "price_range": price_symbol,
+            "average_cost": price_per_person,
+            "total_cost": price_per_person * guests,
+            "menu_highlights": highlights,
+            "image_query": f"{name} restaurant",
+            "booking_available": rng.random() < 0.5,
+            "booking_url": f"https://www.dineout.co.in/{location['name'].lower()}/{name.lower().replace(' ', '-')}"
+        })
+
+    return restaurants
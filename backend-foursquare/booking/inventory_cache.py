@@ -0,0 +1,168 @@
+"""
+backend/booking/inventory_cache.py
+Inventory Cache - Short-lived cache for availability and fares
+
+- Every entry has its own TTL, so static content (hotel descriptions, amenities) can live
+  for hours while volatile data (prices, seats) expires in minutes
+- Concurrent identical searches are collapsed into a single load
+- Entries that keep getting hit (hot routes like Delhi-Jaipur) are refreshed in the
+  background shortly before they expire, so their readers never wait on a reload. Each
+  pass refreshes at most refresh_budget entries, hottest first, and entries loaded with an
+  admission controller are only refreshed when it has a free slot, so background reloads
+  never queue ahead of (or add Gemini calls on top of) live requests
+"""
+
+import copy
+import threading
+import time
+from collections import OrderedDict
+
+
+def entry_ttl(ttl, value):
+    """ttl is seconds, or a function of the loaded value (e.g. shorter for degraded results)"""
+    return ttl(value) if callable(ttl) else ttl
+
+
+class CacheEntry:
+    def __init__(self, value, ttl, loader, admission=None):
+        self.value = value
+        self.ttl = ttl
+        self.loader = loader
+        self.admission = admission
+        self.lifetime = entry_ttl(ttl, value)
+        self.expires_at = time.monotonic() + self.lifetime
+        self.hits = 0
+
+
+class InflightLoad:
+    def __init__(self):
+        self.done = threading.Event()
+        self.value = None
+        self.error = None
+
+
+class InventoryCache:
+    def __init__(self, max_entries=5000, hot_threshold=5, refresh_ahead=0.2, refresh_budget=10):
+        self.max_entries = max_entries
+        self.hot_threshold = hot_threshold  # Hits within one TTL that make an entry hot
+        self.refresh_ahead = refresh_ahead  # Fraction of the TTL before expiry when hot entries refresh
+        self.refresh_budget = refresh_budget  # Most reloads per refresher pass
+        self.entries = OrderedDict()
+        self.inflight = {}
+        self.lock = threading.Lock()
+        self.counters = {"hits": 0, "misses": 0, "collapsed": 0, "refreshes": 0, "refreshes_skipped": 0}
+        self.refresher = None
+
+    def get_or_load(self, key, loader, ttl, admission=None):
+        """
+        Return the cached value for key, calling loader() to fill it when missing or
+        expired. Values are copied on the way out so callers can modify them.
+        If loader raises, or ttl works out to 0, nothing is cached.
+        admission is the AdmissionController the loader's work counts against; the
+        caller already holds a slot, background refreshes have to find a free one.
+        """
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry and entry.expires_at > time.monotonic():
+                entry.hits += 1
+                self.counters["hits"] += 1
+                return copy.deepcopy(entry.value)
+
+            load = self.inflight.get(key)
+            if load is not None:
+                # Someone is already loading this key, wait for their result
+                self.counters["collapsed"] += 1
+                owner = False
+            else:
+                load = self.inflight[key] = InflightLoad()
+                self.counters["misses"] += 1
+                owner = True
+
+        if not owner:
+            load.done.wait()
+            if load.error is not None:
+                raise load.error
+            return copy.deepcopy(load.value)
+
+        try:
+            load.value = loader()
+            self.store(key, load.value, ttl, loader, admission=admission)
+        except Exception as e:
+            load.error = e
+            raise
+        finally:
+            with self.lock:
+                self.inflight.pop(key, None)
+            load.done.set()
+
+        return copy.deepcopy(load.value)
+
+    def store(self, key, value, ttl, loader, hits=0, admission=None):
+        entry = CacheEntry(value, ttl, loader, admission)
+        entry.hits = hits
+        with self.lock:
+            if entry.lifetime <= 0:
+                self.entries.pop(key, None)
+                return
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def refresh_hot_entries(self):
+        """Reload the hottest entries that are about to expire, within the refresh budget"""
+        now = time.monotonic()
+        with self.lock:
+            due = [
+                (key, entry) for key, entry in self.entries.items()
+                if entry.hits >= self.hot_threshold
+                and now < entry.expires_at <= now + entry.lifetime * self.refresh_ahead
+            ]
+        due.sort(key=lambda item: item[1].hits, reverse=True)
+
+        refreshed = 0
+        for key, entry in due:
+            if refreshed >= self.refresh_budget:
+                break
+            # Live requests come first: skip the entry rather than wait for a slot,
+            # it is simply loaded again by the next reader after it expires
+            if entry.admission is not None and not entry.admission.try_acquire():
+                with self.lock:
+                    self.counters["refreshes_skipped"] += 1
+                continue
+
+            refreshed += 1
+            started = time.monotonic()
+            try:
+                value = entry.loader()
+            except Exception as e:
+                print(f"Inventory cache refresh failed for {key}: {str(e)}")
+                continue
+            finally:
+                if entry.admission is not None:
+                    entry.admission.release(time.monotonic() - started)
+            # Keep half the hits so an entry stays hot only while it is still being read
+            self.store(key, value, entry.ttl, entry.loader, hits=entry.hits // 2, admission=entry.admission)
+            with self.lock:
+                self.counters["refreshes"] += 1
+
+    def start_refresher(self, interval=5.0):
+        """Start the background thread that keeps hot entries fresh"""
+        if self.refresher is not None:
+            return
+
+        def run():
+            while True:
+                time.sleep(interval)
+                self.refresh_hot_entries()
+
+        self.refresher = threading.Thread(target=run, name="inventory-cache-refresher", daemon=True)
+        self.refresher.start()
+
+    def stats(self):
+        with self.lock:
+            counters = dict(self.counters)
+            counters["entries"] = len(self.entries)
+        lookups = counters["hits"] + counters["misses"] + counters["collapsed"]
+        counters["hit_ratio"] = round((counters["hits"] + counters["collapsed"]) / lookups, 3) if lookups else 0.0
+        return counters
@@ -0,0 +1,394 @@
+"""
+backend/booking/providers.py
+Transport Providers - One adapter per transport booking provider (IRCTC, RedBus, MakeMyTrip)
+
+Every adapter exposes the same search() so /transport can query several modes at once.
+Adapters only call their provider when it is enabled as live; otherwise, or when the
+provider is failing, they serve options from the fallback inventory.
+
+Live provider contract (what a real client or a local mock server must implement):
+    GET {base_url}/search?from=Delhi&to=Jaipur&date=2025-09-10&passengers=2&class=...
+    -> {"options": [...]}  // options in the same shape as the fallback inventory
+"""
+
+import os
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout, wait, FIRST_COMPLETED
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from common.metrics import count_fallback, Histogram
+from common.tracing import span, propagate
+from common.admission import deadline_exceeded
+from inventory import generate_train_options, generate_bus_options, generate_flight_options, location_key
+
+# Shared pool so concurrent /transport calls don't each spin up threads
+provider_executor = ThreadPoolExecutor(max_workers=16)
+
+# Separate pool for provider HTTP calls, so hedged requests never wait on provider_executor
+request_executor = ThreadPoolExecutor(max_workers=32)
+
+PROVIDER_LATENCY = Histogram(
+    "horizon_provider_request_duration_seconds", "Latency of live transport provider searches, hedging included",
+    ("provider", "outcome")
+)
+
+
+class CircuitBreaker:
+    """
+    Tracks the outcome of the last `window` calls. When the error rate goes over
+    `error_threshold` the breaker opens and calls are short-circuited for `cooldown`
+    seconds, after which a single trial call is let through (half-open).
+    """
+
+    def __init__(self, window=20, error_threshold=0.5, min_calls=5, cooldown=30.0):
+        self.window = window
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.results = deque(maxlen=window)
+        self.opened_at = None
+        self.trial_in_flight = False
+        self.lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.cooldown:
+            return "half-open"
+        return "open"
+
+    def error_rate(self):
+        if not self.results:
+            return 0.0
+        return self.results.count(False) / len(self.results)
+
+    def allow(self):
+        """Whether a call to the provider may go ahead"""
+        with self.lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self.trial_in_flight:
+                self.trial_in_flight = True
+                return True
+            return False
+
+    def record(self, success):
+        with self.lock:
+            self.results.append(success)
+            if self.opened_at is not None:
+                # Outcome of the half-open trial call decides whether to close again
+                self.trial_in_flight = False
+                if success:
+                    self.opened_at = None
+                    self.results.clear()
+                else:
+                    self.opened_at = time.monotonic()
+            elif len(self.results) >= self.min_calls and self.error_rate() > self.error_threshold:
+                self.opened_at = time.monotonic()
+
+
+class TransportProvider:
+    """Base class for transport provider adapters"""
+
+    mode = None
+    name = None
+
+    def __init__(self, base_url, timeout=5.0, live=False, hedge_after=None, pool_size=10, cache=None, fare_ttl=120, fallback_ttl=10):
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout  # Seconds a multi-mode search waits for this provider
+        self.live = live
+        self.hedge_after = hedge_after  # Seconds before a duplicate request is sent, None disables hedging
+        self.breaker = CircuitBreaker()
+        self.fallbacks = 0
+        self.cache = cache  # Optional InventoryCache shared by all providers
+        self.fare_ttl = fare_ttl  # Fares and seats are volatile, so they are only cached briefly
+        self.fallback_ttl = fallback_ttl  # Fallback fares served because the provider failed, 0 to not cache them
+
+        # One pooled session per provider so connections are reused across requests
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def search(self, origin, destination, date, passengers, travel_class=None):
+        """Return a list of options for the leg, from the fare cache while it is fresh"""
+        if self.cache is None:
+            return self.search_uncached(origin, destination, date, passengers, travel_class)
+
+        key = ("fares", self.mode, location_key(origin), location_key(destination), date, passengers, travel_class)
+        options, _ = self.cache.get_or_load(
+            key,
+            lambda: self.lookup(origin, destination, date, passengers, travel_class),
+            # A fallback standing in for a failed provider is only kept for a moment,
+            # so the real fares are back as soon as the provider recovers
+            lambda result: self.fallback_ttl if result[1] else self.fare_ttl
+        )
+        return options
+
+    def search_uncached(self, origin, destination, date, passengers, travel_class=None):
+        """Return a list of options for the leg, from the provider when possible"""
+        return self.lookup(origin, destination, date, passengers, travel_class)[0]
+
+    def lookup(self, origin, destination, date, passengers, travel_class=None):
+        """
+        Return (options, degraded); degraded is True when a live provider was skipped
+        or failed and the options come from the fallback inventory instead
+        """
+        if self.live and self.breaker.allow():
+            started = time.monotonic()
+            outcome = "error"
+            try:
+                options = self.hedged_fetch(origin, destination, date, passengers, travel_class)
+                self.breaker.record(True)
+                outcome = "ok"
+                return options, False
+            except Exception as e:
+                # Any failure, including a malformed body (a list or null instead of
+                # {"options": [...]}), counts against the provider; otherwise a failed
+                # half-open trial would leave the breaker waiting on it forever
+                self.breaker.record(False)
+                print(f"{self.name} search failed: {str(e)}")
+            finally:
+                PROVIDER_LATENCY.observe(time.monotonic() - started, provider=self.name, outcome=outcome)
+
+        # Searches run on executor threads
+        with self.breaker.lock:
+            self.fallbacks += 1
+        count_fallback(f"provider_{self.mode}")
+        return self.fallback(origin, destination, date, passengers, travel_class), self.live
+
+    def hedged_fetch(self, *args):
+        """
+        Call the provider, and if it hasn't answered within hedge_after seconds send a
+        second identical request and take whichever succeeds first
+        """
+        if self.hedge_after is None:
+            return self.fetch(*args)
+
+        pending = {request_executor.submit(self.fetch, *args)}
+        done, pending = wait(pending, timeout=self.hedge_after)
+        if not done:
+            pending.add(request_executor.submit(self.fetch, *args))
+
+        error = None
+        while done or pending:
+            for future in done:
+                try:
+                    return future.result()
+                except Exception as e:
+                    error = e
+            if not pending:
+                break
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        raise error
+
+    def fetch(self, origin, destination, date, passengers, travel_class=None):
+        """Single request to the provider's search API"""
+        params = {
+            "from": origin.get("name"),
+            "to": destination.get("name"),
+            "date": date,
+            "passengers": passengers
+        }
+        if travel_class:
+            params["class"] = travel_class
+
+        response = self.session.get(f"{self.base_url}/search", params=params, timeout=self.timeout)
+        response.raise_for_status()
+        return response.json()["options"]
+
+    def fallback(self, origin, destination, date, passengers, travel_class=None):
+        raise NotImplementedError
+
+    def stats(self):
+        return {
+            "provider": self.name,
+            "live": self.live,
+            "circuit": self.breaker.state,
+            "error_rate": round(self.breaker.error_rate(), 3),
+            "fallbacks": self.fallbacks,
+            "latency": {
+                outcome: PROVIDER_LATENCY.snapshot(provider=self.name, outcome=outcome) for outcome in ("ok", "error")
+            }
+        }
+
+
+class IRCTCProvider(TransportProvider):
+    mode = "train"
+    name = "irctc"
+
+    def fallback(self, origin, destination, date, passengers, travel_class=None):
+        return generate_train_options(origin, destination, date, passengers, travel_class)
+
+
+class RedBusProvider(TransportProvider):
+    mode = "bus"
+    name = "redbus"
+
+    def fallback(self, origin, destination, date, passengers, travel_class=None):
+        return generate_bus_options(origin, destination, date, passengers)
+
+
+class MakeMyTripProvider(TransportProvider):
+    mode = "flight"
+    name = "makemytrip"
+
+    def fallback(self, origin, destination, date, passengers, travel_class=None):
+        return generate_flight_options(origin, destination, date, passengers)
+
+
+def duration_minutes(duration):
+    """Convert a "5h 30m" duration into minutes"""
+    try:
+        hours, minutes = duration.split("h")
+        return int(hours) * 60 + int(minutes.strip().rstrip("m") or 0)
+    except (AttributeError, ValueError):
+        return None
+
+
+def timed_search(provider, *args):
+    """Run a provider search and measure how long the provider took"""
+    started = time.monotonic()
+    with span("provider.search", provider=provider.name):
+        results = provider.search(*args)
+    return results, (time.monotonic() - started) * 1000
+
+
+SORT_KEYS = {
+    "price": lambda option: option.get("total_price", option.get("price", 0)),
+    "duration": lambda option: option.get("duration_minutes") or 0,
+    "departure": lambda option: (option.get("departure_date", ""), option.get("departure_time", ""))
+}
+
+
+def search_transport(providers, origin, destination, date, passengers, travel_class=None, sort_by="price"):
+    """
+    Query several providers concurrently and merge their options.
+    Providers that miss their deadline or fail are reported in the status and
+    left out, so a slow provider only costs its own results.
+    Returns (options, provider_status)
+    """
+    started = time.monotonic()
+    futures = {
+        provider.mode: provider_executor.submit(
+            propagate(timed_search), provider, origin, destination, date, passengers, travel_class
+        )
+        for provider in providers
+    }
+
+    options = []
+    provider_status = {}
+
+    for provider in providers:
+        future = futures[provider.mode]
+        remaining = provider.timeout - (time.monotonic() - started)
+        status = {"provider": provider.name}
+        try:
+            results, latency_ms = future.result(timeout=max(remaining, 0))
+            for option in results:
+                option["mode"] = provider.mode
+                option["provider"] = provider.name
+                option["duration_minutes"] = duration_minutes(option.get("duration"))
+            options.extend(results)
+            status.update(status="ok", count=len(results), latency_ms=round(latency_ms, 1))
+        except FuturesTimeout:
+            status.update(status="timeout", count=0, latency_ms=round(provider.timeout * 1000, 1))
+        except Exception as e:
+            status.update(status="error", count=0, error=str(e))
+        provider_status[provider.mode] = status
+
+    options.sort(key=SORT_KEYS.get(sort_by, SORT_KEYS["price"]))
+    return options, provider_status
+
+
+# Searches of one fare calendar on provider_executor at once, leaving the other workers
+# to /transport
+CALENDAR_MAX_IN_FLIGHT = int(os.getenv("CALENDAR_MAX_IN_FLIGHT", 4))
+
+
+def fare_calendar(providers, origin, destination, dates, passengers, travel_class=None):
+    """
+    Minimum and median fare per day per mode for a range of dates.
+    The (date, mode) searches run CALENDAR_MAX_IN_FLIGHT at a time and are served from
+    the fare cache when possible, so a 30-day calendar is one batched pass instead of
+    30 /transport calls. Each search gets its provider's timeout from the moment it is
+    submitted; searches not started by the request deadline are reported as timeouts.
+    """
+    jobs = deque((date, provider) for date in dates for provider in providers)
+    pending = {}  # future -> (date, provider, seconds since epoch it must be done by)
+    outcomes = {}  # (date, mode) -> ("ok", results) | ("timeout", None) | ("error", message)
+
+    try:
+        while jobs or pending:
+            while jobs and len(pending) < CALENDAR_MAX_IN_FLIGHT and not deadline_exceeded():
+                date, provider = jobs.popleft()
+                future = provider_executor.submit(
+                    propagate(provider.search), origin, destination, date, passengers, travel_class
+                )
+                pending[future] = (date, provider, time.monotonic() + provider.timeout)
+            if not pending:
+                # The request deadline passed before the rest could start
+                for date, provider in jobs:
+                    outcomes[(date, provider.mode)] = ("timeout", None)
+                jobs.clear()
+                break
+
+            soonest = min(due for _, _, due in pending.values())
+            done, _ = wait(list(pending), timeout=max(soonest - time.monotonic(), 0), return_when=FIRST_COMPLETED)
+            now = time.monotonic()
+            for future in list(pending):
+                date, provider, due = pending[future]
+                if future in done:
+                    try:
+                        outcomes[(date, provider.mode)] = ("ok", future.result())
+                    except Exception as e:
+                        outcomes[(date, provider.mode)] = ("error", str(e))
+                elif due <= now:
+                    future.cancel()
+                    outcomes[(date, provider.mode)] = ("timeout", None)
+                else:
+                    continue
+                del pending[future]
+    finally:
+        # Searches left behind by an error must not keep holding executor workers
+        for future in pending:
+            future.cancel()
+
+    calendar = []
+    cheapest = {}
+
+    for date in dates:
+        day = {"date": date}
+        for provider in providers:
+            status, results = outcomes[(date, provider.mode)]
+            if status == "timeout":
+                day[provider.mode] = {"status": "timeout"}
+                continue
+            if status == "error":
+                day[provider.mode] = {"status": "error", "error": results}
+                continue
+
+            fares = [option["price"] for option in results if "price" in option]
+            if not fares:
+                day[provider.mode] = {"status": "no_options"}
+                continue
+
+            day[provider.mode] = {
+                "status": "ok",
+                "min_fare": min(fares),
+                "median_fare": statistics.median(fares),
+                "options": len(fares)
+            }
+            best = cheapest.get(provider.mode)
+            if best is None or min(fares) < best["min_fare"]:
+                cheapest[provider.mode] = {"date": date, "min_fare": min(fares)}
+        calendar.append(day)
+
+    return calendar, cheapest
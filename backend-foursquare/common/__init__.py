@@ -0,0 +1,4 @@
+"""
+backend/common
+Modules shared by all backend services
+"""
@@ -0,0 +1,229 @@
+"""
+backend/common/admission.py
+Admission Control - Concurrency limits, priorities and deadlines for Gemini-bound endpoints
+
+Each limited endpoint lets `limit` requests run at once and parks up to `queue_size`
+more in a wait queue ordered by priority, so a burst of traffic waits briefly instead of
+piling Gemini calls up until everything times out together. When the queue is full, or a
+request has waited `queue_timeout` seconds, it gets 503 with a Retry-After header.
+
+Priority comes from the X-Priority header ("interactive" or "background"). A full queue
+makes room for an interactive request by shedding the newest background one.
+
+X-Request-Deadline carries the unix time after which the client is no longer waiting. The
+gateway sets it on every upstream call and the services answer 504 instead of starting
+(or continuing to queue) work nobody will read.
+"""
+
+import contextvars
+import functools
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+
+DEADLINE_HEADER = "X-Request-Deadline"
+PRIORITY_HEADER = "X-Priority"
+
+PRIORITIES = {"interactive": 0, "background": 1}
+
+current_deadline = contextvars.ContextVar("current_deadline", default=None)
+current_priority = contextvars.ContextVar("current_priority", default=None)
+
+controllers = []
+
+
+class AdmissionRejected(Exception):
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class DeadlineExceeded(Exception):
+    pass
+
+
+class Waiter:
+    def __init__(self):
+        self.event = threading.Event()
+        self.admitted = False
+        self.shed = False
+
+
+class AdmissionController:
+    def __init__(self, name, limit, queue_size, queue_timeout=10.0):
+        self.name = name
+        self.limit = limit
+        self.queue_size = queue_size
+        self.queue_timeout = queue_timeout
+        self.active = 0
+        self.waiters = []  # Heap of (priority rank, sequence, Waiter)
+        self.sequence = itertools.count()
+        self.service_time = 1.0  # Moving average of seconds per request, for Retry-After
+        self.lock = threading.Lock()
+        controllers.append(self)
+
+    def retry_after(self):
+        """Seconds until the queue has likely drained enough to take another request"""
+        return max(1, math.ceil(self.service_time * (len(self.waiters) + 1) / self.limit))
+
+    def acquire(self, priority="interactive"):
+        rank = PRIORITIES.get(priority, PRIORITIES["interactive"])
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                return
+
+            if len(self.waiters) >= self.queue_size:
+                # Make room by shedding the least urgent, most recently queued waiter
+                least_urgent = max(self.waiters, default=None)
+                if least_urgent is None or least_urgent[0] <= rank:
+                    raise AdmissionRejected(f"{self.name} is saturated", self.retry_after())
+                self.waiters.remove(least_urgent)
+                heapq.heapify(self.waiters)
+                least_urgent[2].shed = True
+                least_urgent[2].event.set()
+
+            waiter = Waiter()
+            heapq.heappush(self.waiters, (rank, next(self.sequence), waiter))
+
+        timeout = self.queue_timeout
+        deadline = current_deadline.get()
+        if deadline is not None:
+            timeout = min(timeout, deadline - time.time())
+
+        if not waiter.event.wait(max(0.0, timeout)):
+            with self.lock:
+                if not waiter.admitted:
+                    self.waiters = [entry for entry in self.waiters if entry[2] is not waiter]
+                    heapq.heapify(self.waiters)
+                    if deadline is not None and time.time() >= deadline:
+                        raise DeadlineExceeded("Request deadline passed while queued")
+                    raise AdmissionRejected(f"{self.name} queue wait timed out", self.retry_after())
+
+        if waiter.shed:
+            raise AdmissionRejected(f"{self.name} is saturated", self.retry_after())
+
+    def try_acquire(self):
+        """Take a free slot without queueing, e.g. for extra work of an admitted request"""
+        with self.lock:
+            if self.active < self.limit and not self.waiters:
+                self.active += 1
+                return True
+            return False
+
+    def release(self, elapsed):
+        with self.lock:
+            self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+            if self.waiters:
+                # Hand the slot straight to the most urgent waiter
+                _, _, waiter = heapq.heappop(self.waiters)
+                waiter.admitted = True
+                waiter.event.set()
+            else:
+                self.active -= 1
+
+    def stats(self):
+        with self.lock:
+            return {"active": self.active, "queued": len(self.waiters), "limit": self.limit}
+
+    def admit(self, priority="interactive"):
+        """
+        Decorator for a Flask view. `priority` is the default class for the endpoint,
+        a request can override it with the X-Priority header.
+        """
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                from flask import jsonify
+                from common.metrics import count_admission_rejection
+
+                request_priority = current_priority.get() or priority
+                try:
+                    self.acquire(request_priority)
+                except AdmissionRejected as e:
+                    count_admission_rejection(self.name, "saturated")
+                    response = jsonify({"error": str(e)})
+                    response.headers["Retry-After"] = str(e.retry_after)
+                    return response, 503
+                except DeadlineExceeded as e:
+                    count_admission_rejection(self.name, "deadline")
+                    return jsonify({"error": str(e)}), 504
+
+                started = time.monotonic()
+                try:
+                    return view(*args, **kwargs)
+                finally:
+                    self.release(time.monotonic() - started)
+            return wrapper
+        return decorator
+
+
+def remaining_time(default=None):
+    """Seconds left before the current request's deadline, or default when it has none"""
+    deadline = current_deadline.get()
+    if deadline is None:
+        return default
+    remaining = max(0.0, deadline - time.time())
+    return remaining if default is None else min(default, remaining)
+
+
+def deadline_exceeded():
+    deadline = current_deadline.get()
+    return deadline is not None and time.time() >= deadline
+
+
+def admission_headers(headers=None):
+    """Headers for an outgoing service call, carrying the current deadline and priority"""
+    headers = dict(headers or {})
+    deadline = current_deadline.get()
+    if deadline is not None:
+        headers[DEADLINE_HEADER] = f"{deadline:.3f}"
+    priority = current_priority.get()
+    if priority is not None:
+        headers[PRIORITY_HEADER] = priority
+    return headers
+
+
+def init_admission(app, default_timeout=None):
+    """
+    Read the deadline and priority of every request handled by a Flask app. With
+    default_timeout, requests without a deadline get one that many seconds from now
+    (used by the gateway, where requests enter the system).
+    """
+    from flask import g, request, jsonify
+
+    @app.before_request
+    def read_deadline():
+        deadline = None
+        try:
+            deadline = float(request.headers[DEADLINE_HEADER])
+        except (KeyError, ValueError):
+            pass
+        if default_timeout is not None:
+            own_deadline = time.time() + default_timeout
+            deadline = own_deadline if deadline is None else min(deadline, own_deadline)
+
+        priority = request.headers.get(PRIORITY_HEADER, "").strip().lower()
+        g.admission_tokens = (
+            current_deadline.set(deadline),
+            current_priority.set(priority if priority in PRIORITIES else None)
+        )
+
+        if deadline is not None and time.time() >= deadline:
+            return jsonify({"error": "Request deadline already passed"}), 504
+
+    @app.teardown_request
+    def clear_deadline(error=None):
+        tokens = g.pop("admission_tokens", None)
+        if tokens is None:
+            return
+        try:
+            current_deadline.reset(tokens[0])
+            current_priority.reset(tokens[1])
+        except ValueError:
+            # Teardown ran in a different context than before_request
+            current_deadline.set(None)
+            current_priority.set(None)
\ No newline at end of file
@@ -0,0 +1,102 @@
+"""
+backend/common/compression.py
+Compression - gzip / brotli response compression negotiated from Accept-Encoding
+
+init_compression(app) compresses JSON and text responses of at least `min_size` bytes
+with the best encoding the client accepts. brotli is used when the optional `brotli`
+package is installed, gzip otherwise. Responses that already carry a Content-Encoding
+(e.g. bodies the gateway relays untouched from an upstream service) are left alone.
+"""
+
+import gzip
+import zlib
+
+try:
+    import brotli
+except ImportError:  # brotli is optional
+    brotli = None
+
+COMPRESSIBLE_MIMETYPES = ("application/json", "text/plain", "text/html")
+BROTLI_QUALITY = 5  # Compresses better than gzip -6 at a similar speed
+
+
+def supported_encodings():
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+
+def parse_accept_encoding(header):
+    """Return {encoding: q} from an Accept-Encoding header"""
+    accepted = {}
+    for part in (header or "").split(","):
+        fields = part.strip().split(";")
+        encoding = fields[0].strip().lower()
+        if not encoding:
+            continue
+        q = 1.0
+        for param in fields[1:]:
+            name, _, value = param.strip().partition("=")
+            if name.strip() == "q":
+                try:
+                    q = float(value)
+                except ValueError:
+                    q = 0.0
+        accepted[encoding] = q
+    return accepted
+
+
+def negotiate_encoding(header):
+    """Best supported encoding for an Accept-Encoding header, or None for identity"""
+    accepted = parse_accept_encoding(header)
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = accepted.get(encoding, accepted.get("*", 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data, encoding, level=6):
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_QUALITY)
+    return gzip.compress(data, compresslevel=level)
+
+
+def decompress(data, encoding):
+    """Decode a body by its Content-Encoding; identity (or None) returns it unchanged"""
+    if encoding == "gzip":
+        return gzip.decompress(data)
+    if encoding == "br":
+        return brotli.decompress(data)
+    if encoding == "deflate":
+        return zlib.decompress(data)
+    return data
+
+
+def init_compression(app, min_size=1024, level=6):
+    """Compress the responses of a Flask app for clients that accept it"""
+    from flask import request
+
+    @app.after_request
+    def compress_response(response):
+        if (response.direct_passthrough
+                or response.status_code < 200 or response.status_code >= 300 or response.status_code == 204
+                or "Content-Encoding" in response.headers
+                or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+            return response
+
+        encoding = negotiate_encoding(request.headers.get("Accept-Encoding"))
+        response.vary.add("Accept-Encoding")
+        if encoding is None:
+            return response
+
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+
+        response.set_data(compress(data, encoding, level))
+        response.headers["Content-Encoding"] = encoding
+        # The compressed body is a different representation, so a strong ETag becomes weak
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
\ No newline at end of file
@@ -0,0 +1,302 @@
+"""
+backend/common/fake_llm.py
+Fake LLM - Templated stand-in answers for every prompt the services send to Gemini
+
+The prompt family (itinerary, replan_day, recommendations, recommendations_batch,
+accommodation, restaurants, route_order, route_constraints, chat) is recognised from the
+prompt text, and an answer in the format the calling service parses is generated from a
+seed derived from the prompt, so the same prompt always gets the same answer. Latencies are drawn from a log-normal distribution
+per family; the medians are rough figures for gemini-2.5-pro and meant to be scaled.
+"""
+
+import hashlib
+import json
+import math
+import random
+import re
+
+# Family -> (median seconds, log-normal sigma)
+LATENCY_PROFILES = {
+    "itinerary": (20.0, 0.4),
+    "replan_day": (7.0, 0.4),
+    "recommendations": (12.0, 0.4),
+    "recommendations_batch": (18.0, 0.4),
+    "accommodation": (10.0, 0.4),
+    "accommodation_rates": (4.0, 0.4),
+    "restaurants": (9.0, 0.4),
+    "route_order": (5.0, 0.5),
+    "route_constraints": (3.0, 0.4),
+    "chat": (4.0, 0.5),
+}
+
+CITIES = {
+    "delhi": (28.6139, 77.2090),
+    "jaipur": (26.9124, 75.7873),
+    "agra": (27.1767, 78.0081),
+    "udaipur": (24.5854, 73.7125),
+    "mumbai": (19.0760, 72.8777),
+    "goa": (15.2993, 74.1240),
+    "kerala": (9.9312, 76.2673),
+    "kochi": (9.9312, 76.2673),
+    "bangalore": (12.9716, 77.5946),
+    "varanasi": (25.3176, 82.9739),
+    "rishikesh": (30.0869, 78.2676),
+}
+DEFAULT_CITY = ("Jaipur", CITIES["jaipur"])
+
+PLACE_TYPES = ["fort", "museum", "market", "temple", "garden", "lake", "palace", "viewpoint"]
+CUISINES = ["North Indian", "South Indian", "Rajasthani", "Mughlai", "Street Food", "Cafe"]
+AMENITIES = ["Free WiFi", "Breakfast", "Air Conditioning", "Pool", "Parking", "Spa", "Gym", "Room Service"]
+
+
+def detect_family(prompt):
+    if "expert route optimizer" in prompt:
+        return "route_order"
+    if "route constraint parser" in prompt:
+        return "route_constraints"
+    if re.search(r"Rewrite ONLY day \d+", prompt):
+        return "replan_day"
+    if "create a detailed travel itinerary" in prompt:
+        return "itinerary"
+    if "multi-location travel recommendation expert" in prompt:
+        return "recommendations_batch"
+    if "travel recommendation expert" in prompt:
+        return "recommendations"
+    if "hotel rates expert" in prompt:
+        return "accommodation_rates"
+    if "travel booking expert" in prompt:
+        return "accommodation"
+    if "restaurant recommendation expert" in prompt:
+        return "restaurants"
+    return "chat"
+
+
+def prompt_rng(prompt):
+    return random.Random(int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big"))
+
+
+def sample_latency(family, rng, scale=1.0):
+    median, sigma = LATENCY_PROFILES.get(family, LATENCY_PROFILES["chat"])
+    return median * math.exp(sigma * rng.gauss(0, 1)) * scale
+
+
+def prompt_location(prompt):
+    """(name, (lat, lng)) of the place a prompt is about"""
+    match = re.search(r"in ([^(\n]+?) \(coordinates: (-?[\d.]+), (-?[\d.]+)\)", prompt)
+    if match:
+        return match.group(1).strip(), (float(match.group(2)), float(match.group(3)))
+    lowered = prompt.lower()
+    for city, coordinates in CITIES.items():
+        if city in lowered:
+            return city.title(), coordinates
+    return DEFAULT_CITY
+
+
+def fenced(value):
+    return f"Here you go:\n```json\n{json.dumps(value, indent=2, ensure_ascii=False)}\n```"
+
+
+def nearby(rng, center, spread=0.05):
+    return round(center[0] + rng.uniform(-spread, spread), 6), round(center[1] + rng.uniform(-spread, spread), 6)
+
+
+def fake_day(rng, day, city, center):
+    locations = []
+    for stop in range(rng.randint(3, 5)):
+        lat, lng = nearby(rng, center)
+        place = rng.choice(PLACE_TYPES)
+        locations.append({
+            "name": f"{city} {place.title()} {day}.{stop + 1}",
+            "lat": lat,
+            "lng": lng,
+            "description": f"A well known {place} in {city}.",
+            "activities": [f"Explore the {place}", "Take photos"],
+            "food": f"{rng.choice(CUISINES)} lunch nearby",
+            "accommodation": f"{city} Heritage Hotel"
+        })
+    return {
+        "day": day,
+        "title": f"Day {day} in {city}",
+        "locations": locations,
+        "transport": {
+            "mode": rng.choice(["car", "bus", "train"]),
+            "from": city,
+            "to": city,
+            "duration": f"{rng.randint(1, 4)} hours",
+            "cost": rng.randint(3, 20) * 100
+        }
+    }
+
+
+def fake_itinerary(prompt, rng):
+    city, center = prompt_location(prompt)
+    match = re.search(r"Duration: (\d+) days", prompt)
+    days = min(int(match.group(1)), 14) if match else 3
+    return fenced({
+        "title": f"{days}-day trip to {city}",
+        "duration": f"{days} days",
+        "overview": f"The highlights of {city} at a relaxed pace.",
+        "total_budget": rng.randint(10, 60) * 1000,
+        "days": [fake_day(rng, day, city, center) for day in range(1, days + 1)],
+        "recommendations": ["Book trains early", "Carry cash for markets"],
+        "notes": "Generated by the fake LLM backend."
+    })
+
+
+def fake_replan_day(prompt, rng):
+    city, center = prompt_location(prompt)
+    day = int(re.search(r"Rewrite ONLY day (\d+)", prompt).group(1))
+    return fenced(fake_day(rng, day, city, center))
+
+
+def fake_recommendations(prompt, rng):
+    city, center = prompt_location(prompt)
+    match = re.search(r"Please provide (\d+) specific recommendations", prompt)
+    count = int(match.group(1)) if match else 5
+    return fenced(fake_places(rng, city, center, count))
+
+
+def fake_recommendations_batch(prompt, rng):
+    match = re.search(r"Please provide (\d+) specific recommendations", prompt)
+    count = int(match.group(1)) if match else 5
+    stops = re.findall(r"^\s*(\d+)\. (.+?) \(coordinates: (-?[\d.]+), (-?[\d.]+)\)\s*$", prompt, re.M)
+    return fenced({
+        number: fake_places(rng, name, (float(lat), float(lng)), count)
+        for number, name, lat, lng in stops
+    })
+
+
+def fake_places(rng, city, center, count):
+    recommendations = []
+    for i in range(count):
+        lat, lng = nearby(rng, center)
+        place = rng.choice(PLACE_TYPES)
+        recommendations.append({
+            "name": f"{city} {place.title()} {i + 1}",
+            "type": place,
+            "description": f"A popular {place} in {city}.",
+            "lat": lat,
+            "lng": lng,
+            "estimated_cost": rng.randint(0, 20) * 50,
+            "estimated_time": f"{rng.randint(1, 3)} hours",
+            "ideal_time_of_day": rng.choice(["morning", "afternoon", "evening"]),
+            "kid_friendly": rng.random() < 0.7,
+            "wheelchair_accessible": rng.random() < 0.5,
+            "image_query": f"{city} {place}"
+        })
+    return recommendations
+
+
+def fake_accommodation(prompt, rng):
+    city, center = prompt_location(prompt)
+    match = re.search(r"recommendations for (\w+) accommodations", prompt)
+    accom_type = match.group(1) if match else "hotel"
+    options = []
+    for i in range(5):
+        lat, lng = nearby(rng, center, 0.03)
+        options.append({
+            "name": f"{city} {accom_type.title()} {i + 1}",
+            "type": accom_type,
+            "description": f"A comfortable {accom_type} in {city}.",
+            "address": f"{rng.randint(1, 200)} Main Road, {city}",
+            "lat": lat,
+            "lng": lng,
+            "rating": round(rng.uniform(3.5, 4.9), 1),
+            "price_per_night": rng.randint(15, 80) * 100,
+            "amenities": rng.sample(AMENITIES, 4),
+            "image_query": f"{city} {accom_type}",
+            "free_cancellation_days": rng.randint(1, 3)
+        })
+    return fenced(options)
+
+
+def fake_accommodation_rates(prompt, rng):
+    hotels = re.findall(r"^\s*\d+\. (.+?)\s*$", prompt, re.M)
+    return fenced({name: rng.randint(15, 80) * 100 for name in hotels})
+
+
+def fake_restaurants(prompt, rng):
+    city, center = prompt_location(prompt)
+    match = re.search(r"Number of guests: (\d+)", prompt)
+    guests = int(match.group(1)) if match else 2
+    restaurants = []
+    for i in range(5):
+        lat, lng = nearby(rng, center, 0.03)
+        average_cost = rng.randint(3, 20) * 100
+        restaurants.append({
+            "name": f"{city} Kitchen {i + 1}",
+            "cuisine": rng.choice(CUISINES),
+            "description": f"A favourite with locals in {city}.",
+            "address": f"{rng.randint(1, 200)} Market Street, {city}",
+            "lat": lat,
+            "lng": lng,
+            "rating": round(rng.uniform(3.5, 4.9), 1),
+            "price_range": "₹" * rng.randint(1, 4),
+            "average_cost": average_cost,
+            "total_cost": average_cost * guests,
+            "menu_highlights": ["Dal Makhani", "Paneer Tikka", "Masala Chai"],
+            "image_query": f"{city} restaurant",
+            "booking_available": rng.random() < 0.8
+        })
+    return fenced(restaurants)
+
+
+def fake_route_order(prompt, rng):
+    match = re.search(r"\(1 to (\d+)\)", prompt)
+    count = int(match.group(1)) if match else 2
+    # Keep the first location as the start and visit the rest in a seeded order
+    tail = list(range(2, count + 1))
+    rng.shuffle(tail)
+    order = [1] + tail
+    return "\n".join(f"{position}. [Original index {index}]" for position, index in enumerate(order, 1))
+
+
+def fake_route_constraints(prompt, rng):
+    stops = {name.strip().lower(): int(number) for number, name in re.findall(r"^\s*(\d+)\. (.+)$", prompt, re.M)}
+    wishes = re.findall(r"^\s*- (.+)$", prompt, re.M)
+    hints = {"precedence": [], "time_of_day": {}}
+    for wish in wishes:
+        wish = wish.lower()
+        # Stops named in the wish, in the order they are mentioned
+        named = sorted((wish.find(name), number) for name, number in stops.items() if name and name in wish)
+        named = [number for _, number in named]
+        if " before " in wish and len(named) >= 2:
+            hints["precedence"].append(named[:2])
+        for word, slot in (("sunset", "evening"), ("evening", "evening"), ("morning", "morning"), ("lunch", "afternoon")):
+            if word in wish and named:
+                hints["time_of_day"][str(named[-1] if word == "lunch" and len(named) > 1 else named[0])] = slot
+                break
+    return json.dumps(hints)
+
+
+def fake_chat(prompt, rng):
+    city, _ = prompt_location(prompt)
+    return (
+        f"{city} is a great choice! Spend the mornings at the main sights, keep afternoons "
+        "for markets and local food, and book trains a few days ahead. "
+        "Would you like me to put together a day-by-day plan?"
+    )
+
+
+GENERATORS = {
+    "itinerary": fake_itinerary,
+    "replan_day": fake_replan_day,
+    "recommendations": fake_recommendations,
+    "recommendations_batch": fake_recommendations_batch,
+    "accommodation": fake_accommodation,
+    "accommodation_rates": fake_accommodation_rates,
+    "restaurants": fake_restaurants,
+    "route_order": fake_route_order,
+    "route_constraints": fake_route_constraints,
+    "chat": fake_chat,
+}
+
+
+def fake_response_text(prompt, family=None):
+    """Deterministic answer text for a prompt"""
+    family = family or detect_family(prompt)
+    return GENERATORS[family](prompt, prompt_rng(prompt))
+
+
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
\ No newline at end of file
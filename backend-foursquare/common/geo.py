@@ -0,0 +1,113 @@
+"""
+backend/common/geo.py
+Geo Math - Great-circle distances shared by every service
+
+Scalar helpers use plain math. The array helpers use numpy when it is installed
+(optional dependency, imported on first use to keep startup fast) and fall back to
+pure Python otherwise. Pass dtype="float32" (or set GEO_FLOAT32=1) to trade a little
+precision for speed on large matrices.
+"""
+
+import math
+import os
+
+np = None
+numpy_checked = False
+
+EARTH_RADIUS_KM = 6371  # Earth radius in kilometers
+
+DEFAULT_DTYPE = "float32" if os.getenv("GEO_FLOAT32") == "1" else "float64"
+
+
+def load_numpy():
+    """The numpy module, or None when it is not installed"""
+    global np, numpy_checked
+    if not numpy_checked:
+        try:
+            import numpy
+            np = numpy
+        except ImportError:  # numpy is optional
+            np = None
+        numpy_checked = True
+    return np
+
+
+class GeoPoint:
+    """A location with its radians precomputed, for points that are measured against many others"""
+
+    __slots__ = ("lat", "lng", "lat_rad", "lng_rad", "cos_lat")
+
+    def __init__(self, lat, lng):
+        self.lat = lat
+        self.lng = lng
+        self.lat_rad = math.radians(lat)
+        self.lng_rad = math.radians(lng)
+        self.cos_lat = math.cos(self.lat_rad)
+
+    @classmethod
+    def from_location(cls, location):
+        """Build from a {"lat": ..., "lng": ...} dict as used in every API payload"""
+        return cls(location["lat"], location["lng"])
+
+    def distance_to(self, other):
+        """Great-circle distance in km"""
+        a = (math.sin((other.lat_rad - self.lat_rad) / 2) ** 2
+             + self.cos_lat * other.cos_lat * math.sin((other.lng_rad - self.lng_rad) / 2) ** 2)
+        return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def haversine_km(lat1, lng1, lat2, lng2):
+    """Great-circle distance in km between two points given in degrees"""
+    lat1, lng1, lat2, lng2 = math.radians(lat1), math.radians(lng1), math.radians(lat2), math.radians(lng2)
+    a = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+def location_distance_km(origin, destination):
+    """Great-circle distance in km between two {"lat", "lng"} dicts"""
+    return haversine_km(origin["lat"], origin["lng"], destination["lat"], destination["lng"])
+
+
+def haversine_array(lats1, lngs1, lats2, lngs2, dtype=DEFAULT_DTYPE):
+    """
+    Element-wise great-circle distances in km for equally sized sequences of degrees.
+    Returns a numpy array when numpy is available, otherwise a list.
+    """
+    np = load_numpy()
+    if np is None:
+        return [haversine_km(*point) for point in zip(lats1, lngs1, lats2, lngs2)]
+
+    lat1 = np.radians(np.asarray(lats1, dtype=dtype))
+    lng1 = np.radians(np.asarray(lngs1, dtype=dtype))
+    lat2 = np.radians(np.asarray(lats2, dtype=dtype))
+    lng2 = np.radians(np.asarray(lngs2, dtype=dtype))
+    a = np.sin((lat2 - lat1) / 2) ** 2 + np.cos(lat1) * np.cos(lat2) * np.sin((lng2 - lng1) / 2) ** 2
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
+
+
+def leg_distances(locations, dtype=DEFAULT_DTYPE):
+    """Distances in km between consecutive locations of a route, as a list of floats"""
+    if len(locations) < 2:
+        return []
+    lats = [location["lat"] for location in locations]
+    lngs = [location["lng"] for location in locations]
+    distances = haversine_array(lats[:-1], lngs[:-1], lats[1:], lngs[1:], dtype)
+    return [float(distance) for distance in distances]
+
+
+def distance_matrix(locations, dtype=DEFAULT_DTYPE):
+    """
+    All pairwise distances in km between locations, computed in one pass.
+    Returns an n x n numpy array when numpy is available, otherwise a list of lists.
+    """
+    np = load_numpy()
+    if np is None:
+        points = [GeoPoint.from_location(location) for location in locations]
+        return [[p.distance_to(q) for q in points] for p in points]
+
+    lat = np.radians(np.asarray([location["lat"] for location in locations], dtype=dtype))
+    lng = np.radians(np.asarray([location["lng"] for location in locations], dtype=dtype))
+    cos_lat = np.cos(lat)
+    a = (np.sin((lat[:, None] - lat[None, :]) / 2) ** 2
+         + cos_lat[:, None] * cos_lat[None, :] * np.sin((lng[:, None] - lng[None, :]) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1)))
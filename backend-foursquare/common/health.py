@@ -0,0 +1,187 @@
+"""
+backend/common/health.py
+Health - Liveness and readiness checks for every service
+
+- GET /health/live   the process is up and serving requests (restart it when this fails)
+- GET /health/ready  the service can do useful work right now (stop routing traffic to it
+                     when this returns 503)
+
+A service is not ready when its Gemini calls keep failing (error rate over the last
+LLM_ERROR_WINDOW seconds above LLM_ERROR_THRESHOLD), when more than READY_MAX_QUEUE_DEPTH
+requests and background jobs are waiting, or when one of its own checks fails (the
+gateway adds one per upstream service). A load balancer polling /health/ready therefore
+sheds load from a struggling instance before its latency collapses.
+
+While the process drains for shutdown (start_draining(), called by serve.py) readiness
+fails, new requests get 503 and the requests already running are left to finish.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+LLM_ERROR_WINDOW = float(os.getenv("LLM_ERROR_WINDOW", 60))
+LLM_ERROR_THRESHOLD = float(os.getenv("LLM_ERROR_THRESHOLD", 0.5))
+LLM_ERROR_MIN_CALLS = int(os.getenv("LLM_ERROR_MIN_CALLS", 5))
+READY_MAX_QUEUE_DEPTH = int(os.getenv("READY_MAX_QUEUE_DEPTH", 50))
+
+draining = threading.Event()
+
+
+class SlidingErrorRate:
+    """Outcomes of the calls made in the last `window` seconds"""
+
+    def __init__(self, window=LLM_ERROR_WINDOW):
+        self.window = window
+        self.outcomes = deque()  # (timestamp, ok)
+        self.lock = threading.Lock()
+
+    def record(self, ok):
+        now = time.monotonic()
+        with self.lock:
+            self.outcomes.append((now, ok))
+            self.expire(now)
+
+    def expire(self, now):
+        while self.outcomes and self.outcomes[0][0] < now - self.window:
+            self.outcomes.popleft()
+
+    def snapshot(self):
+        with self.lock:
+            self.expire(time.monotonic())
+            calls = len(self.outcomes)
+            errors = sum(1 for _, ok in self.outcomes if not ok)
+        return {"calls": calls, "errors": errors, "error_rate": round(errors / calls, 3) if calls else 0.0}
+
+
+llm_errors = SlidingErrorRate()
+
+
+def record_llm_outcome(ok):
+    """Called for every Gemini call, see common.metrics.track_llm"""
+    llm_errors.record(ok)
+
+
+def start_draining():
+    draining.set()
+
+
+def wait_until_idle(timeout):
+    """Wait for the requests in flight in this process to finish; False if some still run after timeout"""
+    from common.metrics import REQUESTS_IN_FLIGHT
+    deadline = time.monotonic() + timeout
+    while REQUESTS_IN_FLIGHT.total() > 0:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.1)
+    return True
+
+
+def executor_queue_depth(*executors):
+    """Number of tasks waiting in ThreadPoolExecutors, for use as a queue depth source"""
+    return lambda: sum(executor._work_queue.qsize() for executor in executors)
+
+
+class CachedProbe:
+    """
+    Probes upstream services in parallel and keeps the result for `ttl` seconds, so
+    frequent readiness polls don't turn into a flood of requests to every upstream.
+    """
+
+    def __init__(self, services, timeout=1.0, ttl=2.0, path="/health/live"):
+        self.services = services  # name -> base URL
+        self.timeout = timeout
+        self.ttl = ttl
+        self.path = path
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(services)))
+        self.lock = threading.Lock()
+        self.result = None
+        self.checked_at = 0.0
+
+    def probe(self, url):
+        import requests
+        from common import service_client
+        started = time.monotonic()
+        try:
+            response = service_client.get(url + self.path, timeout=self.timeout)
+            reachable = response.status_code == 200
+            detail = {"reachable": reachable, "status_code": response.status_code}
+        except requests.RequestException as e:
+            reachable = False
+            detail = {"reachable": False, "error": str(e)}
+        detail["latency_ms"] = round((time.monotonic() - started) * 1000, 1)
+        return detail
+
+    def check(self):
+        """Return (all reachable, {name: detail}), probing again when the cached result is stale"""
+        with self.lock:
+            if self.result is not None and time.monotonic() - self.checked_at < self.ttl:
+                return self.result
+            futures = {name: self.executor.submit(self.probe, url) for name, url in self.services.items()}
+            details = {name: future.result() for name, future in futures.items()}
+            self.result = (all(detail["reachable"] for detail in details.values()), details)
+            self.checked_at = time.monotonic()
+            return self.result
+
+
+def init_health(app, service, queue_depth=None, checks=None):
+    """
+    Serve GET /health/live and GET /health/ready for a Flask app.
+    queue_depth: optional callable returning the number of queued background jobs,
+                 added to the requests currently in flight
+    checks: optional {name: callable returning (ok, detail)} of extra readiness checks
+    """
+    from flask import jsonify, request
+    from common.metrics import REQUESTS_IN_FLIGHT
+
+    checks = checks or {}
+
+    @app.before_request
+    def reject_while_draining():
+        # Calls from a co-located service (monolith.py) belong to a request that is already running
+        if draining.is_set() and not request.path.startswith("/health") and not request.environ.get("horizon.local_call"):
+            response = jsonify({"error": "Service is shutting down"})
+            response.headers["Retry-After"] = "1"
+            return response, 503
+
+    @app.route('/health/live', methods=['GET'])
+    def liveness_check():
+        """Liveness endpoint, only fails when the process can't serve requests at all"""
+        return jsonify({"status": "alive", "service": service})
+
+    @app.route('/health/ready', methods=['GET'])
+    def readiness_check():
+        """Readiness endpoint, 503 while the service should not be sent traffic"""
+        reasons = []
+        if draining.is_set():
+            reasons.append("draining")
+
+        llm = llm_errors.snapshot()
+        if llm["calls"] >= LLM_ERROR_MIN_CALLS and llm["error_rate"] > LLM_ERROR_THRESHOLD:
+            reasons.append("llm_error_rate")
+
+        # The readiness request itself is in flight, so it is not counted
+        depth = max(0, REQUESTS_IN_FLIGHT.value(service=service) - 1)
+        if queue_depth is not None:
+            depth += queue_depth()
+        if depth > READY_MAX_QUEUE_DEPTH:
+            reasons.append("queue_depth")
+
+        results = {}
+        for name, check in checks.items():
+            ok, detail = check()
+            results[name] = detail
+            if not ok:
+                reasons.append(name)
+
+        payload = {
+            "status": "not_ready" if reasons else "ready",
+            "service": service,
+            "reasons": reasons,
+            "llm": llm,
+            "queue_depth": depth,
+            "checks": results
+        }
+        return jsonify(payload), 503 if reasons else 200
\ No newline at end of file
@@ -0,0 +1,217 @@
+"""
+backend/common/llm.py
+LLM Backend - Creates the model every service prompts
+
+MODEL_BACKEND selects the implementation:
+- gemini (default)  google.generativeai against gemini-2.5-pro (GEMINI_MODEL to change);
+                    needs GOOGLE_API_KEY, GEMINI_API_ENDPOINT optionally points the client
+                    at another Gemini-compatible server such as tools/fake_gemini.py
+- fake              in-process stand-in with templated answers per prompt family
+                    (common/fake_llm.py); no API key or google package needed
+
+The fake backend is tuned with FAKE_LLM_LATENCY_SCALE (multiplier for the per-family
+latency medians, 0 answers instantly), FAKE_LLM_ERROR_RATE and FAKE_LLM_SEED.
+Both backends expose generate_content(), start_chat() and send_message(), and their
+responses have .text and .usage_metadata.
+
+Services hold a LazyModel, so importing a service neither imports google.generativeai nor
+sets up a client; that happens on first use, or earlier in the background with
+start_prewarm(), whose readiness check stays failing until the model has answered a
+count_tokens call (MODEL_PREWARM=0 turns prewarming off).
+"""
+
+import os
+import random
+import threading
+import time
+
+from common.fake_llm import detect_family, fake_response_text, sample_latency, estimate_tokens
+
+MODEL_BACKEND = os.getenv("MODEL_BACKEND", "gemini")
+MODEL_NAME = os.getenv("GEMINI_MODEL", "gemini-2.5-pro")
+MODEL_PREWARM = os.getenv("MODEL_PREWARM", "1") == "1"
+MODEL_PREWARM_RETRY = float(os.getenv("MODEL_PREWARM_RETRY", 5))  # seconds, doubled per failure up to a minute
+
+gemini_configured = False
+gemini_lock = threading.Lock()
+
+# Shared by all fake models, so a model created per request (chat) doesn't restart the
+# latency and failure sequence. fake_model_time lets benchmarks subtract model time.
+fake_model_rng = random.Random(int(os.getenv("FAKE_LLM_SEED", 0)))
+fake_model_time = {"calls": 0, "seconds": 0.0}
+fake_model_lock = threading.Lock()
+
+
+class FakeModelError(Exception):
+    pass
+
+
+class FakeUsage:
+    def __init__(self, prompt_token_count, candidates_token_count):
+        self.prompt_token_count = prompt_token_count
+        self.candidates_token_count = candidates_token_count
+        self.total_token_count = prompt_token_count + candidates_token_count
+
+
+class FakeResponse:
+    def __init__(self, text, prompt):
+        self.text = text
+        self.usage_metadata = FakeUsage(estimate_tokens(prompt), estimate_tokens(text))
+
+
+class FakeModel:
+    """Offline stand-in for genai.GenerativeModel"""
+
+    def __init__(self, system_instruction=None, latency_scale=None, error_rate=None):
+        self.system_instruction = system_instruction or ""
+        self.latency_scale = float(os.getenv("FAKE_LLM_LATENCY_SCALE", 0)) if latency_scale is None else latency_scale
+        self.error_rate = float(os.getenv("FAKE_LLM_ERROR_RATE", 0)) if error_rate is None else error_rate
+
+    def generate_content(self, contents, generation_config=None, safety_settings=None, **kwargs):
+        started = time.perf_counter()
+        prompt = "\n".join([self.system_instruction] + self.texts(contents))
+        family = detect_family(prompt)
+        with fake_model_lock:
+            latency = sample_latency(family, fake_model_rng, self.latency_scale)
+            failed = fake_model_rng.random() < self.error_rate
+        if latency > 0:
+            time.sleep(latency)
+        try:
+            if failed:
+                raise FakeModelError(f"Injected {family} failure")
+            return FakeResponse(fake_response_text(prompt, family), prompt)
+        finally:
+            with fake_model_lock:
+                fake_model_time["calls"] += 1
+                fake_model_time["seconds"] += time.perf_counter() - started
+
+    def start_chat(self, history=None):
+        return FakeChatSession(self, history)
+
+    def count_tokens(self, contents):
+        return {"total_tokens": estimate_tokens("\n".join(self.texts(contents)))}
+
+    @staticmethod
+    def texts(contents):
+        """Plain text of a prompt given as a string, a list of parts or a list of content dicts"""
+        if isinstance(contents, str):
+            return [contents]
+        texts = []
+        for content in contents:
+            if isinstance(content, str):
+                texts.append(content)
+            elif isinstance(content, dict):
+                texts.extend(part for part in content.get("parts", []) if isinstance(part, str))
+        return texts
+
+
+class FakeChatSession:
+    def __init__(self, model, history=None):
+        self.model = model
+        self.history = list(history or [])
+
+    def send_message(self, content, generation_config=None, safety_settings=None, **kwargs):
+        response = self.model.generate_content(self.history + [{"role": "user", "parts": [content]}])
+        self.history += [{"role": "user", "parts": [content]}, {"role": "model", "parts": [response.text]}]
+        return response
+
+
+def check_config():
+    """Fail at startup on settings that would make every model call fail"""
+    if MODEL_BACKEND not in ("gemini", "fake"):
+        raise ValueError(f"Unknown MODEL_BACKEND: {MODEL_BACKEND}")
+    if MODEL_BACKEND == "gemini" and not os.getenv("GOOGLE_API_KEY"):
+        raise ValueError("No GOOGLE_API_KEY found in environment variables")
+
+
+def configure_gemini():
+    global gemini_configured
+    with gemini_lock:
+        if gemini_configured:
+            return
+        import google.generativeai as genai
+
+        api_key = os.getenv("GOOGLE_API_KEY")
+        if not api_key:
+            raise ValueError("No GOOGLE_API_KEY found in environment variables")
+
+        # GEMINI_TRANSPORT=rest avoids grpc, which blocks gevent workers (serve.py sets it for them)
+        endpoint = os.getenv("GEMINI_API_ENDPOINT")
+        transport = os.getenv("GEMINI_TRANSPORT") or ("rest" if endpoint else None)
+        options = {"api_key": api_key}
+        if transport:
+            options["transport"] = transport
+        if endpoint:
+            options["client_options"] = {"api_endpoint": endpoint}
+        genai.configure(**options)
+        gemini_configured = True
+
+
+def create_model(system_instruction=None):
+    """The configured model, optionally with a system instruction (used by chat)"""
+    check_config()
+    if MODEL_BACKEND == "fake":
+        return FakeModel(system_instruction)
+
+    configure_gemini()
+    import google.generativeai as genai
+    return genai.GenerativeModel(model_name=MODEL_NAME, system_instruction=system_instruction)
+
+
+class LazyModel:
+    """Creates the model on first use; the settings are still checked at startup"""
+
+    def __init__(self, system_instruction=None):
+        check_config()
+        self.system_instruction = system_instruction
+        self.model = None
+        self.lock = threading.Lock()
+        self.warm = False
+        self.error = None
+
+    def get(self):
+        if self.model is None:
+            with self.lock:
+                if self.model is None:
+                    self.model = create_model(self.system_instruction)
+        return self.model
+
+    def generate_content(self, *args, **kwargs):
+        return self.get().generate_content(*args, **kwargs)
+
+    def start_chat(self, *args, **kwargs):
+        return self.get().start_chat(*args, **kwargs)
+
+    def prewarm(self):
+        """Create the client and make one free call, so the first request pays for neither"""
+        started = time.perf_counter()
+        self.get().count_tokens("ping")
+        self.warm = True
+        self.error = None
+        print(f"Model ready in {time.perf_counter() - started:.2f}s ({MODEL_BACKEND})")
+
+
+def start_prewarm(model):
+    """
+    Prewarm model in a background thread, retrying until it works.
+    Returns a readiness check for init_health: not ready until the prewarm succeeded.
+    """
+    def run():
+        delay = MODEL_PREWARM_RETRY
+        while True:
+            try:
+                model.prewarm()
+                return
+            except Exception as e:
+                model.error = str(e)
+                print(f"Model prewarm failed, retrying in {delay:.0f}s: {str(e)}")
+                time.sleep(delay)
+                delay = min(delay * 2, 60)
+
+    if MODEL_PREWARM:
+        threading.Thread(target=run, name="model-prewarm", daemon=True).start()
+
+    def check():
+        return model.warm or not MODEL_PREWARM, {"backend": MODEL_BACKEND, "warm": model.warm, "error": model.error}
+
+    return check
\ No newline at end of file
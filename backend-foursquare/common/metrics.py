@@ -0,0 +1,278 @@
+"""
+backend/common/metrics.py
+Metrics - Prometheus-style counters, gauges and histograms with a /metrics endpoint
+
+init_metrics(app, "service-name") records per-route request latency and in-flight
+requests for a Flask app and serves everything registered here in the Prometheus text
+format on GET /metrics. Services add their own measurements (LLM calls, fallbacks,
+cache ratios, solver timing) through the shared metrics defined at the bottom.
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+from common import admission
+from common.health import record_llm_outcome
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+registry = []
+default_service = "unknown"
+
+
+def current_service():
+    """Name of the service handling the current request, used as the `service` label"""
+    try:
+        from flask import current_app, has_app_context
+        if has_app_context():
+            return current_app.config.get("SERVICE_NAME", default_service)
+    except ImportError:
+        pass
+    return default_service
+
+
+def format_labels(labelnames, values, extra=None):
+    pairs = list(zip(labelnames, values)) + list(extra or [])
+    if not pairs:
+        return ""
+    escaped = [(name, str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")) for name, value in pairs]
+    return "{" + ",".join(f'{name}="{value}"' for name, value in escaped) + "}"
+
+
+class Metric:
+    type = None
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.values = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def key(self, labels):
+        return tuple(labels.get(name, "") for name in self.labelnames)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self.lock:
+            items = list(self.values.items())
+        for labels, value in items:
+            lines.append(f"{self.name}{format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+
+class Gauge(Metric):
+    type = "gauge"
+
+    def set(self, value, **labels):
+        with self.lock:
+            self.values[self.key(labels)] = value
+
+    def inc(self, amount=1, **labels):
+        key = self.key(labels)
+        with self.lock:
+            self.values[key] = self.values.get(key, 0) + amount
+
+    def dec(self, amount=1, **labels):
+        self.inc(-amount, **labels)
+
+    def value(self, **labels):
+        with self.lock:
+            return self.values.get(self.key(labels), 0)
+
+    def total(self):
+        """Sum over every label combination"""
+        with self.lock:
+            return sum(self.values.values())
+
+
+class CallbackGauge(Metric):
+    """Gauge whose samples are read from a function at scrape time, e.g. cache statistics"""
+    type = "gauge"
+
+    def __init__(self, name, help, labelnames, callback):
+        super().__init__(name, help, labelnames)
+        self.callback = callback  # Returns a list of (labels dict, value)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        for labels, value in self.callback():
+            lines.append(f"{self.name}{format_labels(self.labelnames, self.key(labels))} {value}")
+        return lines
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labelnames)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value, **labels):
+        key = self.key(labels)
+        with self.lock:
+            counts, total, count = self.values.get(key, ([0] * len(self.buckets), 0.0, 0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self.values[key] = (counts, total + value, count + 1)
+
+    def snapshot(self, **labels):
+        """Cumulative bucket counts, sum and count of one label set, for JSON stats endpoints"""
+        with self.lock:
+            counts, total, count = self.values.get(self.key(labels), ([0] * len(self.buckets), 0.0, 0))
+            counts = list(counts)
+        buckets = {str(bound): bucket_count for bound, bucket_count in zip(self.buckets, counts)}
+        buckets["+Inf"] = count
+        return {"buckets": buckets, "sum": round(total, 4), "count": count}
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.type}"]
+        with self.lock:
+            items = [(labels, list(counts), total, count) for labels, (counts, total, count) in self.values.items()]
+        for labels, counts, total, count in items:
+            # Bucket counts are cumulative since an observation counts in every bucket it fits
+            for bound, bucket_count in zip(self.buckets, counts):
+                lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', bound)])} {bucket_count}")
+            lines.append(f"{self.name}_bucket{format_labels(self.labelnames, labels, [('le', '+Inf')])} {count}")
+            lines.append(f"{self.name}_sum{format_labels(self.labelnames, labels)} {total}")
+            lines.append(f"{self.name}_count{format_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+def render_metrics():
+    lines = []
+    for metric in registry:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
+
+
+# Metrics shared by every service
+
+REQUEST_LATENCY = Histogram(
+    "horizon_http_request_duration_seconds", "Request latency per route",
+    ("service", "method", "route", "status")
+)
+REQUESTS_IN_FLIGHT = Gauge(
+    "horizon_http_requests_in_flight", "Requests currently being handled", ("service",)
+)
+LLM_LATENCY = Histogram(
+    "horizon_llm_request_duration_seconds", "Latency of Gemini calls per prompt family",
+    ("service", "prompt", "status")
+)
+LLM_TOKENS = Counter(
+    "horizon_llm_tokens_total", "Gemini tokens used per prompt family",
+    ("service", "prompt", "kind")
+)
+FALLBACKS = Counter(
+    "horizon_fallbacks_total", "How often a fallback path was used instead of the primary one",
+    ("service", "fallback")
+)
+ADMISSION_REJECTIONS = Counter(
+    "horizon_admission_rejections_total", "Requests turned away by admission control",
+    ("service", "endpoint", "reason")
+)
+ADMISSION_QUEUE = CallbackGauge(
+    "horizon_admission_requests", "Requests running and queued per admission-controlled endpoint",
+    ("endpoint", "state"),
+    lambda: [
+        ({"endpoint": controller.name, "state": state}, value)
+        for controller in admission.controllers
+        for state, value in controller.stats().items()
+    ]
+)
+
+
+class LLMCall:
+    def __init__(self):
+        self.response = None
+
+    def record(self, response):
+        """Remember the Gemini response so its token usage is counted"""
+        self.response = response
+
+
+@contextmanager
+def track_llm(prompt):
+    """Time a Gemini call and count its tokens, e.g.
+        with track_llm("itinerary") as llm_call:
+            response = model.generate_content(...)
+            llm_call.record(response)
+    """
+    service = current_service()
+    llm_call = LLMCall()
+    started = time.perf_counter()
+    status = "ok"
+    try:
+        yield llm_call
+    except Exception:
+        status = "error"
+        raise
+    finally:
+        LLM_LATENCY.observe(time.perf_counter() - started, service=service, prompt=prompt, status=status)
+        record_llm_outcome(status == "ok")
+        usage = getattr(llm_call.response, "usage_metadata", None)
+        if usage is not None:
+            LLM_TOKENS.inc(getattr(usage, "prompt_token_count", 0) or 0, service=service, prompt=prompt, kind="prompt")
+            LLM_TOKENS.inc(getattr(usage, "candidates_token_count", 0) or 0, service=service, prompt=prompt, kind="completion")
+
+
+def count_fallback(fallback):
+    FALLBACKS.inc(service=current_service(), fallback=fallback)
+
+
+def count_admission_rejection(endpoint, reason):
+    ADMISSION_REJECTIONS.inc(service=current_service(), endpoint=endpoint, reason=reason)
+
+
+def init_metrics(app, service):
+    """Record latency and in-flight requests for a Flask app and serve GET /metrics"""
+    global default_service
+    default_service = service
+    app.config["SERVICE_NAME"] = service
+
+    from flask import g, request, Response
+
+    @app.before_request
+    def start_timer():
+        g.metrics_started = time.perf_counter()
+        REQUESTS_IN_FLIGHT.inc(service=service)
+
+    @app.after_request
+    def record_latency(response):
+        started = g.pop("metrics_started", None)
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            REQUEST_LATENCY.observe(
+                time.perf_counter() - started,
+                service=service, method=request.method, route=route, status=response.status_code
+            )
+        return response
+
+    @app.teardown_request
+    def finish_request(error=None):
+        REQUESTS_IN_FLIGHT.dec(service=service)
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus metrics endpoint"""
+        return Response(render_metrics(), mimetype="text/plain; version=0.0.4")
@@ -0,0 +1,41 @@
+"""
+backend/common/serialization.py
+Serialization - orjson-backed JSON for Flask
+
+use_orjson(app) makes jsonify, request.json and app.json use orjson, which encodes
+itineraries and booking payloads several times faster than the json module and writes
+the bytes straight into the response. Output is always compact, also in debug mode.
+orjson is optional; without it the app keeps Flask's default provider.
+"""
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # orjson is optional
+    orjson = None
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    def options(self):
+        options = orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        return options
+
+    def dumps(self, obj, **kwargs):
+        return orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.options()).decode("utf-8")
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        body = orjson.dumps(obj, default=DefaultJSONProvider.default, option=self.options() | orjson.OPT_APPEND_NEWLINE)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+
+def use_orjson(app):
+    """Switch a Flask app's JSON provider to orjson when it is installed"""
+    if orjson is not None:
+        app.json = OrjsonProvider(app)
\ No newline at end of file
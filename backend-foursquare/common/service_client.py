@@ -0,0 +1,128 @@
+"""
+backend/common/service_client.py
+Service Client - Calls between services, over HTTP or in-process when they share a process
+
+Services call each other through get() / post(), which take the same arguments as
+requests.get / requests.post. Normally that is exactly what they do. When the services are
+mounted in one process (monolith.py), each app is registered under the base URL the other
+services use for it, and calls to that URL are dispatched straight into the app through
+WSGI: no socket, connection pool or HTTP parsing, and the caller's thread runs the request.
+
+Local responses offer the parts of requests.Response the services use: status_code,
+headers, content, text, json(), raw.stream() and close(). As with requests, content is
+decoded by its Content-Encoding while raw.stream() gives the body as sent. The timeout argument is not
+enforced for local calls; the X-Request-Deadline header still is, by the called service.
+"""
+
+import contextvars
+import json
+from urllib.parse import urlsplit
+
+import requests
+
+from common.compression import decompress
+
+local_apps = {}  # base URL without trailing slash -> WSGI app
+
+
+def register_local(base_url, app):
+    """Dispatch calls to base_url into app instead of sending them over HTTP"""
+    local_apps[base_url.rstrip("/")] = app
+
+
+def find_local(url):
+    """(app, path below the base URL) for a registered URL, or (None, None)"""
+    for base_url, app in local_apps.items():
+        if url == base_url or url.startswith(base_url + "/") or url.startswith(base_url + "?"):
+            return app, url[len(base_url):] or "/"
+    return None, None
+
+
+class LocalStream:
+    """Stands in for urllib3's raw response, so relays can stream a local body"""
+
+    def __init__(self, body):
+        self.body = body
+
+    def stream(self, chunk_size=None, decode_content=False):
+        for chunk in self.body:
+            if chunk:
+                yield chunk
+
+
+class LocalResponse:
+    def __init__(self, status, headers, body, url):
+        self.status_code = int(status.split(" ", 1)[0])
+        self.reason = status.split(" ", 1)[1] if " " in status else ""
+        self.headers = headers
+        self.url = url
+        self.body = body
+        self.raw = LocalStream(body)
+        self._content = None
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def content(self):
+        if self._content is None:
+            self._content = decompress(b"".join(self.body), self.headers.get("Content-Encoding"))
+            self.close()
+        return self._content
+
+    @property
+    def text(self):
+        return self.content.decode("utf-8")
+
+    def json(self):
+        return json.loads(self.content)
+
+    def close(self):
+        close = getattr(self.body, "close", None)
+        if close is not None:
+            close()
+
+
+def dispatch(app, method, url, path, params=None, json_body=None, data=None, headers=None):
+    from werkzeug.test import EnvironBuilder, run_wsgi_app
+
+    parts = urlsplit(url)
+    builder = EnvironBuilder(
+        path=urlsplit(path).path,
+        base_url=f"{parts.scheme}://{parts.netloc}",
+        query_string=parts.query or None,
+        method=method,
+        headers=headers,
+        json=json_body,
+        data=data
+    )
+    if params:
+        builder.args.update(params)
+    try:
+        environ = builder.get_environ()
+    finally:
+        builder.close()
+    environ["horizon.local_call"] = True
+
+    # A copy of the caller's context, so the called app's request state (trace span,
+    # deadline) can't leak back into the caller's request
+    body, status, response_headers = contextvars.copy_context().run(run_wsgi_app, app, environ)
+    return LocalResponse(status, response_headers, body, url)
+
+
+def request(method, url, params=None, json=None, data=None, headers=None, timeout=None, stream=False):
+    app, path = find_local(url)
+    if app is None:
+        return requests.request(
+            method, url, params=params, json=json, data=data, headers=headers, timeout=timeout, stream=stream
+        )
+    return dispatch(app, method, url, path, params, json, data, headers)
+
+
+def get(url, params=None, **kwargs):
+    return request("GET", url, params=params, **kwargs)
+
+
+def post(url, json=None, **kwargs):
+    return request("POST", url, json=json, **kwargs)
\ No newline at end of file
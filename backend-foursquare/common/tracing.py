@@ -0,0 +1,221 @@
+"""
+backend/common/tracing.py
+Tracing - W3C trace-context propagation and spans for every service
+
+Each incoming request gets a server span, continuing the trace from its `traceparent`
+header when there is one. Code wraps the interesting steps (LLM calls, JSON parsing,
+route solving) in `with span("name"):` and forwards `trace_headers()` on every
+outgoing service call, so one trace covers gateway -> trip_planner -> router.
+
+Finished spans are exported in the background, set TRACE_EXPORT to:
+- jsonl:/path/to/traces.jsonl   append one JSON span per line (works offline)
+- http://localhost:4319/spans   POST batches of spans as a JSON array to a local collector
+Without TRACE_EXPORT, trace ids are still propagated but spans are not exported.
+"""
+
+import contextvars
+import json
+import os
+import queue
+import re
+import secrets
+import threading
+import time
+from contextlib import contextmanager
+
+TRACE_EXPORT = os.getenv("TRACE_EXPORT", "")
+
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+current_span = contextvars.ContextVar("current_span", default=None)
+
+
+class Span:
+    def __init__(self, name, service, trace_id=None, parent_id=None, sampled=True, attributes=None):
+        self.name = name
+        self.service = service
+        self.trace_id = trace_id or secrets.token_hex(16)
+        self.span_id = secrets.token_hex(8)
+        self.parent_id = parent_id
+        self.sampled = sampled
+        self.attributes = dict(attributes or {})
+        self.status = "ok"
+        self.start_time = time.time()
+        self.end_time = None
+
+    @property
+    def traceparent(self):
+        return f"00-{self.trace_id}-{self.span_id}-{'01' if self.sampled else '00'}"
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def record_error(self, error):
+        self.status = "error"
+        self.attributes["error"] = str(error)
+
+    def end(self):
+        if self.end_time is None:
+            self.end_time = time.time()
+            if self.sampled:
+                exporter.export(self)
+
+    def to_dict(self):
+        return {
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "service": self.service,
+            "start_time": self.start_time,
+            "end_time": self.end_time,
+            "duration_ms": round((self.end_time - self.start_time) * 1000, 3),
+            "status": self.status,
+            "attributes": self.attributes
+        }
+
+
+class SpanExporter:
+    """Ships finished spans from a background thread so requests never wait on export"""
+
+    def __init__(self, target):
+        self.target = target
+        self.queue = queue.Queue(maxsize=10000)
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def export(self, span):
+        if not self.target:
+            return
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(span.to_dict())
+        except queue.Full:
+            pass  # Drop spans rather than slow the service down
+
+    def ensure_started(self):
+        with self.lock:
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="span-exporter", daemon=True)
+                self.thread.start()
+
+    def run(self):
+        while True:
+            batch = [self.queue.get()]
+            while len(batch) < 500:
+                try:
+                    batch.append(self.queue.get(timeout=0.5))
+                except queue.Empty:
+                    break
+            try:
+                self.write(batch)
+            except Exception as e:
+                print(f"Span export failed: {str(e)}")
+
+    def write(self, batch):
+        if self.target.startswith("jsonl:"):
+            with open(self.target[len("jsonl:"):], "a") as f:
+                for span in batch:
+                    f.write(json.dumps(span) + "\n")
+        elif self.target.startswith(("http://", "https://")):
+            import requests
+            requests.post(self.target, json=batch, timeout=5)
+
+
+exporter = SpanExporter(TRACE_EXPORT)
+service_name = "unknown"
+
+
+def parse_traceparent(header):
+    """Return (trace_id, parent_span_id, sampled) from a traceparent header, or None"""
+    match = TRACEPARENT_RE.match((header or "").strip().lower())
+    if not match or match.group(1) == "0" * 32 or match.group(2) == "0" * 16:
+        return None
+    return match.group(1), match.group(2), int(match.group(3), 16) & 1 == 1
+
+
+@contextmanager
+def span(name, **attributes):
+    """Time a block of work as a child of the current span"""
+    parent = current_span.get()
+    child = Span(
+        name,
+        parent.service if parent else service_name,
+        trace_id=parent.trace_id if parent else None,
+        parent_id=parent.span_id if parent else None,
+        sampled=parent.sampled if parent else True,
+        attributes=attributes
+    )
+    token = current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.record_error(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def trace_headers(headers=None):
+    """Headers for an outgoing service call, carrying the current trace context"""
+    headers = dict(headers or {})
+    active = current_span.get()
+    if active is not None:
+        headers["traceparent"] = active.traceparent
+    return headers
+
+
+def propagate(fn):
+    """Wrap fn so it runs in the current trace context, e.g. when handed to a thread pool"""
+    context = contextvars.copy_context()
+    return lambda *args, **kwargs: context.run(fn, *args, **kwargs)
+
+
+def init_tracing(app, name):
+    """Start a server span for every request handled by a Flask app"""
+    global service_name
+    service_name = name
+
+    from flask import g, request
+
+    @app.before_request
+    def start_request_span():
+        parent = parse_traceparent(request.headers.get("traceparent"))
+        trace_id, parent_id, sampled = parent if parent else (None, None, True)
+        server_span = Span(
+            f"{request.method} {request.path}",
+            name,
+            trace_id=trace_id,
+            parent_id=parent_id,
+            sampled=sampled,
+            attributes={"http.method": request.method, "http.target": request.path}
+        )
+        g.trace_span = server_span
+        g.trace_token = current_span.set(server_span)
+
+    @app.after_request
+    def tag_response(response):
+        server_span = g.get("trace_span")
+        if server_span is not None:
+            server_span.set_attribute("http.status_code", response.status_code)
+            if request.url_rule is not None:
+                server_span.set_attribute("http.route", request.url_rule.rule)
+            if response.status_code >= 500:
+                server_span.status = "error"
+            response.headers["traceparent"] = server_span.traceparent
+        return response
+
+    @app.teardown_request
+    def end_request_span(error=None):
+        server_span = g.pop("trace_span", None)
+        if server_span is None:
+            return
+        if error is not None:
+            server_span.record_error(error)
+        server_span.end()
+        try:
+            current_span.reset(g.pop("trace_token"))
+        except ValueError:
+            # Teardown ran in a different context than before_request
+            current_span.set(None)
@@ -0,0 +1,71 @@
+"""
+backend/monolith.py
+Monolith Mode - Runs all five services in one process, calling each other in-process
+
+Usage:
+    python monolith.py          # serves the gateway API on PORT (default 6000)
+
+The gateway serves the root path, the other services are mounted below /trip-planner,
+/router, /recommendation and /booking (so their /health, /metrics and endpoints stay
+reachable). Calls to another service's URL (TRIP_PLANNER_URL, ROUTER_URL, ...) go through
+common/service_client.py straight into that service's app instead of over HTTP, which
+saves the gateway -> trip_planner -> router chain two HTTP hops per plan.
+
+Running each service's app.py on its own (microservice mode) is unchanged.
+"""
+
+import importlib.util
+import os
+import sys
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+from common import service_client
+
+# Service directory -> path prefix it is mounted under
+MOUNTS = {
+    "trip_planner": "/trip-planner",
+    "router": "/router",
+    "recommendation": "/recommendation",
+    "booking": "/booking",
+}
+
+
+def load_service(service):
+    """Import a service's app.py under a unique module name, e.g. trip_planner_app"""
+    name = f"{service}_app"
+    if name in sys.modules:
+        return sys.modules[name]
+    directory = os.path.join(BACKEND_DIR, service)
+    if directory not in sys.path:
+        sys.path.insert(0, directory)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(directory, "app.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+def create_monolith():
+    """Load every service, route their calls to each other in-process and return the WSGI app"""
+    from werkzeug.middleware.dispatcher import DispatcherMiddleware
+
+    services = {service: load_service(service) for service in list(MOUNTS) + ["api_gateway"]}
+    gateway = services["api_gateway"]
+
+    service_client.register_local(gateway.TRIP_PLANNER_URL, services["trip_planner"].app)
+    service_client.register_local(gateway.ROUTER_URL, services["router"].app)
+    service_client.register_local(gateway.RECOMMENDATION_URL, services["recommendation"].app)
+    service_client.register_local(gateway.BOOKING_URL, services["booking"].app)
+    # The trip planner has its own setting for the router
+    service_client.register_local(services["trip_planner"].ROUTER_URL, services["router"].app)
+
+    return DispatcherMiddleware(gateway.app, {prefix: services[service].app for service, prefix in MOUNTS.items()})
+
+
+if __name__ == '__main__':
+    from werkzeug.serving import run_simple
+
+    port = int(os.getenv("PORT", 6000))
+    run_simple('0.0.0.0', port, create_monolith(), threaded=True)
\ No newline at end of file
@@ -4,28 +4,69 @@ Recommendation Service - Personalized location and activity recommendations
 """
 
 import os
+import sys
 import json
+import time
 import random
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
 import requests
 
+# Shared modules live in backend-foursquare/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tracing import init_tracing, span, propagate
+from common.metrics import init_metrics, track_llm, count_fallback
+from common.serialization import use_orjson
+from common.compression import init_compression
+from common.health import init_health
+from common.admission import AdmissionController, init_admission, deadline_exceeded
+from common.llm import LazyModel, start_prewarm
+
 # Load environment variables
 load_dotenv()
 
 # Initialize the Flask application
 app = Flask(__name__)
 CORS(app)
+init_tracing(app, "recommendation")
+init_metrics(app, "recommendation")
+use_orjson(app)
+init_compression(app)
+
+# Gemini model, or the offline stand-in with MODEL_BACKEND=fake (see common/llm.py).
+# Created on first use so startup stays fast; start_prewarm does it ahead of traffic.
+model = LazyModel()
+
+init_health(app, "recommendation", checks={"model": start_prewarm(model)})
+
+# Admission control for /recommend: at most RECOMMEND_CONCURRENCY Gemini-bound requests
+# run at once, up to RECOMMEND_QUEUE more wait, the rest get 503 with Retry-After
+init_admission(app)
+recommend_admission = AdmissionController(
+    "recommend",
+    int(os.getenv("RECOMMEND_CONCURRENCY", 8)),
+    int(os.getenv("RECOMMEND_QUEUE", 32)),
+    float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+)
 
-# Initialize Gemini AI with API key
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("No GOOGLE_API_KEY found in environment variables")
+# Per-location memo of Gemini recommendations, keyed by place, preferences, trip context
+# and count, so a location asked for again (alone or in a batch) costs no Gemini call
+RECOMMEND_MEMO_TTL = float(os.getenv("RECOMMEND_MEMO_TTL", 600))
+RECOMMEND_MEMO_SIZE = int(os.getenv("RECOMMEND_MEMO_SIZE", 1000))
+recommendation_memo = OrderedDict()  # key -> (expires at, recommendations)
+recommendation_memo_lock = threading.Lock()
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(model_name="gemini-2.5-pro")
+# /recommend/batch: memo misses go to Gemini RECOMMEND_BATCH_CHUNK locations per prompt,
+# with up to RECOMMEND_BATCH_WORKERS prompts at once. Every prompt beyond the first runs on
+# a free recommend_admission slot of its own, so a batch never exceeds RECOMMEND_CONCURRENCY
+RECOMMEND_BATCH_MAX = int(os.getenv("RECOMMEND_BATCH_MAX", 50))
+RECOMMEND_BATCH_CHUNK = int(os.getenv("RECOMMEND_BATCH_CHUNK", 5))
+RECOMMEND_BATCH_WORKERS = int(os.getenv("RECOMMEND_BATCH_WORKERS", 4))
+batch_executor = ThreadPoolExecutor(max_workers=RECOMMEND_BATCH_WORKERS)
 
 # Foursquare API credentials (for future implementation)
 FOURSQUARE_API_KEY = os.getenv("FOURSQUARE_API_KEY")
@@ -36,6 +77,7 @@ def health_check():
     return jsonify({"status": "healthy", "service": "recommendation"})
 
 @app.route('/recommend', methods=['POST'])
+@recommend_admission.admit()
 def recommend():
     """
     Get personalized recommendations based on location and preferences
@@ -77,12 +119,147 @@ def recommend():
                 return jsonify({"recommendations": foursquare_recs}), 200
         
         # Fall back to Gemini for recommendations
-        gemini_recs = get_gemini_recommendations(location, preferences, trip_context, count)
+        key = memo_key(location, preferences, trip_context, count)
+        gemini_recs = memo_get(key)
+        if gemini_recs is None:
+            gemini_recs = get_gemini_recommendations(location, preferences, trip_context, count, memo=key)
         return jsonify({"recommendations": gemini_recs}), 200
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/recommend/batch', methods=['POST'])
+@recommend_admission.admit()
+def recommend_batch():
+    """
+    Get recommendations for many locations with shared preferences, e.g. every stop of
+    an itinerary, in one request
+    Expected input:
+    {
+        "locations": [
+            {"name": "Amber Fort", "lat": 26.9855, "lng": 75.8513},
+            {"name": "Hawa Mahal", "lat": 26.9239, "lng": 75.8267}
+        ],
+        "preferences": {...},  // As for /recommend
+        "trip_context": {...},  // As for /recommend
+        "count": 5  // Recommendations per location
+    }
+    Locations already answered recently come from the memo; the rest are asked from
+    Gemini a few per prompt, with the prompts running concurrently on free admission slots.
+    """
+    data = request.json
+    locations = data.get('locations', [])
+    preferences = data.get('preferences', {})
+    trip_context = data.get('trip_context', {})
+    count = data.get('count', 5)
+    
+    if not locations:
+        return jsonify({"error": "Locations are required"}), 400
+    if len(locations) > RECOMMEND_BATCH_MAX:
+        return jsonify({"error": f"At most {RECOMMEND_BATCH_MAX} locations per batch"}), 400
+    if any(not all(field in location for field in ('name', 'lat', 'lng')) for location in locations):
+        return jsonify({"error": "Every location needs a name, lat and lng"}), 400
+    
+    try:
+        results = [None] * len(locations)
+        misses = {}  # memo key -> indices of the locations it answers
+        for i, location in enumerate(locations):
+            key = memo_key(location, preferences, trip_context, count)
+            recommendations = memo_get(key)
+            if recommendations is not None:
+                results[i] = {"location": location, "recommendations": recommendations, "source": "memo"}
+            else:
+                misses.setdefault(key, []).append(i)
+        
+        # Repeated locations in the batch are only asked for once
+        keys = list(misses)
+        chunks = [keys[i:i + RECOMMEND_BATCH_CHUNK] for i in range(0, len(keys), RECOMMEND_BATCH_CHUNK)]
+        answers = run_batch_chunks(
+            chunks,
+            lambda chunk: get_gemini_batch_recommendations(
+                [locations[misses[key][0]] for key in chunk], preferences, trip_context, count, chunk
+            )
+        )
+        for chunk, answer in zip(chunks, answers):
+            for key, (recommendations, source) in zip(chunk, answer):
+                for i in misses[key]:
+                    results[i] = {"location": locations[i], "recommendations": recommendations, "source": source}
+        
+        return jsonify({
+            "results": results,
+            "memo_hits": len(locations) - sum(len(indices) for indices in misses.values()),
+            "prompts": len(chunks)
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def run_batch_chunks(chunks, run_chunk):
+    """
+    run_chunk for every chunk, in lanes that each hold one recommend_admission slot: the
+    request's own, plus as many free ones as can be taken without queueing. A lane runs
+    its chunks one after the other. Returns the answers in the order of chunks.
+    """
+    extra_lanes = 0
+    while extra_lanes < min(RECOMMEND_BATCH_WORKERS, len(chunks)) - 1 and recommend_admission.try_acquire():
+        extra_lanes += 1
+    lanes = extra_lanes + 1
+    answers = [None] * len(chunks)
+
+    def run_lane(lane):
+        for i in range(lane, len(chunks), lanes):
+            answers[i] = run_chunk(chunks[i])
+
+    def run_extra_lane(lane):
+        started = time.monotonic()
+        try:
+            run_lane(lane)
+        finally:
+            recommend_admission.release(time.monotonic() - started)
+
+    futures = []
+    try:
+        for lane in range(1, lanes):
+            futures.append(batch_executor.submit(propagate(run_extra_lane), lane))
+    except Exception:
+        # Slots of lanes that never started go back at once
+        for _ in range(lanes - 1 - len(futures)):
+            recommend_admission.release(0.0)
+        raise
+    run_lane(0)
+    for future in futures:
+        future.result()
+    return answers
+
+def memo_key(location, preferences, trip_context, count):
+    """Memo key of a request: the place to about 100 m, and everything else as given"""
+    return json.dumps(
+        [str(location.get('name', '')).strip().lower(), round(float(location['lat']), 3), round(float(location['lng']), 3),
+         preferences, trip_context, count],
+        sort_keys=True
+    )
+
+def memo_get(key):
+    with recommendation_memo_lock:
+        entry = recommendation_memo.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.monotonic():
+            del recommendation_memo[key]
+            return None
+        recommendation_memo.move_to_end(key)
+        return json.loads(json.dumps(entry[1]))
+
+def memo_put(key, recommendations):
+    if RECOMMEND_MEMO_TTL <= 0:
+        return
+    with recommendation_memo_lock:
+        recommendation_memo[key] = (time.monotonic() + RECOMMEND_MEMO_TTL, json.loads(json.dumps(recommendations)))
+        recommendation_memo.move_to_end(key)
+        # Forget the least recently used entries so the memo stays bounded
+        while len(recommendation_memo) > RECOMMEND_MEMO_SIZE:
+            recommendation_memo.popitem(last=False)
+
 def get_foursquare_recommendations(location, preferences, count):
     """
     Get recommendations from Foursquare API
@@ -91,10 +268,8 @@ def get_foursquare_recommendations(location, preferences, count):
     # In a real implementation, you would call the Foursquare API here
     return None
 
-def get_gemini_recommendations(location, preferences, trip_context, count):
-    """
-    Get recommendations using Gemini AI
-    """
+def preference_details(preferences, trip_context):
+    """The preference lines shared by the single and the batch recommendation prompts"""
     # Extract preferences
     interests = preferences.get('interests', [])
     budget = preferences.get('budget', 'medium')
@@ -115,23 +290,15 @@ def get_gemini_recommendations(location, preferences, trip_context, count):
     children_str = "The recommendations should be suitable for children." if with_children else ""
     elderly_str = "The recommendations should be suitable for elderly travelers." if with_elderly else ""
     
-    prompt = f"""
-    You are a travel recommendation expert. I need recommendations for places to visit in {location['name']} (coordinates: {location['lat']}, {location['lng']}).
-    
-    Here are the details:
-    - Interests: {interests_str}
+    return f"""- Interests: {interests_str}
     - Budget level: {budget}
     - Dietary preferences: {dietary_str}
     - Trip duration: {duration} days
     {accessibility_str}
     {children_str}
-    {elderly_str}
-    
-    Please provide {count} specific recommendations. Format your response as a JSON array of objects with the following structure:
-    
-    ```json
-    [
-      {{
+    {elderly_str}"""
+
+RECOMMENDATION_FORMAT = """{
         "name": "Place name",
         "type": "museum/restaurant/landmark/park/etc",
         "description": "Brief description",
@@ -143,14 +310,77 @@ def get_gemini_recommendations(location, preferences, trip_context, count):
         "kid_friendly": true/false,
         "wheelchair_accessible": true/false,
         "image_query": "search query to find image of this place"
-      }}
+      }"""
+
+def extract_json_text(text, opener='[', closer=']'):
+    """The ```json block of a Gemini response, or the outermost opener...closer span"""
+    json_start = text.find('```json') + 7
+    if json_start < 7:  # If no ```json marker is found
+        json_start = text.find(opener)
+        json_end = text.rfind(closer) + 1
+    else:
+        json_end = text.find('```', json_start)
+    return text[json_start:json_end].strip()
+
+def finish_recommendations(recommendations, location, count):
+    """Pad to count and fill in image queries"""
+    # Ensure we have the requested number of recommendations
+    if len(recommendations) < count:
+        # If we have fewer recommendations than requested, duplicate some with variations
+        while len(recommendations) < count:
+            # Choose a random recommendation to duplicate
+            rec = random.choice(recommendations)
+            # Create a variation
+            variation = rec.copy()
+            variation['name'] = f"Alternative to {rec['name']}"
+            variation['description'] = f"Similar to {rec['name']}. {rec['description']}"
+            # Slightly modify coordinates
+            variation['lat'] = rec['lat'] + (random.random() - 0.5) * 0.01
+            variation['lng'] = rec['lng'] + (random.random() - 0.5) * 0.01
+            # Add to recommendations
+            recommendations.append(variation)
+    
+    # Add image URLs if we had real image services
+    for rec in recommendations:
+        # In a real implementation, you would fetch images from an API
+        # For now, we'll add a placeholder image query
+        if 'image_query' not in rec:
+            rec['image_query'] = f"{rec['name']} {location['name']} tourist attraction"
+    
+    return recommendations
+
+def get_gemini_recommendations(location, preferences, trip_context, count, memo=None):
+    """
+    Get recommendations using Gemini AI; with a memo key, a successful answer is memoized
+    """
+    try:
+        return ask_gemini_recommendations(location, preferences, trip_context, count, memo)
+    except Exception as e:
+        # If JSON parsing fails, return a simple fallback response
+        print(f"Gemini recommendation generation failed: {str(e)}")
+        count_fallback("recommendations")
+        return generate_fallback_recommendations(location, count)
+
+def ask_gemini_recommendations(location, preferences, trip_context, count, memo=None):
+    """One location's recommendations from Gemini; raises when the answer can't be used"""
+    prompt = f"""
+    You are a travel recommendation expert. I need recommendations for places to visit in {location['name']} (coordinates: {location['lat']}, {location['lng']}).
+    
+    Here are the details:
+    {preference_details(preferences, trip_context)}
+    
+    Please provide {count} specific recommendations. Format your response as a JSON array of objects with the following structure:
+    
+    ```json
+    [
+      {RECOMMENDATION_FORMAT}
     ]
     ```
     
     Ensure all recommendations have realistic latitude and longitude coordinates close to the location specified. The estimated cost should be in Indian Rupees (INR). The estimated time should be the recommended time to spend at the location.
     """
     
-    try:
+    with span("llm.generate_content", prompt="recommendations"), track_llm("recommendations") as llm_call:
         response = model.generate_content(
             prompt,
             generation_config={
@@ -160,47 +390,97 @@ def get_gemini_recommendations(location, preferences, trip_context, count):
                 "max_output_tokens": 8192,
             }
         )
-        
-        # Extract the JSON response from Gemini
-        json_start = response.text.find('```json') + 7
-        if json_start < 7:  # If no ```json marker is found
-            json_start = response.text.find('[')
-            json_end = response.text.rfind(']') + 1
-        else:
-            json_end = response.text.find('```', json_start)
-        
-        json_str = response.text[json_start:json_end].strip()
+        llm_call.record(response)
+    
+    # Extract the JSON response from Gemini
+    json_str = extract_json_text(response.text)
+    with span("parse.recommendations"):
         recommendations = json.loads(json_str)
-        
-        # Ensure we have the requested number of recommendations
-        if len(recommendations) < count:
-            # If we have fewer recommendations than requested, duplicate some with variations
-            while len(recommendations) < count:
-                # Choose a random recommendation to duplicate
-                rec = random.choice(recommendations)
-                # Create a variation
-                variation = rec.copy()
-                variation['name'] = f"Alternative to {rec['name']}"
-                variation['description'] = f"Similar to {rec['name']}. {rec['description']}"
-                # Slightly modify coordinates
-                variation['lat'] = rec['lat'] + (random.random() - 0.5) * 0.01
-                variation['lng'] = rec['lng'] + (random.random() - 0.5) * 0.01
-                # Add to recommendations
-                recommendations.append(variation)
-        
-        # Add image URLs if we had real image services
-        for rec in recommendations:
-            # In a real implementation, you would fetch images from an API
-            # For now, we'll add a placeholder image query
-            if 'image_query' not in rec:
-                rec['image_query'] = f"{rec['name']} {location['name']} tourist attraction"
-        
-        return recommendations
     
+    recommendations = finish_recommendations(recommendations, location, count)
+    if memo is not None:
+        memo_put(memo, recommendations)
+    return recommendations
+
+def get_gemini_batch_recommendations(locations, preferences, trip_context, count, memo_keys):
+    """
+    Recommendations for several locations from one Gemini prompt, split back per location.
+    Returns [(recommendations, source)] in the order of locations; a location missing from
+    an answer that parsed is asked for on its own. When the batch call itself fails every
+    location falls back, so one failure doesn't turn into a Gemini call per location.
+    """
+    locations_str = "\n".join(
+        f"    {i + 1}. {location['name']} (coordinates: {location['lat']}, {location['lng']})"
+        for i, location in enumerate(locations)
+    )
+    
+    prompt = f"""
+    You are a multi-location travel recommendation expert. I need recommendations for places to visit around each of these locations:
+    
+{locations_str}
+    
+    Here are the details, the same for every location:
+    {preference_details(preferences, trip_context)}
+    
+    Please provide {count} specific recommendations for each location. Format your response as a JSON object keyed by the location number, each value a JSON array of objects with the following structure:
+    
+    ```json
+    {{
+      "1": [
+        {RECOMMENDATION_FORMAT}
+      ]
+    }}
+    ```
+    
+    Ensure all recommendations have realistic latitude and longitude coordinates close to their location. The estimated cost should be in Indian Rupees (INR). The estimated time should be the recommended time to spend at the location.
+    """
+    
+    answers = {}
+    batch_failed = False
+    try:
+        with span("llm.generate_content", prompt="recommendations_batch", locations=len(locations)), \
+                track_llm("recommendations_batch") as llm_call:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": 0.7,
+                    "top_p": 0.95,
+                    "top_k": 40,
+                    "max_output_tokens": 8192,
+                }
+            )
+            llm_call.record(response)
+        
+        with span("parse.recommendations_batch"):
+            answers = json.loads(extract_json_text(response.text, '{', '}'))
+        if not isinstance(answers, dict):
+            answers = {}
     except Exception as e:
-        # If JSON parsing fails, return a simple fallback response
-        print(f"Gemini recommendation generation failed: {str(e)}")
-        return generate_fallback_recommendations(location, count)
+        print(f"Gemini batch recommendation generation failed: {str(e)}")
+        count_fallback("recommendations_batch")
+        batch_failed = True
+    
+    results = []
+    for i, (location, key) in enumerate(zip(locations, memo_keys)):
+        recommendations = answers.get(str(i + 1))
+        if isinstance(recommendations, list) and recommendations and all(
+            isinstance(rec, dict) and 'name' in rec and 'lat' in rec and 'lng' in rec for rec in recommendations
+        ):
+            recommendations = finish_recommendations(recommendations, location, count)
+            memo_put(key, recommendations)
+            results.append((recommendations, "batch"))
+        elif batch_failed or deadline_exceeded():
+            # Gemini just failed for the whole chunk, or no time left to ask on its own
+            count_fallback("recommendations")
+            results.append((generate_fallback_recommendations(location, count), "fallback"))
+        else:
+            try:
+                results.append((ask_gemini_recommendations(location, preferences, trip_context, count, memo=key), "single"))
+            except Exception as e:
+                print(f"Gemini recommendation generation failed: {str(e)}")
+                count_fallback("recommendations")
+                results.append((generate_fallback_recommendations(location, count), "fallback"))
+    return results
 
 def generate_fallback_recommendations(location, count):
     """
@@ -320,4 +600,5 @@ def get_weather():
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 6003))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server with FLASK_DEBUG=1 for the reloader and debugger; use serve.py in production
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
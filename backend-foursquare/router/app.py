@@ -4,31 +4,59 @@ Router Service - Optimizes routes between destinations
 """
 
 import os
+import sys
+import re
+import json
 import math
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
-from geopy.distance import great_circle
 import requests
 
+# Shared modules live in backend-foursquare/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.geo import haversine_km, leg_distances, distance_matrix
+from common.tracing import init_tracing, span
+from common.metrics import init_metrics, track_llm, count_fallback, Histogram
+from common.serialization import use_orjson
+from common.compression import init_compression
+from common.health import init_health
+from common.llm import LazyModel
+
 # Load environment variables
 load_dotenv()
 
 # Initialize the Flask application
 app = Flask(__name__)
 CORS(app)
+init_tracing(app, "router")
+init_metrics(app, "router")
+use_orjson(app)
+init_compression(app)
+init_health(app, "router")
+
+SOLVER_LATENCY = Histogram(
+    "horizon_router_solver_duration_seconds", "Time spent ordering the stops of a route",
+    ("solver",)
+)
 
-# Initialize Gemini AI with API key
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("No GOOGLE_API_KEY found in environment variables")
+# Gemini model, or the offline stand-in with MODEL_BACKEND=fake (see common/llm.py).
+# Created on first use: only free-text route constraints (and ROUTE_SOLVER=gemini) need it,
+# and both fall back to the local solver, so it is not prewarmed and doesn't gate readiness.
+model = LazyModel()
 
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(model_name="gemini-2.5-pro")
+# hybrid: routes are ordered locally (nearest neighbor + 2-opt) honoring precedence and
+# time-of-day hints, Gemini at most parses free-text constraints into those hints.
+# gemini: the previous behavior, Gemini orders routes of more than 10 stops itself.
+ROUTE_SOLVER = os.getenv("ROUTE_SOLVER", "hybrid")
 
-# Constants
-EARTH_RADIUS_KM = 6371  # Earth radius in kilometers
+# Time-of-day slots a stop can be pinned to; words are matched in order, first hit wins
+TIME_SLOTS = ["morning", "afternoon", "evening"]
+TIME_SLOT_WORDS = {
+    "sunrise": 0, "breakfast": 0, "morning": 0,
+    "noon": 1, "lunch": 1, "afternoon": 1,
+    "sunset": 2, "dinner": 2, "evening": 2, "night": 2,
+}
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -37,24 +65,33 @@ def health_check():
 
 def calculate_distance(lat1, lon1, lat2, lon2):
     """Calculate the great-circle distance between two points on Earth"""
-    return great_circle((lat1, lon1), (lat2, lon2)).kilometers
+    return haversine_km(lat1, lon1, lat2, lon2)
+
+# Average speeds in km/h
+SPEEDS = {
+    "car": 60,
+    "bus": 40,
+    "train": 80,
+    "walking": 5,
+    "cycling": 15
+}
+
+def travel_minutes(distance, mode="car"):
+    """Travel time in whole minutes for a distance and mode of transport"""
+    speed = SPEEDS.get(mode.lower(), 50)  # Default to 50 km/h if mode not found
+    return round(distance / speed * 60)
 
 def calculate_duration(distance, mode="car"):
     """Estimate travel duration based on distance and mode of transport"""
-    # Average speeds in km/h
-    speeds = {
-        "car": 60,
-        "bus": 40,
-        "train": 80,
-        "walking": 5,
-        "cycling": 15
-    }
-    
-    speed = speeds.get(mode.lower(), 50)  # Default to 50 km/h if mode not found
+    speed = SPEEDS.get(mode.lower(), 50)  # Default to 50 km/h if mode not found
     hours = distance / speed
     
+    return format_minutes(hours * 60)
+
+def format_minutes(minutes):
+    """Duration text like the one calculate_duration gives, for a number of minutes"""
     # Round to nearest 5 minutes
-    minutes = round(hours * 60 / 5) * 5
+    minutes = int(round(minutes / 5) * 5)
     
     if minutes < 60:
         return f"{minutes} minutes"
@@ -74,17 +111,34 @@ def optimize_route():
             {"name": "Location 2", "lat": 27.1751, "lng": 78.0421},
             ...
         ],
-        "mode": "car",  // Optional: car, bus, train, walking, cycling
-        "start_location": {"name": "Start", "lat": 28.5, "lng": 77.1}  // Optional
+        "mode": "car",  // Optional: car, bus, train, walking, cycling, or auto to choose per leg
+        "objective": "time",  // Optional with mode auto: time or cost, see /legs (also budget, max_duration_minutes, modes)
+        "start_location": {"name": "Start", "lat": 28.5, "lng": 77.1},  // Optional
+        "constraints": ["visit the beach at sunset", "temple before lunch"],  // Optional, parsed by Gemini
+        "hints": {  // Optional, structured constraints by location name
+            "precedence": [["Temple", "Beach"]],
+            "time_of_day": {"Beach": "evening"}
+        },
+        "solver": "hybrid"  // Optional: hybrid, gemini (default ROUTE_SOLVER)
     }
+    Locations may carry a "time_of_day" (or "ideal_time_of_day", as in recommendations).
     """
     data = request.json
     locations = data.get('locations', [])
     mode = data.get('mode', 'car')
     start_location = data.get('start_location', None)
+    constraints = data.get('constraints') or []
+    solver = data.get('solver', ROUTE_SOLVER)
+    if isinstance(constraints, str):
+        constraints = [constraints]
     
     if not locations or len(locations) < 2:
         return jsonify({"error": "At least two locations are required"}), 400
+    if mode == "auto":
+        try:
+            modes = parse_modes(data.get('modes'))
+        except ValueError as e:
+            return jsonify({"error": str(e)}), 400
     
     try:
         # If start location is provided, add it to the beginning
@@ -93,16 +147,45 @@ def optimize_route():
             if not any(loc['name'] == start_location['name'] for loc in locations):
                 locations = [start_location] + locations
         
-        # For small number of locations, use Nearest Neighbor algorithm
-        if len(locations) <= 10:
-            optimized_route = nearest_neighbor_algorithm(locations, start_location is not None)
+        hints = None
+        constraints_satisfied = None
+        if solver == "gemini" and not constraints and not data.get('hints'):
+            # For small number of locations, use Nearest Neighbor algorithm
+            if len(locations) <= 10:
+                with span("solver.nearest_neighbor", locations=len(locations)), SOLVER_LATENCY.time(solver="nearest_neighbor"):
+                    optimized_route = nearest_neighbor_algorithm(locations, start_location is not None)
+            else:
+                # For larger sets, use Gemini to get a better route
+                with span("solver.gemini", locations=len(locations)), SOLVER_LATENCY.time(solver="gemini"):
+                    optimized_route = gemini_optimize_route(locations, mode)
         else:
-            # For larger sets, use Gemini to get a better route
-            optimized_route = gemini_optimize_route(locations, mode)
+            solver = "hybrid"
+            precedence, slots = [], location_slots(locations)
+            if isinstance(data.get('hints'), dict):
+                precedence, slots = collect_hints(locations, data['hints'], precedence, slots)
+            if constraints:
+                # One short call that only reads the wishes, the ordering stays local
+                parsed = gemini_route_hints(locations, constraints)
+                if parsed:
+                    precedence, slots = collect_hints(locations, parsed, precedence, slots)
+            with span("solver.hybrid", locations=len(locations), hints=len(precedence) + len(slots)), \
+                    SOLVER_LATENCY.time(solver="hybrid"):
+                order, violations = solve_route(locations, precedence, slots)
+            optimized_route = [locations[i] for i in order]
+            hints = describe_hints(locations, precedence, slots)
+            constraints_satisfied = violations == 0
+        
+        if mode == "auto":
+            with span("solver.legs", legs=len(optimized_route) - 1), SOLVER_LATENCY.time(solver="legs"):
+                legs, leg_minutes, leg_cost, within = plan_legs(
+                    optimized_route, data.get('objective', 'time'), data.get('budget'),
+                    data.get('max_duration_minutes'), modes
+                )
         
         # Calculate distances and durations
         total_distance = 0
         route_with_details = []
+        distances = leg_distances(optimized_route)
         
         for i in range(len(optimized_route)):
             loc = optimized_route[i]
@@ -115,12 +198,16 @@ def optimize_route():
             
             # Calculate distance and duration to next location
             if i < len(optimized_route) - 1:
-                next_loc = optimized_route[i + 1]
-                distance = calculate_distance(loc["lat"], loc["lng"], next_loc["lat"], next_loc["lng"])
+                distance = distances[i]
                 total_distance += distance
                 
                 route_detail["distance_to_next"] = round(distance, 2)
-                route_detail["duration_to_next"] = calculate_duration(distance, mode)
+                if mode == "auto":
+                    route_detail["mode_to_next"] = legs[i]["mode"]
+                    route_detail["duration_to_next"] = legs[i]["duration"]
+                    route_detail["cost_to_next"] = legs[i]["cost"]
+                else:
+                    route_detail["duration_to_next"] = calculate_duration(distance, mode)
             
             route_with_details.append(route_detail)
         
@@ -128,8 +215,16 @@ def optimize_route():
             "optimized_route": route_with_details,
             "total_distance_km": round(total_distance, 2),
             "total_duration": calculate_duration(total_distance, mode),
-            "mode": mode
+            "mode": mode,
+            "solver": solver
         }
+        if mode == "auto":
+            response["total_duration"] = format_minutes(leg_minutes)
+            response["total_cost"] = leg_cost
+            response["within_budget"] = within
+        if hints is not None:
+            response["hints"] = hints
+            response["constraints_satisfied"] = constraints_satisfied
         
         return jsonify(response), 200
     
@@ -144,40 +239,225 @@ def nearest_neighbor_algorithm(locations, preserve_start=False):
     if len(locations) <= 1:
         return locations
     
-    # Make a copy of locations to avoid modifying the original
-    remaining = locations.copy()
+    # All pairwise distances are computed once up front
+    distances = distance_matrix(locations)
     
-    # Start with the first location if preserve_start is True
-    optimized_route = []
-    if preserve_start:
-        optimized_route.append(remaining.pop(0))
-    else:
-        # Start with a random location (using the first one for simplicity)
-        optimized_route.append(remaining.pop(0))
+    # Start with the first location (it is the start location if preserve_start is True)
+    route_indices = [0]
+    remaining = list(range(1, len(locations)))
     
     # Build route by finding the nearest unvisited location
     while remaining:
-        current = optimized_route[-1]
-        nearest_idx = 0
-        min_dist = calculate_distance(
-            current["lat"], current["lng"],
-            remaining[0]["lat"], remaining[0]["lng"]
-        )
-        
-        # Find the nearest location
-        for i in range(1, len(remaining)):
-            dist = calculate_distance(
-                current["lat"], current["lng"],
-                remaining[i]["lat"], remaining[i]["lng"]
+        current = route_indices[-1]
+        nearest = min(remaining, key=lambda i: distances[current][i])
+        remaining.remove(nearest)
+        route_indices.append(nearest)
+    
+    return [locations[i] for i in route_indices]
+
+def time_slot(value):
+    """Slot index (0 morning, 1 afternoon, 2 evening) of a time-of-day hint, or None"""
+    if not isinstance(value, str):
+        return None
+    value = value.strip().lower()
+    for word, slot in TIME_SLOT_WORDS.items():
+        if word in value:
+            return slot
+    return None
+
+def creates_cycle(edges, a, b):
+    """Whether adding a -> b to the precedence edges would make a cycle"""
+    stack, seen = [b], set()
+    while stack:
+        node = stack.pop()
+        if node == a:
+            return True
+        if node not in seen:
+            seen.add(node)
+            stack.extend(after for before, after in edges if before == node)
+    return False
+
+def location_slots(locations):
+    """{index: slot} from the stops' own time_of_day (or ideal_time_of_day, as recommendations have)"""
+    slots = {}
+    for i, loc in enumerate(locations[1:], 1):
+        slot = time_slot(loc.get('time_of_day') or loc.get('ideal_time_of_day'))
+        if slot is not None:
+            slots[i] = slot
+    return slots
+
+def collect_hints(locations, hints, precedence, slots):
+    """
+    Add hints to ([(before, after)] index pairs, {index: slot}).
+    Stops are referred to by name, or by 1-based number (as Gemini answers). The first
+    location is the fixed start and takes no hints, and a pair that contradicts the
+    ones before it is dropped.
+    """
+    precedence = list(precedence)
+    slots = dict(slots)
+    names = {str(loc.get('name', '')).strip().lower(): i for i, loc in enumerate(locations)}
+
+    def index_of(ref):
+        if isinstance(ref, str) and ref.strip().lower() in names:
+            return names[ref.strip().lower()]
+        try:
+            i = int(ref) - 1
+        except (TypeError, ValueError):
+            return None
+        return i if 0 <= i < len(locations) else None
+
+    time_of_day = hints.get('time_of_day') or {}
+    if isinstance(time_of_day, dict):
+        for ref, value in time_of_day.items():
+            i, slot = index_of(ref), time_slot(value)
+            if i and slot is not None:
+                slots[i] = slot
+
+    for pair in hints.get('precedence') or []:
+        if not isinstance(pair, (list, tuple)) or len(pair) != 2:
+            continue
+        a, b = index_of(pair[0]), index_of(pair[1])
+        if a and b and a != b and (a, b) not in precedence and not creates_cycle(precedence, a, b):
+            precedence.append((a, b))
+    return precedence, slots
+
+def describe_hints(locations, precedence, slots):
+    """The hints a route was solved with, by location name"""
+    return {
+        "precedence": [[locations[a]['name'], locations[b]['name']] for a, b in precedence],
+        "time_of_day": {locations[i]['name']: TIME_SLOTS[slot] for i, slot in sorted(slots.items())}
+    }
+
+def count_violations(route, precedence, slots):
+    """Precedence pairs out of order plus stops visited in an earlier time slot than the one before"""
+    position = {node: i for i, node in enumerate(route)}
+    violations = sum(1 for a, b in precedence if position[a] > position[b])
+    latest = -1
+    for node in route:
+        slot = slots.get(node)
+        if slot is not None:
+            if slot < latest:
+                violations += 1
+            latest = max(latest, slot)
+    return violations
+
+def solve_route(locations, precedence=(), slots=None):
+    """
+    Order stops locally, starting from the first one: nearest neighbor that only picks
+    stops whose predecessors and earlier time slots are done, then 2-opt moves that
+    shorten the route without breaking more hints. Hints are soft, when they can't all
+    be met the nearest stop is taken. Returns (order of indices, hints violated).
+    """
+    if slots:
+        # Stops without a time of day count as afternoon, so a sunset stop comes after them
+        slots = {i: slots.get(i, 1) for i in range(1, len(locations))}
+    else:
+        slots = {}
+    if len(locations) <= 2:
+        order = list(range(len(locations)))
+        return order, count_violations(order, precedence, slots)
+
+    distances = distance_matrix(locations)
+    if hasattr(distances, "tolist"):
+        distances = distances.tolist()  # Plain lists are faster to index one element at a time
+
+    predecessors = {}
+    for a, b in precedence:
+        predecessors.setdefault(b, set()).add(a)
+
+    order = [0]
+    remaining = set(range(1, len(locations)))
+    while remaining:
+        current = order[-1]
+        earliest_slot = min((slots[i] for i in remaining if i in slots), default=None)
+        allowed = [
+            i for i in remaining
+            if not predecessors.get(i, set()) & remaining
+            and (i not in slots or slots[i] == earliest_slot)
+        ]
+        nearest = min(allowed or remaining, key=lambda i: distances[current][i])
+        remaining.remove(nearest)
+        order.append(nearest)
+
+    constrained = bool(precedence or slots)
+    violations = count_violations(order, precedence, slots) if constrained else 0
+    improved = True
+    while improved:
+        improved = False
+        for i in range(1, len(order) - 1):
+            for j in range(i + 1, len(order)):
+                before, first, last = order[i - 1], order[i], order[j]
+                after = order[j + 1] if j + 1 < len(order) else None
+                # Reversing order[i..j] replaces the edges into first and out of last
+                delta = distances[before][last] - distances[before][first]
+                if after is not None:
+                    delta += distances[first][after] - distances[last][after]
+                if delta >= -1e-9:
+                    continue
+                candidate = order[:i] + order[i:j + 1][::-1] + order[j + 1:]
+                if constrained:
+                    candidate_violations = count_violations(candidate, precedence, slots)
+                    if candidate_violations > violations:
+                        continue
+                    violations = candidate_violations
+                order = candidate
+                improved = True
+    return order, violations
+
+def parse_json_object(text):
+    """The first {...} object in a Gemini response, fenced or not"""
+    start, end = text.find('{'), text.rfind('}')
+    if start < 0 or end < start:
+        return None
+    try:
+        return json.loads(text[start:end + 1])
+    except ValueError:
+        return None
+
+def gemini_route_hints(locations, constraints):
+    """
+    Ask Gemini to translate free-text wishes into precedence and time-of-day hints.
+    Returns hints keyed by 1-based stop number, or None when the call or parsing fails.
+    """
+    stops_str = "\n".join(f"{i+1}. {loc['name']}" for i, loc in enumerate(locations))
+    wishes_str = "\n".join(f"- {constraint}" for constraint in constraints)
+
+    prompt = f"""
+    You are a route constraint parser. Translate the traveler's wishes into ordering hints for these stops:
+    
+    {stops_str}
+    
+    Wishes:
+    {wishes_str}
+    
+    Respond with a JSON object only, for example:
+    {{"precedence": [[2, 5]], "time_of_day": {{"3": "evening"}}}}
+    "precedence" lists [a, b] pairs meaning stop a must be visited before stop b.
+    "time_of_day" maps a stop number to "morning", "afternoon" or "evening".
+    Only include hints the wishes ask for. Do not order the stops yourself.
+    """
+    
+    try:
+        with span("llm.generate_content", prompt="route_constraints"), track_llm("route_constraints") as llm_call:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": 0.0,
+                    "max_output_tokens": 512,
+                }
             )
-            if dist < min_dist:
-                min_dist = dist
-                nearest_idx = i
+            llm_call.record(response)
         
-        # Add the nearest location to the route
-        optimized_route.append(remaining.pop(nearest_idx))
+        hints = parse_json_object(response.text)
+        if not isinstance(hints, dict):
+            count_fallback("route_constraints_unparsed")
+            return None
+        return hints
     
-    return optimized_route
+    except Exception as e:
+        print(f"Gemini constraint parsing failed: {str(e)}")
+        count_fallback("route_constraints")
+        return None
 
 def gemini_optimize_route(locations, mode):
     """
@@ -209,15 +489,17 @@ def gemini_optimize_route(locations, mode):
     """
     
     try:
-        response = model.generate_content(
-            prompt,
-            generation_config={
-                "temperature": 0.2,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 2048,
-            }
-        )
+        with span("llm.generate_content", prompt="route_order"), track_llm("route_order") as llm_call:
+            response = model.generate_content(
+                prompt,
+                generation_config={
+                    "temperature": 0.2,
+                    "top_p": 0.95,
+                    "top_k": 40,
+                    "max_output_tokens": 2048,
+                }
+            )
+            llm_call.record(response)
         
         # Parse the response to get the ordered indices
         lines = response.text.strip().split('\n')
@@ -246,6 +528,7 @@ def gemini_optimize_route(locations, mode):
         
         # If we couldn't parse the indices or didn't get enough, fall back to nearest neighbor
         if len(ordered_indices) < len(locations) / 2:
+            count_fallback("route_order_unparsed")
             return nearest_neighbor_algorithm(locations)
         
         # Create the optimized route using the ordered indices
@@ -265,8 +548,212 @@ def gemini_optimize_route(locations, mode):
     except Exception as e:
         # Fall back to nearest neighbor if Gemini fails
         print(f"Gemini route optimization failed: {str(e)}")
+        count_fallback("route_order")
         return nearest_neighbor_algorithm(locations)
 
+def transport_options(distance):
+    """
+    Transportation modes that make sense for a distance in km, with duration, cost in INR
+    and duration_minutes (used to compare legs)
+    """
+    # Determine appropriate transportation modes based on distance
+    transportation_options = []
+    
+    if distance < 5:
+        transportation_options.append({
+            "mode": "walking",
+            "duration": calculate_duration(distance, "walking"),
+            "duration_minutes": travel_minutes(distance, "walking"),
+            "cost": 0,
+            "eco_friendly": True
+        })
+    
+    if distance < 20:
+        transportation_options.append({
+            "mode": "cycling",
+            "duration": calculate_duration(distance, "cycling"),
+            "duration_minutes": travel_minutes(distance, "cycling"),
+            "cost": 100 if distance > 10 else 50,  # Bike rental cost in INR
+            "eco_friendly": True
+        })
+    
+    if distance < 500:
+        bus_cost = int(distance * 1.5)  # Approx bus cost in INR
+        transportation_options.append({
+            "mode": "bus",
+            "duration": calculate_duration(distance, "bus"),
+            "duration_minutes": travel_minutes(distance, "bus"),
+            "cost": bus_cost,
+            "eco_friendly": True
+        })
+    
+    if distance < 1000:
+        train_cost = int(distance * 2)  # Approx train cost in INR
+        transportation_options.append({
+            "mode": "train",
+            "duration": calculate_duration(distance, "train"),
+            "duration_minutes": travel_minutes(distance, "train"),
+            "cost": train_cost,
+            "eco_friendly": True
+        })
+    
+    car_cost = int(distance * 8)  # Approx car cost in INR (fuel + tolls)
+    transportation_options.append({
+        "mode": "car",
+        "duration": calculate_duration(distance, "car"),
+        "duration_minutes": travel_minutes(distance, "car"),
+        "cost": car_cost,
+        "eco_friendly": False
+    })
+    
+    if distance > 500:
+        # Very rough flight cost estimation
+        base_cost = 3000
+        distance_cost = int(distance * 5)
+        flight_cost = base_cost + distance_cost
+        
+        # Flight duration (rough estimate)
+        flight_duration = f"{math.ceil(distance / 800 + 1.5)} hours"
+        
+        transportation_options.append({
+            "mode": "flight",
+            "duration": flight_duration,
+            "duration_minutes": math.ceil(distance / 800 + 1.5) * 60,
+            "cost": flight_cost,
+            "eco_friendly": False
+        })
+    
+    return transportation_options
+
+# Leg planner: most labels kept per stop; beyond it the worst by the objective are dropped
+MAX_LEG_LABELS = int(os.getenv("MAX_LEG_LABELS", 500))
+
+def parse_modes(modes):
+    """
+    The "modes" filter of a legs request as a list of mode names, or None for all modes.
+    A single name is taken as a list of one; anything else is a ValueError.
+    """
+    if modes is None:
+        return None
+    if isinstance(modes, str):
+        return [modes]
+    if isinstance(modes, list) and all(isinstance(mode, str) for mode in modes):
+        return modes
+    raise ValueError("modes must be a mode name or a list of mode names")
+
+def plan_legs(route, objective="time", budget=None, max_minutes=None, modes=None):
+    """
+    Choose a transportation mode for every leg of an ordered route, from transport_options.
+    Label-setting search over the stops: a label is (minutes, cost, modes so far), labels
+    another one beats on both time and cost are dropped, and so are labels over the cost
+    budget or the time limit. The best label at the last stop by the objective ("time" or
+    "cost") wins. When no combination fits, the one closest to the limits is returned.
+    Returns (legs, total minutes, total cost, within limits).
+    """
+    distances = leg_distances(route)
+    leg_options = []
+    for distance in distances:
+        options = [option for option in transport_options(distance) if not modes or option["mode"] in modes]
+        # Car is always possible, whatever the mode filter says
+        leg_options.append(options or [option for option in transport_options(distance) if option["mode"] == "car"])
+    
+    def rank(label):
+        minutes, cost, _ = label
+        over = max(0, cost - budget) if budget is not None else 0
+        late = max(0, minutes - max_minutes) if max_minutes is not None else 0
+        return (over + late, (minutes, cost) if objective == "time" else (cost, minutes))
+    
+    labels = [(0, 0, ())]
+    for options in leg_options:
+        extended = [
+            (minutes + option["duration_minutes"], cost + option["cost"], chosen + (i,))
+            for minutes, cost, chosen in labels
+            for i, option in enumerate(options)
+        ]
+        feasible = [
+            label for label in extended
+            if (budget is None or label[1] <= budget) and (max_minutes is None or label[0] <= max_minutes)
+        ]
+        if not feasible:
+            # Nothing fits any more: carry on with the least infeasible labels
+            feasible = sorted(extended, key=rank)[:MAX_LEG_LABELS]
+        # Pareto front on (minutes, cost): sorted by minutes, keep a label only if it is cheaper
+        feasible.sort(key=lambda label: (label[0], label[1]))
+        labels = []
+        cheapest = None
+        for label in feasible:
+            if cheapest is None or label[1] < cheapest:
+                labels.append(label)
+                cheapest = label[1]
+        if len(labels) > MAX_LEG_LABELS:
+            labels = sorted(labels, key=rank)[:MAX_LEG_LABELS]
+    
+    minutes, cost, chosen = min(labels, key=rank)
+    legs = []
+    for i, (distance, options, choice) in enumerate(zip(distances, leg_options, chosen)):
+        option = options[choice]
+        legs.append({
+            "from": route[i]["name"],
+            "to": route[i + 1]["name"],
+            "distance_km": round(distance, 2),
+            "mode": option["mode"],
+            "duration": option["duration"],
+            "duration_minutes": option["duration_minutes"],
+            "cost": option["cost"]
+        })
+    within = rank((minutes, cost, chosen))[0] == 0
+    return legs, minutes, cost, within
+
+@app.route('/legs', methods=['POST'])
+def plan_route_legs():
+    """
+    Choose the transportation mode of every leg of an ordered route
+    Expected input:
+    {
+        "locations": [
+            {"name": "Delhi", "lat": 28.6139, "lng": 77.209},
+            {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873},
+            {"name": "Amber Fort", "lat": 26.9855, "lng": 75.8513}
+        ],
+        "objective": "time",  // Optional: time (default) or cost
+        "budget": 5000,  // Optional: most INR to spend on transport
+        "max_duration_minutes": 600,  // Optional: most minutes to spend traveling
+        "modes": ["walking", "bus", "train", "car"]  // Optional: modes to choose from, or one mode name
+    }
+    The stops are visited in the order given; use /optimize with "mode": "auto" to order them too.
+    """
+    data = request.json
+    locations = data.get('locations', [])
+    objective = data.get('objective', 'time')
+    
+    if len(locations) < 2:
+        return jsonify({"error": "At least two locations are required"}), 400
+    if objective not in ("time", "cost"):
+        return jsonify({"error": "objective must be time or cost"}), 400
+    try:
+        modes = parse_modes(data.get('modes'))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        with span("solver.legs", legs=len(locations) - 1), SOLVER_LATENCY.time(solver="legs"):
+            legs, minutes, cost, within = plan_legs(
+                locations, objective, data.get('budget'), data.get('max_duration_minutes'), modes
+            )
+        
+        return jsonify({
+            "legs": legs,
+            "total_distance_km": round(sum(leg["distance_km"] for leg in legs), 2),
+            "total_duration": format_minutes(minutes),
+            "total_duration_minutes": minutes,
+            "total_cost": cost,
+            "objective": objective,
+            "within_budget": within
+        }), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
 @app.route('/transportation', methods=['POST'])
 def get_transportation_options():
     """
@@ -293,66 +780,7 @@ def get_transportation_options():
             destination["lat"], destination["lng"]
         )
         
-        # Determine appropriate transportation modes based on distance
-        transportation_options = []
-        
-        if distance < 5:
-            transportation_options.append({
-                "mode": "walking",
-                "duration": calculate_duration(distance, "walking"),
-                "cost": 0,
-                "eco_friendly": True
-            })
-        
-        if distance < 20:
-            transportation_options.append({
-                "mode": "cycling",
-                "duration": calculate_duration(distance, "cycling"),
-                "cost": 100 if distance > 10 else 50,  # Bike rental cost in INR
-                "eco_friendly": True
-            })
-        
-        if distance < 500:
-            bus_cost = int(distance * 1.5)  # Approx bus cost in INR
-            transportation_options.append({
-                "mode": "bus",
-                "duration": calculate_duration(distance, "bus"),
-                "cost": bus_cost,
-                "eco_friendly": True
-            })
-        
-        if distance < 1000:
-            train_cost = int(distance * 2)  # Approx train cost in INR
-            transportation_options.append({
-                "mode": "train",
-                "duration": calculate_duration(distance, "train"),
-                "cost": train_cost,
-                "eco_friendly": True
-            })
-        
-        car_cost = int(distance * 8)  # Approx car cost in INR (fuel + tolls)
-        transportation_options.append({
-            "mode": "car",
-            "duration": calculate_duration(distance, "car"),
-            "cost": car_cost,
-            "eco_friendly": False
-        })
-        
-        if distance > 500:
-            # Very rough flight cost estimation
-            base_cost = 3000
-            distance_cost = int(distance * 5)
-            flight_cost = base_cost + distance_cost
-            
-            # Flight duration (rough estimate)
-            flight_duration = f"{math.ceil(distance / 800 + 1.5)} hours"
-            
-            transportation_options.append({
-                "mode": "flight",
-                "duration": flight_duration,
-                "cost": flight_cost,
-                "eco_friendly": False
-            })
+        transportation_options = transport_options(distance)
         
         response = {
             "origin": origin,
@@ -371,4 +799,5 @@ def get_transportation_options():
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 6002))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server with FLASK_DEBUG=1 for the reloader and debugger; use serve.py in production
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
@@ -0,0 +1,148 @@
+"""
+backend/serve.py
+Production Server - Runs a service (or the monolith) under gunicorn or waitress instead of
+the Flask development server
+
+Usage:
+    python serve.py trip_planner                        # gunicorn, 2 workers x 32 threads
+    python serve.py recommendation --worker-class gevent
+    python serve.py monolith --workers 4
+    python serve.py booking --server waitress           # where gunicorn can't run (Windows)
+
+Service calls spend almost all their time waiting on Gemini, so workers run many threads
+(gthread) or greenlets (gevent) rather than one request per process. Each worker is a
+separate process with its own caches and admission limits: PLAN_CONCURRENCY and friends
+apply per worker. Apps are imported in each worker after the fork, so their background
+threads (model prewarm, route executors) start in the process that uses them.
+
+On SIGTERM the server stops taking new connections and waits up to --graceful-timeout
+seconds for running requests, i.e. in-flight LLM calls, to finish before exiting.
+Settings can also come from WEB_SERVER, WEB_WORKERS, WEB_THREADS, WEB_WORKER_CLASS,
+WEB_TIMEOUT and WEB_GRACEFUL_TIMEOUT.
+"""
+
+import argparse
+import os
+import signal
+import sys
+import threading
+
+BACKEND_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, BACKEND_DIR)
+
+PORTS = {
+    "api_gateway": 6000,
+    "trip_planner": 6001,
+    "router": 6002,
+    "recommendation": 6003,
+    "booking": 6004,
+    "monolith": 6000,
+}
+
+
+def load_wsgi(target):
+    """The WSGI app of a service directory name, or of the whole monolith"""
+    import monolith
+    if target == "monolith":
+        return monolith.create_monolith()
+    return monolith.load_service(target).app
+
+
+def default_server():
+    for server in ("gunicorn", "waitress"):
+        try:
+            __import__(server)
+            return server
+        except ImportError:
+            pass
+    sys.exit("Install gunicorn (or waitress on Windows): pip install gunicorn")
+
+
+def serve_gunicorn(target, args):
+    from gunicorn.app.base import BaseApplication
+
+    if args.worker_class == "gevent":
+        # The default grpc transport blocks the gevent hub; REST goes through patched sockets
+        os.environ.setdefault("GEMINI_TRANSPORT", "rest")
+
+    class HorizonServer(BaseApplication):
+        def load_config(self):
+            options = {
+                "bind": f"{args.host}:{args.port}",
+                "workers": args.workers,
+                "worker_class": args.worker_class,
+                "threads": args.threads,
+                "worker_connections": args.threads,
+                # Longer than REQUEST_TIMEOUT, so a slow Gemini call isn't mistaken for a hung worker
+                "timeout": int(args.timeout),
+                "graceful_timeout": int(args.graceful_timeout),
+                "keepalive": 5,
+                "proc_name": f"horizon-{target}",
+            }
+            for key, value in options.items():
+                self.cfg.set(key, value)
+
+        def load(self):
+            return load_wsgi(target)
+
+    HorizonServer().run()
+
+
+def serve_waitress(target, args):
+    import waitress
+    from common.health import draining, start_draining, wait_until_idle
+
+    server = waitress.create_server(
+        load_wsgi(target), host=args.host, port=args.port, threads=args.threads,
+        channel_timeout=args.timeout, ident="horizon"
+    )
+
+    def drain():
+        # Requests keep being served (new ones get 503) until the running ones are done
+        if not wait_until_idle(args.graceful_timeout):
+            print(f"Requests still running after {args.graceful_timeout:.0f}s, stopping anyway")
+        signal.raise_signal(signal.SIGINT)
+
+    def handle_sigterm(signum, frame):
+        if draining.is_set():
+            return
+        print("Draining before shutdown")
+        start_draining()
+        threading.Thread(target=drain, name="drain", daemon=True).start()
+
+    signal.signal(signal.SIGTERM, handle_sigterm)
+    print(f"Serving {target} on http://{args.host}:{args.port} with waitress ({args.threads} threads)")
+    try:
+        server.run()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+
+
+def serve_dev(target, args):
+    """The Werkzeug development server, for comparison in benchmarks/bench_serving.py"""
+    from werkzeug.serving import run_simple
+    run_simple(args.host, args.port, load_wsgi(target), threaded=True)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Run a service with a production WSGI server")
+    parser.add_argument("target", choices=sorted(PORTS), help="Service directory, or monolith for all of them")
+    parser.add_argument("--server", choices=["gunicorn", "waitress", "dev"], default=os.getenv("WEB_SERVER"))
+    parser.add_argument("--host", default=os.getenv("HOST", "0.0.0.0"))
+    parser.add_argument("--port", type=int, default=None)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_WORKERS", 2)))
+    parser.add_argument("--threads", type=int, default=int(os.getenv("WEB_THREADS", 0)) or None,
+                        help="Threads per worker (default 32), or greenlets per worker with gevent (default 1000)")
+    parser.add_argument("--worker-class", choices=["gthread", "gevent"], default=os.getenv("WEB_WORKER_CLASS", "gthread"))
+    parser.add_argument("--timeout", type=float, default=float(os.getenv("WEB_TIMEOUT", 180)))
+    parser.add_argument("--graceful-timeout", type=float, default=float(os.getenv("WEB_GRACEFUL_TIMEOUT", 130)))
+    args = parser.parse_args()
+
+    if args.port is None:
+        args.port = int(os.getenv("PORT", PORTS[args.target]))
+    if args.threads is None:
+        args.threads = 1000 if args.worker_class == "gevent" else 32
+    server = args.server or default_server()
+    {"gunicorn": serve_gunicorn, "waitress": serve_waitress, "dev": serve_dev}[server](args.target, args)
\ No newline at end of file
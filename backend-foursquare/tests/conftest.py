@@ -0,0 +1,76 @@
+"""
+backend/tests/conftest.py
+Shared fixtures. Every service runs in-process with the fake model (common/fake_llm.py),
+so the suite needs neither GOOGLE_API_KEY nor network access:
+    cd backend-foursquare && python -m pytest -q
+Services read their settings at import, so the environment is set here, before any of
+them is loaded.
+"""
+
+import os
+import sys
+import threading
+from http.server import ThreadingHTTPServer
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, BACKEND_DIR)
+sys.path.insert(0, os.path.join(BACKEND_DIR, 'tools'))
+
+os.environ.pop("GOOGLE_API_KEY", None)
+os.environ.update({
+    "MODEL_BACKEND": "fake",
+    "MODEL_PREWARM": "0",
+    "FAKE_LLM_LATENCY_SCALE": "0",
+    "FAKE_LLM_ERROR_RATE": "0",
+    "TRIP_STORE_URL": "memory://",
+    "GATEWAY_CACHE": "1",
+})
+
+import monolith
+
+
+@pytest.fixture(scope="session")
+def gateway():
+    """Test client of the whole monolith: the gateway API plus the mounted services"""
+    from werkzeug.test import Client
+    return Client(monolith.create_monolith())
+
+
+@pytest.fixture
+def service():
+    """load_service, e.g. service("booking").app.test_client()"""
+    return monolith.load_service
+
+
+@pytest.fixture
+def mock_provider():
+    """
+    Start tools/mock_provider.py servers on free ports:
+        url = mock_provider("train", latency_ms=0, error_rate=0.0)
+    Servers are stopped when the test ends.
+    """
+    monolith.load_service("booking")  # mock_provider imports the booking inventory
+    from mock_provider import make_handler
+
+    servers = []
+
+    def start(mode, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(mode, latency_ms, jitter_ms, error_rate))
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return f"http://127.0.0.1:{server.server_address[1]}"
+
+    yield start
+    for server in servers:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.fixture
+def failing_model(monkeypatch):
+    """Make a service's fake model fail a share of its calls: failing_model(module, 1.0)"""
+    def inject(module, error_rate=1.0):
+        monkeypatch.setattr(module.model.get(), "error_rate", error_rate)
+    return inject
@@ -0,0 +1,68 @@
+"""Admission control: priority classes sharing one pool"""
+
+import threading
+import time
+
+import pytest
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert condition()
+
+
+def test_background_work_is_shed_before_interactive(service):
+    service("trip_planner")
+    from common.admission import AdmissionController, AdmissionRejected
+
+    pool = AdmissionController("shed-test", limit=1, queue_size=1, queue_timeout=5)
+    pool.acquire("background")  # A replan holds the only slot
+    outcomes = {}
+
+    def request(name, priority):
+        try:
+            pool.acquire(priority)
+            outcomes[name] = "admitted"
+        except AdmissionRejected:
+            outcomes[name] = "shed"
+
+    queued_replan = threading.Thread(target=request, args=("replan", "background"))
+    queued_replan.start()
+    wait_for(lambda: pool.stats()["queued"] == 1)
+
+    chat = threading.Thread(target=request, args=("chat", "interactive"))
+    chat.start()
+    queued_replan.join(2)
+    assert outcomes == {"replan": "shed"}
+
+    # A second replan finds the queue full of interactive work and is turned away
+    with pytest.raises(AdmissionRejected):
+        pool.acquire("background")
+
+    pool.release(0.1)
+    chat.join(2)
+    assert outcomes == {"replan": "shed", "chat": "admitted"}
+    pool.release(0.1)
+    assert pool.stats() == {"active": 0, "queued": 0, "limit": 1}
+
+
+def test_chat_and_replan_share_one_pool(service):
+    trip_planner = service("trip_planner")
+    replan = trip_planner.app.view_functions["replan_trip"]
+    chat = trip_planner.app.view_functions["chat"]
+    controller = trip_planner.chat_replan_admission
+
+    controller.queue_size, queue_size = 0, controller.queue_size
+    for _ in range(controller.limit):
+        controller.acquire("background")  # Replans fill every slot
+    try:
+        with trip_planner.app.test_request_context(json={}):
+            for view, args in ((replan, ("missing-plan",)), (chat, ())):
+                response, status = view(*args)
+                assert status == 503
+    finally:
+        controller.queue_size = queue_size
+        for _ in range(controller.limit):
+            controller.release(0.1)
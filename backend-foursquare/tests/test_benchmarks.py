@@ -0,0 +1,30 @@
+"""
+Per-endpoint overhead, excluding model time, with pytest-benchmark:
+    pip install pytest-benchmark
+    python -m pytest tests/test_benchmarks.py --benchmark-only
+Skipped when pytest-benchmark isn't installed. The fake model answers instantly, so
+what is measured is request parsing, prompt building, response parsing, caching and
+encoding, as in benchmarks/bench_endpoints.py.
+"""
+
+import itertools
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("pytest_benchmark")
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from bench_endpoints import CASES
+
+
+@pytest.mark.parametrize("service_name, name, path, payload", CASES, ids=[case[1] for case in CASES])
+def test_endpoint_overhead(benchmark, service, service_name, name, path, payload):
+    client = service(service_name).app.test_client()
+    iteration = itertools.count()
+
+    # Inputs vary per round so the caches aren't always warm
+    response = benchmark(lambda: client.post(path, json=payload(next(iteration))))
+
+    assert response.status_code == 200
@@ -0,0 +1,56 @@
+"""Budget ledger input: costs and budgets that aren't numbers are rejected with 400"""
+
+import pytest
+
+
+@pytest.fixture
+def plan_id(gateway):
+    response = gateway.post('/api/trip/plan', json={"query": "2 days in Jodhpur", "preferences": {"duration": 2, "budget": 15000}})
+    plan_id = response.get_json()["plan_id"]
+    assert gateway.get(f'/api/trip/plan/{plan_id}/budget').status_code == 200
+    return plan_id
+
+
+@pytest.mark.parametrize("body", [
+    {"item": {"name": "Hotel", "total_price": "about 4k"}},
+    {"item": {"name": "Hotel", "cost": -200}},
+    {"item": {"name": "Hotel", "cost": True}},
+    {"item": "Hotel"},
+    {"alternatives": [{"name": "Hostel", "price_per_night": "cheap"}]},
+    {"alternatives": {"name": "Hostel", "cost": 900}},
+])
+def test_bad_item_costs_are_rejected(gateway, plan_id, body):
+    response = gateway.post(f'/api/trip/plan/{plan_id}/budget/items', json=dict(body, day=1, category="accommodation"))
+
+    assert response.status_code == 400, response.get_data(as_text=True)
+    assert "error" in response.get_json()
+
+
+def test_numeric_strings_are_accepted(gateway, plan_id):
+    response = gateway.post(f'/api/trip/plan/{plan_id}/budget/items', json={
+        "day": 1, "category": "food", "item": {"name": "Thali", "average_cost": "850.4"}
+    })
+
+    assert response.status_code == 200
+    assert response.get_json()["ledger"]["days"]["1"]["items"]["food"]["cost"] == 850
+
+
+def test_bad_plan_budget_is_rejected(gateway):
+    response = gateway.post('/api/trip/plan', json={"query": "2 days in Ajmer", "preferences": {"duration": 2, "budget": "mid-range"}})
+    plan_id = response.get_json()["plan_id"]
+
+    budget = gateway.get(f'/api/trip/plan/{plan_id}/budget')
+
+    assert budget.status_code == 400
+    assert "preferences.budget" in budget.get_json()["error"]
+
+
+def test_parse_amount(service):
+    service("trip_planner")
+    from cost_engine import InvalidAmount, parse_amount
+
+    assert parse_amount(4200) == 4200
+    assert parse_amount("99.6") == 100
+    for value in ("nan", "inf", None, [], "1,200"):
+        with pytest.raises(InvalidAmount):
+            parse_amount(value)
@@ -0,0 +1,57 @@
+"""Every endpoint of benchmarks/bench_endpoints.py answers with the fake model"""
+
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'benchmarks'))
+from bench_endpoints import CASES
+
+
+@pytest.mark.parametrize("service_name, name, path, payload", CASES, ids=[case[1] for case in CASES])
+def test_endpoint_answers(service, service_name, name, path, payload):
+    from common import llm
+    client = service(service_name).app.test_client()
+    calls = llm.fake_model_time["calls"]
+
+    response = client.post(path, json=payload(0))
+
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert response.is_json
+    assert llm.fake_model_time["calls"] >= calls
+
+
+def test_fake_model_answers_every_prompt_family():
+    from common.fake_llm import GENERATORS, detect_family
+    from common.llm import FakeModel
+
+    prompts = {
+        "route_order": "You are an expert route optimizer.",
+        "route_constraints": "You are a route constraint parser.",
+        "itinerary": "Please create a detailed travel itinerary for 2 days in Jaipur",
+        "recommendations": "You are a travel recommendation expert. places to visit in Jaipur (coordinates: 26.9, 75.8)",
+        "accommodation": "You are a travel booking expert. accommodations in Jaipur (coordinates: 26.9, 75.8)",
+        "accommodation_rates": "You are a hotel rates expert. rates for a stay in Jaipur\n    1. Jaipur Hotel 1",
+        "restaurants": "You are a restaurant recommendation expert. in Jaipur (coordinates: 26.9, 75.8)",
+        "chat": "Hello there",
+    }
+    model = FakeModel(latency_scale=0, error_rate=0)
+    for family, prompt in prompts.items():
+        assert detect_family(prompt) == family
+        assert model.generate_content(prompt).text
+    assert set(prompts) <= set(GENERATORS)
+
+
+def test_injected_failures_fall_back(service, failing_model):
+    recommendation = service("recommendation")
+    failing_model(recommendation, 1.0)
+
+    response = recommendation.app.test_client().post('/recommend', json={
+        "location": {"name": "Failure Town", "lat": 10.123, "lng": 20.456}, "count": 3
+    })
+
+    assert response.status_code == 200
+    assert len(response.get_json()["recommendations"]) == 3
+    metrics = recommendation.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'prompt="recommendations",status="error"' in metrics
@@ -0,0 +1,54 @@
+"""Gateway relay: every route goes through proxy() and behaves the same"""
+
+import pytest
+import requests
+
+
+@pytest.fixture
+def gateway_app(gateway, service):
+    return service("api_gateway")
+
+
+def test_plan_lifecycle_through_the_gateway(gateway):
+    created = gateway.post('/api/trip/plan', json={"query": "2 days in Jaipur", "preferences": {"days": 2}})
+    assert created.status_code == 200, created.get_data(as_text=True)
+    plan_id = created.get_json()["plan_id"]
+
+    assert gateway.get(f'/api/trip/plan/{plan_id}').status_code == 200
+    assert gateway.get(f'/api/trip/plan/{plan_id}/budget').status_code == 200
+    assert gateway.post(f'/api/trip/plan/{plan_id}/budget/repair').status_code == 200
+    assert gateway.get('/api/trip/plan/missing-plan').status_code == 404
+
+
+def test_get_routes_forward_the_query_string(gateway_app, monkeypatch):
+    seen = {}
+
+    def get(url, params=None, **kwargs):
+        seen.update(url=url, params=params)
+        raise requests.ConnectionError("refused")
+
+    monkeypatch.setattr(gateway_app.service_client, "get", get)
+    response = gateway_app.app.test_client().get('/api/trip/plan/jobs/j1?wait=5&version=2')
+
+    assert response.status_code == 500
+    assert seen == {"url": f"{gateway_app.TRIP_PLANNER_URL}/plan/jobs/j1", "params": {"wait": "5", "version": "2"}}
+
+
+@pytest.mark.parametrize("method, path", [
+    ("post", "/api/chat/message"),
+    ("post", "/api/booking/transport/calendar"),
+    ("post", "/api/recommendations"),
+    ("get", "/api/trip/plan/p1/route"),
+])
+def test_upstream_timeouts_answer_504_on_every_route(gateway_app, monkeypatch, method, path):
+    def timeout(*args, **kwargs):
+        raise requests.Timeout("slow")
+
+    monkeypatch.setattr(gateway_app.service_client, "get", timeout)
+    monkeypatch.setattr(gateway_app.service_client, "post", timeout)
+    client = gateway_app.app.test_client()
+
+    response = getattr(client, method)(path, json={"message": "hi", "location": {"name": "Pune", "lat": 18.52, "lng": 73.85}})
+
+    assert response.status_code == 504
+    assert "deadline" in response.get_json()["error"]
@@ -0,0 +1,111 @@
+"""Booking inventory cache: what is cached for how long, and background refreshes"""
+
+import time
+
+import pytest
+
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+LEG = (DELHI, JAIPUR, "2025-10-02", 1)
+
+
+@pytest.fixture
+def booking(service):
+    return service("booking")
+
+
+@pytest.fixture
+def inventory_cache(booking):
+    import inventory_cache
+    return inventory_cache
+
+
+def expire(cache, prefix):
+    with cache.lock:
+        for key, entry in cache.entries.items():
+            if key[0] == prefix:
+                entry.expires_at = 0
+
+
+def test_catalog_is_cached_without_prices_and_rates_are_asked_again(booking, monkeypatch):
+    asked = []
+    load_rates = booking.load_accommodation_rates
+
+    def counting_rates(*args):
+        asked.append(args[2:4])
+        return load_rates(*args)
+
+    monkeypatch.setattr(booking, "load_accommodation_rates", counting_rates)
+    location = {"name": "Udaipur", "lat": 24.5854, "lng": 73.7125}
+    stay = (location, "2025-11-01", "2025-11-03", {"adults": 2}, 1, {"budget": "high"})
+
+    first = booking.generate_accommodation_options(*stay)
+    assert all(option["total_price"] == option["price_per_night"] * 2 for option in first)
+    assert asked == []  # The catalog answer priced the stay that loaded it
+
+    catalogs = [
+        entry.value for key, entry in booking.inventory_cache.entries.items()
+        if key[0] == "accommodation" and key[1] == booking.location_key(location)
+    ]
+    assert catalogs and all("price_per_night" not in hotel for hotel in catalogs[0])
+
+    expire(booking.inventory_cache, "accommodation_rates")
+    again = booking.generate_accommodation_options(*stay)
+    assert asked == [("2025-11-01", "2025-11-03")]
+    assert [option["name"] for option in again] == [option["name"] for option in first]
+    assert all(option["price_per_night"] > 0 for option in again)
+
+
+def test_fallback_after_a_provider_failure_is_cached_briefly(booking, inventory_cache, mock_provider):
+    import providers
+
+    cache = inventory_cache.InventoryCache()
+    failing = providers.IRCTCProvider(
+        mock_provider("train", error_rate=1.0), timeout=2, live=True, cache=cache, fare_ttl=120, fallback_ttl=0
+    )
+    assert failing.search(*LEG)
+    assert cache.entries == {}
+    failing.search(*LEG)
+    assert cache.stats()["misses"] == 2
+
+    cache = inventory_cache.InventoryCache()
+    failing = providers.IRCTCProvider(
+        mock_provider("train", error_rate=1.0), timeout=2, live=True, cache=cache, fare_ttl=120, fallback_ttl=5
+    )
+    failing.search(*LEG)
+    (entry,) = cache.entries.values()
+    assert entry.lifetime == 5
+
+    # Providers that aren't live always serve the fallback inventory, cached like fares
+    cache = inventory_cache.InventoryCache()
+    offline = providers.IRCTCProvider("http://127.0.0.1:9", cache=cache, fare_ttl=120, fallback_ttl=5)
+    offline.search(*LEG)
+    (entry,) = cache.entries.values()
+    assert entry.lifetime == 120
+
+
+def test_refresher_respects_its_budget_and_admission(inventory_cache):
+    from common.admission import AdmissionController
+
+    cache = inventory_cache.InventoryCache(hot_threshold=1, refresh_budget=2)
+    admission = AdmissionController("refresh-test", limit=1, queue_size=0)
+    loads = []
+
+    def loader(name):
+        return lambda: loads.append(name) or name
+
+    for hits, name in enumerate(["cold", "warm", "hot", "hottest"]):
+        cache.store(name, name, 10, loader(name), hits=hits + 1)
+    cache.store("gemini", "gemini", 10, loader("gemini"), hits=99, admission=admission)
+    for entry in cache.entries.values():
+        entry.expires_at = time.monotonic() + 1  # Inside the refresh-ahead window
+
+    admission.acquire()  # A live request holds the only slot
+    cache.refresh_hot_entries()
+    assert loads == ["hottest", "hot"]
+    assert cache.stats()["refreshes_skipped"] == 1
+
+    admission.release(0.1)
+    cache.refresh_hot_entries()
+    assert loads[2:] == ["gemini", "warm"]
+    assert admission.stats()["active"] == 0
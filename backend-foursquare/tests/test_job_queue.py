@@ -0,0 +1,61 @@
+"""Job queue: claims by kind, and workers that outlive their lease"""
+
+import pytest
+
+
+@pytest.fixture
+def job_queue(service):
+    service("trip_planner")
+    import job_queue
+    return job_queue
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def store(request, job_queue, tmp_path):
+    if request.param == "memory":
+        return job_queue.MemoryJobStore()
+    return job_queue.SQLiteJobStore(str(tmp_path / "jobs.db"))
+
+
+def test_claim_only_takes_jobs_of_its_kind(store):
+    report = store.create("report", {"n": 1})
+    plan = store.create("plan", {"n": 2})
+
+    claimed = store.claim("plan", 60)
+    assert claimed["job_id"] == plan["job_id"]
+    assert store.claim("plan", 60) is None
+    assert store.get(report["job_id"])["status"] == "queued"
+    assert store.claim("report", 60)["job_id"] == report["job_id"]
+
+
+def test_expired_worker_cannot_overwrite_the_new_claim(job_queue, store):
+    job = store.create("plan", {})
+    stale = store.claim("plan", -1)  # Lease already over
+    fresh = store.claim("plan", 60)
+    assert fresh["job_id"] == stale["job_id"]
+    assert fresh["claimed_by"] != stale["claimed_by"]
+
+    with pytest.raises(job_queue.LeaseLost):
+        job_queue.JobContext(store, stale).progress("routing", {"days": ["stale"]})
+    assert store.update(job["job_id"], claim=fresh["claimed_by"], status="complete", result={"days": ["fresh"]})
+
+    # The stale worker finishing late leaves the re-claimer's result alone
+    queue = job_queue.JobQueue(store, "plan", lambda payload, context: {"days": ["stale"]}, workers=0)
+    queue.execute(stale)
+    final = store.get(job["job_id"])
+    assert final["status"] == "complete"
+    assert final["result"] == {"days": ["fresh"]}
+
+
+def test_stale_failure_does_not_requeue_the_job(job_queue, store):
+    job = store.create("plan", {})
+    stale = store.claim("plan", -1)
+    store.claim("plan", 60)
+
+    def fail(payload, context):
+        raise RuntimeError("Gemini timed out")
+
+    job_queue.JobQueue(store, "plan", fail, workers=0).execute(stale)
+    record = store.get(job["job_id"])
+    assert record["status"] == "running"
+    assert record["error"] is None
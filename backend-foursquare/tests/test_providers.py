@@ -0,0 +1,137 @@
+"""Provider adapters: circuit breaker, hedging and latency metrics, against mock providers"""
+
+import threading
+import time
+
+import pytest
+
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+LEG = (DELHI, JAIPUR, "2025-10-01", 1)
+
+
+@pytest.fixture
+def providers(service):
+    service("booking")
+    import providers
+    return providers
+
+
+def test_breaker_opens_on_errors_and_closes_after_a_good_trial(providers):
+    breaker = providers.CircuitBreaker(window=10, error_threshold=0.5, min_calls=4, cooldown=0.1)
+
+    for _ in range(4):
+        assert breaker.allow()
+        breaker.record(False)
+    assert breaker.state == "open"
+    assert not breaker.allow()
+
+    time.sleep(0.15)
+    assert breaker.state == "half-open"
+    assert breaker.allow()
+    assert not breaker.allow()  # Only one trial call at a time
+    breaker.record(True)
+    assert breaker.state == "closed"
+    assert breaker.allow()
+
+
+def test_failed_trial_reopens_the_breaker(providers):
+    breaker = providers.CircuitBreaker(min_calls=1, cooldown=0.05)
+    breaker.record(False)
+    time.sleep(0.1)
+
+    assert breaker.allow()
+    breaker.record(False)
+    assert breaker.state == "open"
+
+
+def test_failing_provider_falls_back_then_short_circuits(providers, mock_provider):
+    provider = providers.IRCTCProvider(mock_provider("train", error_rate=1.0), timeout=2, live=True)
+    provider.breaker.min_calls = 3
+
+    for _ in range(3):
+        assert provider.search(*LEG)  # Fallback inventory
+    assert provider.breaker.state == "open"
+    assert provider.fallbacks == 3
+
+    # Open: the provider isn't called at all
+    provider.fetch = lambda *args: pytest.fail("called an open provider")
+    assert provider.search(*LEG)
+    assert provider.fallbacks == 4
+
+
+def test_recovered_provider_closes_the_breaker(providers, mock_provider):
+    provider = providers.IRCTCProvider(mock_provider("train", error_rate=1.0), timeout=2, live=True)
+    provider.breaker.min_calls = 2
+    provider.breaker.cooldown = 0.1
+    provider.search(*LEG)
+    provider.search(*LEG)
+    assert provider.breaker.state == "open"
+
+    provider.base_url = mock_provider("train")
+    time.sleep(0.15)
+    provider.search(*LEG)
+    assert provider.breaker.state == "closed"
+
+
+def test_malformed_body_during_trial_does_not_wedge_the_breaker(providers):
+    provider = providers.RedBusProvider("http://127.0.0.1:9", timeout=1, live=True)
+    provider.breaker.min_calls = 1
+    provider.breaker.cooldown = 0.05
+    def fetch(*args):
+        body = None  # A provider answering null instead of {"options": [...]}
+        return body["options"]
+
+    provider.fetch = fetch
+    provider.search(*LEG)
+    time.sleep(0.1)
+
+    assert provider.search(*LEG)
+    assert provider.breaker.state == "open"
+    assert not provider.breaker.trial_in_flight
+
+
+def test_hedged_request_wins_over_a_slow_first_attempt(providers):
+    provider = providers.MakeMyTripProvider("http://127.0.0.1:9", timeout=5, live=True, hedge_after=0.05)
+    attempts = []
+    lock = threading.Lock()
+
+    def fetch(*args):
+        with lock:
+            attempts.append(time.monotonic())
+            first = len(attempts) == 1
+        time.sleep(1.0 if first else 0.0)
+        return [{"name": "hedged" if not first else "slow", "price": 1}]
+
+    provider.fetch = fetch
+    started = time.monotonic()
+    options = provider.search(*LEG)
+
+    assert options[0]["name"] == "hedged"
+    assert len(attempts) == 2
+    assert time.monotonic() - started < 0.8
+    assert provider.breaker.error_rate() == 0.0
+
+
+def test_hedged_request_still_fails_over_when_both_attempts_fail(providers):
+    provider = providers.MakeMyTripProvider("http://127.0.0.1:9", timeout=5, live=True, hedge_after=0.01)
+
+    def fetch(*args):
+        time.sleep(0.05)
+        raise ValueError("bad body")
+
+    provider.fetch = fetch
+    assert provider.search(*LEG)  # Fallback inventory
+    assert provider.fallbacks == 1
+    assert provider.breaker.error_rate() == 1.0
+
+
+def test_provider_latency_is_exported(service, providers, mock_provider):
+    booking = service("booking")
+    provider = providers.RedBusProvider(mock_provider("bus"), timeout=2, live=True)
+    provider.search(*LEG)
+
+    metrics = booking.app.test_client().get('/metrics').get_data(as_text=True)
+    assert 'horizon_provider_request_duration_seconds_count{provider="redbus",outcome="ok"}' in metrics
+    assert 'horizon_provider_circuit{provider="irctc",stat="state"}' in metrics
+    assert provider.stats()["latency"]["ok"]["count"] >= 1
@@ -0,0 +1,50 @@
+"""/recommend/batch: how a chunk's Gemini answer is split back per location"""
+
+import pytest
+
+
+LOCATIONS = [
+    {"name": "Amber Fort", "lat": 26.98, "lng": 75.85},
+    {"name": "Hawa Mahal", "lat": 26.92, "lng": 75.82},
+    {"name": "Jal Mahal", "lat": 26.95, "lng": 75.84},
+]
+
+
+@pytest.fixture
+def recommendation(service, monkeypatch):
+    module = service("recommendation")
+    asked = []
+
+    def ask(location, preferences, trip_context, count, memo=None):
+        asked.append(location["name"])
+        return module.generate_fallback_recommendations(location, count)
+
+    monkeypatch.setattr(module, "ask_gemini_recommendations", ask)
+    module.asked = asked
+    return module
+
+
+def batch(module):
+    keys = [("batch-test", location["name"]) for location in LOCATIONS]
+    return module.get_gemini_batch_recommendations(LOCATIONS, {}, {}, 3, keys)
+
+
+def test_failed_batch_call_falls_back_without_asking_each_location(recommendation, failing_model):
+    failing_model(recommendation)
+
+    results = batch(recommendation)
+
+    assert [source for _, source in results] == ["fallback"] * len(LOCATIONS)
+    assert recommendation.asked == []
+
+
+def test_location_missing_from_parsed_answer_is_asked_on_its_own(recommendation, monkeypatch):
+    class Response:
+        text = '{"1": [{"name": "Panna Meena Kund", "description": "Stepwell", "lat": 26.98, "lng": 75.85}]}'
+
+    monkeypatch.setattr(recommendation.model, "generate_content", lambda *args, **kwargs: Response())
+
+    results = batch(recommendation)
+
+    assert [source for _, source in results] == ["batch", "single", "single"]
+    assert recommendation.asked == ["Hawa Mahal", "Jal Mahal"]
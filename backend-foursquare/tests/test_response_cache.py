@@ -0,0 +1,71 @@
+"""Gateway response cache: canonical keys and collapsing of concurrent misses"""
+
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def response_cache(service):
+    service("api_gateway")
+    import response_cache
+    return response_cache
+
+
+def test_set_like_preferences_share_a_key(response_cache):
+    first = {"location": {"lat": 26.91241, "lng": 75.7873}, "preferences": {"interests": ["Food", "history"]}}
+    second = {"preferences": {"interests": ["history ", "food", "food"]}, "location": {"lng": 75.78731, "lat": 26.9124}}
+
+    assert response_cache.canonical_key("recommendations", first) == response_cache.canonical_key("recommendations", second)
+
+
+def test_reversed_precedence_gets_its_own_key(response_cache):
+    forward = {"locations": [], "hints": {"precedence": [["Temple", "Beach"]]}}
+    backward = {"locations": [], "hints": {"precedence": [["Beach", "Temple"]]}}
+
+    assert response_cache.canonical_key("optimize", forward) != response_cache.canonical_key("optimize", backward)
+
+
+def test_modes_keep_their_order_and_case(response_cache):
+    key = lambda modes: response_cache.canonical_key("legs", {"locations": [], "modes": modes})
+
+    assert key(["bus", "train"]) != key(["train", "bus"])
+    assert key(["bus"]) != key(["Bus"])
+
+
+def collapse(response_cache, status_code):
+    cache = response_cache.ResponseCache()
+    statuses = []
+
+    def fetch():
+        time.sleep(0.2)
+        return response_cache.CachedResponse(status_code, b"{}", {})
+
+    def lookup():
+        statuses.append(cache.get_or_fetch("key", fetch, 60)[1])
+
+    threads = [threading.Thread(target=lookup) for _ in range(3)]
+    for thread in threads:
+        thread.start()
+        time.sleep(0.02)
+    for thread in threads:
+        thread.join()
+    return sorted(statuses), cache.stats()
+
+
+def test_requests_joining_a_good_miss_are_hits(response_cache):
+    statuses, stats = collapse(response_cache, 200)
+
+    assert statuses == ["HIT", "HIT", "MISS"]
+    assert stats["misses"] == 1 and stats["collapsed"] == 2
+    assert stats["entries"] == 1
+
+
+def test_requests_joining_a_failed_miss_are_not_hits(response_cache):
+    statuses, stats = collapse(response_cache, 503)
+
+    assert statuses == ["COLLAPSED", "COLLAPSED", "MISS"]
+    assert stats["collapsed_errors"] == 2 and stats["hit_ratio"] == 0.0
+    assert stats["entries"] == 0
+
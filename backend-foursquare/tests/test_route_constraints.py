@@ -0,0 +1,59 @@
+"""Route hints in the router, and through the gateway's response cache"""
+
+STOPS = [
+    {"name": "Start", "lat": 15.0, "lng": 73.8},
+    {"name": "Temple", "lat": 15.02, "lng": 73.81},
+    {"name": "Beach", "lat": 15.01, "lng": 73.83},
+]
+
+
+def route_names(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [stop["name"] for stop in response.get_json()["optimized_route"]]
+
+
+def test_router_honours_precedence_both_ways(service):
+    client = service("router").app.test_client()
+
+    forward = client.post('/optimize', json={"locations": STOPS, "hints": {"precedence": [["Temple", "Beach"]]}})
+    backward = client.post('/optimize', json={"locations": STOPS, "hints": {"precedence": [["Beach", "Temple"]]}})
+
+    assert route_names(forward) == ["Start", "Temple", "Beach"]
+    assert route_names(backward) == ["Start", "Beach", "Temple"]
+    assert backward.get_json()["constraints_satisfied"] is True
+
+
+def test_gateway_cache_keeps_precedence_apart(gateway):
+    stops = [dict(stop, lat=stop["lat"] + 1) for stop in STOPS]  # Not cached by other tests
+
+    def optimize(precedence):
+        response = gateway.post('/api/trip/optimize', json={"locations": stops, "hints": {"precedence": precedence}})
+        return route_names(response), response.headers["X-Cache"]
+
+    assert optimize([["Temple", "Beach"]]) == (["Start", "Temple", "Beach"], "MISS")
+    assert optimize([["Beach", "Temple"]]) == (["Start", "Beach", "Temple"], "MISS")
+    assert optimize([["Temple", "Beach"]]) == (["Start", "Temple", "Beach"], "HIT")
+    assert optimize([["Beach", "Temple"]]) == (["Start", "Beach", "Temple"], "HIT")
+
+
+def test_gateway_cache_keeps_time_slots_apart(gateway):
+    stops = [dict(stop, lat=stop["lat"] + 2) for stop in STOPS]
+
+    def optimize(time_of_day):
+        response = gateway.post('/api/trip/optimize', json={"locations": stops, "hints": {"time_of_day": time_of_day}})
+        return route_names(response)
+
+    assert optimize({"Temple": "evening", "Beach": "morning"}) == ["Start", "Beach", "Temple"]
+    assert optimize({"Temple": "morning", "Beach": "evening"}) == ["Start", "Temple", "Beach"]
+    assert optimize({"Temple": "evening", "Beach": "morning"}) == ["Start", "Beach", "Temple"]
+
+
+def test_free_text_constraints_are_not_cached(gateway):
+    stops = [dict(stop, lat=stop["lat"] + 3) for stop in STOPS]
+    body = {"locations": stops, "constraints": "visit the beach at sunset"}
+
+    first = gateway.post('/api/trip/optimize', json=body)
+    second = gateway.post('/api/trip/optimize', json=body)
+
+    assert first.status_code == second.status_code == 200
+    assert "X-Cache" not in second.headers
@@ -0,0 +1,35 @@
+"""Router leg planner: the modes filter"""
+
+import pytest
+
+# About 11 km and 120 km legs, so walking, cycling, bus, train and car all compete
+STOPS = [
+    {"name": "Delhi", "lat": 28.6139, "lng": 77.209},
+    {"name": "Noida", "lat": 28.5355, "lng": 77.3910},
+    {"name": "Meerut", "lat": 28.9845, "lng": 77.7064},
+]
+
+
+@pytest.fixture
+def router(service):
+    return service("router").app.test_client()
+
+
+def leg_modes(response):
+    assert response.status_code == 200, response.get_data(as_text=True)
+    return [leg["mode"] for leg in response.get_json()["legs"]]
+
+
+def test_single_mode_name_is_a_list_of_one(router):
+    assert leg_modes(router.post('/legs', json={"locations": STOPS, "modes": "bus"})) == ["bus", "bus"]
+
+
+def test_mode_names_are_matched_whole(router):
+    # Not a substring match: "train bus" is one unknown mode, so only car is left
+    assert leg_modes(router.post('/legs', json={"locations": STOPS, "modes": "train bus"})) == ["car", "car"]
+
+
+@pytest.mark.parametrize("modes", [5, ["bus", 1], {"bus": True}, [["bus"]]])
+def test_malformed_modes_are_rejected(router, modes):
+    assert router.post('/legs', json={"locations": STOPS, "modes": modes}).status_code == 400
+    assert router.post('/optimize', json={"locations": STOPS, "mode": "auto", "modes": modes}).status_code == 400
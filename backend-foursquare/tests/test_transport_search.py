@@ -0,0 +1,65 @@
+"""Multi-mode /transport searches against stub provider servers"""
+
+import pytest
+
+DELHI = {"name": "Delhi", "lat": 28.6139, "lng": 77.209}
+JAIPUR = {"name": "Jaipur", "lat": 26.9124, "lng": 75.7873}
+
+
+@pytest.fixture
+def providers(service):
+    service("booking")
+    import providers
+    return providers
+
+
+def test_live_providers_are_merged_and_sorted(providers, mock_provider):
+    train = providers.IRCTCProvider(mock_provider("train"), timeout=2, live=True)
+    bus = providers.RedBusProvider(mock_provider("bus"), timeout=2, live=True)
+
+    options, status = providers.search_transport([train, bus], DELHI, JAIPUR, "2025-10-01", 2)
+
+    assert {mode: entry["status"] for mode, entry in status.items()} == {"train": "ok", "bus": "ok"}
+    assert {option["mode"] for option in options} == {"train", "bus"}
+    prices = [option.get("total_price", option.get("price", 0)) for option in options]
+    assert prices == sorted(prices)
+    assert train.fallbacks == 0 and bus.fallbacks == 0
+
+
+def test_slow_provider_only_costs_its_own_results(providers, mock_provider):
+    train = providers.IRCTCProvider(mock_provider("train"), timeout=2, live=True)
+    bus = providers.RedBusProvider(mock_provider("bus", latency_ms=1500), timeout=0.3, live=True)
+
+    options, status = providers.search_transport([train, bus], DELHI, JAIPUR, "2025-10-01", 1)
+
+    assert status["train"]["status"] == "ok"
+    assert status["bus"]["status"] == "timeout"
+    assert options and all(option["mode"] == "train" for option in options)
+
+
+def test_sort_by_duration(providers, mock_provider):
+    train = providers.IRCTCProvider(mock_provider("train"), timeout=2, live=True)
+    flight = providers.MakeMyTripProvider(mock_provider("flight"), timeout=2, live=True)
+
+    options, _ = providers.search_transport([train, flight], DELHI, JAIPUR, "2025-10-01", 1, sort_by="duration")
+
+    durations = [option["duration_minutes"] or 0 for option in options]
+    assert durations == sorted(durations)
+
+
+def test_transport_endpoint_accepts_all_modes(service):
+    client = service("booking").app.test_client()
+    response = client.post('/transport', json={"origin": DELHI, "destination": JAIPUR, "date": "2025-10-01", "mode": "all"})
+
+    body = response.get_json()
+    assert response.status_code == 200
+    assert set(body["modes"]) == {"train", "bus", "flight"}
+    assert body["partial"] is False
+    assert {option["mode"] for option in body["options"]} == {"train", "bus", "flight"}
+
+
+def test_transport_endpoint_rejects_unknown_modes(service):
+    client = service("booking").app.test_client()
+    response = client.post('/transport', json={"origin": DELHI, "destination": JAIPUR, "date": "2025-10-01", "mode": ["train", "boat"]})
+
+    assert response.status_code == 400
@@ -0,0 +1,121 @@
+"""Trip store compare-and-set, and plan writes that race each other"""
+
+import sqlite3
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def trip_store(service):
+    service("trip_planner")
+    import trip_store
+    return trip_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def stores(request, trip_store, tmp_path):
+    """Two handles on one store, like two worker processes sharing trips.db"""
+    if request.param == "memory":
+        store = trip_store.MemoryTripStore()
+        return store, store
+    path = str(tmp_path / "trips.db")
+    return trip_store.SQLiteTripStore(path), trip_store.SQLiteTripStore(path)
+
+
+def test_stale_write_is_rejected(stores):
+    first, second = stores
+    first.save("p1", {"days": [], "note": "original"})
+    record = first.get("p1")
+    assert record["version"] == 0
+
+    assert second.update_plan("p1", {"days": [], "note": "second"}, expected_version=0)
+    assert not first.update_plan("p1", {"days": [], "note": "stale"}, expected_version=record["version"])
+    assert first.get("p1")["plan"]["note"] == "second"
+    assert first.get("p1")["version"] == 1
+
+
+def test_concurrent_modifications_are_all_kept(stores):
+    first, second = stores
+    first.save("p1", {"days": [], "count": 0, "writers": []})
+
+    def writer(store, name):
+        for i in range(15):
+            def change(record):
+                record["plan"]["count"] += 1
+                record["plan"]["writers"].append(f"{name}{i}")
+                return True, None
+            store.modify_plan("p1", change, attempts=100)
+
+    threads = [threading.Thread(target=writer, args=(store, name)) for store, name in ((first, "a"), (second, "b"), (first, "c"))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    plan = second.get("p1")["plan"]
+    assert plan["count"] == 45
+    assert len(set(plan["writers"])) == 45
+
+
+def test_unchanged_modification_does_not_write(stores):
+    first, _ = stores
+    first.save("p1", {"days": []})
+
+    record, result = first.modify_plan("p1", lambda record: (False, "nothing to do"))
+    assert result == "nothing to do"
+    assert first.get("p1")["version"] == 0
+    assert first.modify_plan("missing", lambda record: (True, None)) is None
+
+
+def test_old_database_gets_a_version_column(trip_store, tmp_path):
+    path = str(tmp_path / "old.db")
+    with sqlite3.connect(path) as conn:
+        conn.execute("""
+            CREATE TABLE trips (plan_id TEXT PRIMARY KEY, user_id TEXT, query TEXT, preferences TEXT,
+                                plan TEXT NOT NULL, created_at REAL NOT NULL, updated_at REAL NOT NULL)
+        """)
+        conn.execute("INSERT INTO trips VALUES ('old', NULL, '', '{}', '{\"days\": []}', 0, 0)")
+
+    store = trip_store.SQLiteTripStore(path)
+    assert store.get("old")["version"] == 0
+    assert store.update_plan("old", {"days": [1]}, expected_version=0)
+
+
+def test_budget_item_posted_during_a_replan_is_kept(gateway, service, monkeypatch):
+    planner = service("trip_planner")
+    plan = gateway.post('/api/trip/plan', json={"query": "3 days in Jaipur", "preferences": {"budget": 20000, "duration": 3}}).get_json()
+    plan_id = plan["plan_id"]
+    assert gateway.get(f'/api/trip/plan/{plan_id}/budget').status_code == 200
+
+    replan_day = planner.replan_day
+
+    def slow_replan_day(*args, **kwargs):
+        time.sleep(0.5)
+        return replan_day(*args, **kwargs)
+
+    monkeypatch.setattr(planner, "replan_day", slow_replan_day)
+    replanned = []
+    thread = threading.Thread(target=lambda: replanned.append(
+        gateway.post(f'/api/trip/plan/{plan_id}/replan', json={"instruction": "swap day 2 for museums", "days": [2]})
+    ))
+    thread.start()
+    time.sleep(0.1)
+    item = gateway.post(f'/api/trip/plan/{plan_id}/budget/items', json={
+        "day": 1, "category": "accommodation", "item": {"name": "Hotel Kept", "total_price": 999}
+    })
+    thread.join()
+
+    assert item.status_code == 200
+    assert replanned[0].status_code == 200
+    hotel = gateway.get(f'/api/trip/plan/{plan_id}/budget').get_json()["ledger"]["days"]["1"]["items"]["accommodation"]
+    assert (hotel["name"], hotel["cost"]) == ("Hotel Kept", 999)
+
+
+def test_replan_rejects_days_that_are_not_day_numbers(gateway):
+    plan_id = gateway.post('/api/trip/plan', json={"query": "2 days in Agra", "preferences": {"duration": 2}}).get_json()["plan_id"]
+
+    for days in ("2", [True], ["2"], {"day": 2}):
+        response = gateway.post(f'/api/trip/plan/{plan_id}/replan', json={"instruction": "swap day 2", "days": days})
+        assert response.status_code == 400
@@ -0,0 +1,117 @@
+"""
+backend/tools/fake_gemini.py
+Fake Gemini Server - Answers the Gemini REST generateContent API locally with templated
+outputs and realistic latencies, so the services can be load tested without the real model
+(countTokens is answered too, for the services' startup prewarm)
+
+Usage:
+    python tools/fake_gemini.py --port 7100 --latency-scale 0.1 --error-rate 0.02
+    GOOGLE_API_KEY=fake GEMINI_API_ENDPOINT=http://localhost:7100 python trip_planner/app.py
+
+Each prompt family gets a log-normal latency around the medians in common/fake_llm.py,
+multiplied by --latency-scale. --error-rate answers that fraction of calls with a 503.
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from common.fake_llm import detect_family, fake_response_text, sample_latency, estimate_tokens
+
+
+def request_prompt(body):
+    """All text of a generateContent request, system instruction included"""
+    texts = []
+    for content in [body.get("systemInstruction") or body.get("system_instruction") or {}] + body.get("contents", []):
+        for part in content.get("parts", []):
+            if "text" in part:
+                texts.append(part["text"])
+    return "\n".join(texts)
+
+
+def make_handler(latency_scale, error_rate, seed):
+    rng = random.Random(seed)
+    rng_lock = threading.Lock()
+
+    class FakeGeminiHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_POST(self):
+            path = self.path.split("?")[0]
+            if not path.endswith((":generateContent", ":countTokens")):
+                self.send_json(404, {"error": {"code": 404, "message": "Not found", "status": "NOT_FOUND"}})
+                return
+
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if path.endswith(":countTokens"):
+                # Used by the services' startup prewarm
+                self.send_json(200, {"totalTokens": estimate_tokens(request_prompt(body.get("generateContentRequest", body)))})
+                return
+
+            prompt = request_prompt(body)
+            family = detect_family(prompt)
+
+            with rng_lock:
+                latency = sample_latency(family, rng, latency_scale)
+                failed = rng.random() < error_rate
+            time.sleep(latency)
+
+            if failed:
+                self.send_json(503, {"error": {"code": 503, "message": "Injected failure", "status": "UNAVAILABLE"}})
+                return
+
+            text = fake_response_text(prompt, family)
+            prompt_tokens, candidate_tokens = estimate_tokens(prompt), estimate_tokens(text)
+            self.send_json(200, {
+                "candidates": [{
+                    "content": {"parts": [{"text": text}], "role": "model"},
+                    "finishReason": "STOP",
+                    "index": 0
+                }],
+                "usageMetadata": {
+                    "promptTokenCount": prompt_tokens,
+                    "candidatesTokenCount": candidate_tokens,
+                    "totalTokenCount": prompt_tokens + candidate_tokens
+                },
+                "modelVersion": "fake-gemini"
+            })
+
+        def send_json(self, status, payload):
+            data = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def log_message(self, format, *args):
+            pass
+
+    return FakeGeminiHandler
+
+
+def serve(port, latency_scale=1.0, error_rate=0.0, seed=0):
+    server = ThreadingHTTPServer(("0.0.0.0", port), make_handler(latency_scale, error_rate, seed))
+    server.daemon_threads = True
+    return server
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Fake Gemini REST server")
+    parser.add_argument("--port", type=int, default=7100)
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Multiplier for the per-family latency medians")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = serve(args.port, args.latency_scale, args.error_rate, args.seed)
+    print(f"Fake Gemini listening on port {args.port}")
+    server.serve_forever()
\ No newline at end of file
@@ -0,0 +1,90 @@
+"""
+backend/tools/import_profile.py
+Import Profile - How long each service takes to import, and which packages it spends it on
+
+Usage:
+    python tools/import_profile.py                  # all services, 8 heaviest packages each
+    python tools/import_profile.py router --top 15
+    MODEL_BACKEND=fake python tools/import_profile.py --json import_profile.json
+
+Each service is imported in a fresh interpreter with `python -X importtime`, so the numbers
+are a cold start without the time to bind the port. Prewarming is turned off: it runs in
+the background and doesn't hold up the import. Times are the best of --repeat runs.
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SERVICES = ["api_gateway", "trip_planner", "router", "recommendation", "booking"]
+
+# The marker separates the interpreter's own startup imports from the service's
+IMPORT_APP = (
+    "import sys, time; sys.stderr.write('-- import app --\\n'); "
+    "started = time.perf_counter(); import app; print(time.perf_counter() - started)"
+)
+
+
+def profile_import(service):
+    """Return (seconds to import app, {top-level package: cumulative microseconds})"""
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "import-profile")
+    env.setdefault("TRIP_STORE_URL", "memory://")
+    env["MODEL_PREWARM"] = "0"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", IMPORT_APP],
+        cwd=os.path.join(BACKEND_DIR, service), env=env, capture_output=True, text=True, timeout=120
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"{service} failed to import:\n{result.stderr[-2000:]}")
+
+    packages = {}
+    lines = result.stderr.splitlines()
+    for line in lines[lines.index("-- import app --") + 1:]:
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        name = name.strip()
+        # Only whole packages (numpy, not numpy.core), the first time they are imported
+        if "." not in name and name not in packages:
+            packages[name] = int(cumulative)
+    return float(result.stdout.strip().splitlines()[-1]), packages
+
+
+def profile(service, repeat):
+    runs = [profile_import(service) for _ in range(repeat)]
+    seconds = min(run[0] for run in runs)
+    packages = {name: min(run[1].get(name, 0) for run in runs) for name in runs[0][1]}
+    packages.pop("app", None)
+    return seconds, packages
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Import time per service")
+    parser.add_argument("services", nargs="*", default=SERVICES)
+    parser.add_argument("--top", type=int, default=8, help="Heaviest packages to list per service")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    print(f"MODEL_BACKEND={os.getenv('MODEL_BACKEND', 'gemini')}")
+    report = {}
+    for service in args.services:
+        seconds, packages = profile(service, args.repeat)
+        heaviest = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:args.top]
+        report[service] = {
+            "import_ms": round(seconds * 1000, 1),
+            "packages_ms": {name: round(us / 1000, 1) for name, us in heaviest}
+        }
+        print(f"\n{service}: {seconds * 1000:.0f} ms")
+        for name, us in heaviest:
+            print(f"  {name:30s} {us / 1000:8.1f} ms")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(report, f, indent=2)
\ No newline at end of file
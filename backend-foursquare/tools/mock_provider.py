@@ -0,0 +1,82 @@
+"""
+backend/tools/mock_provider.py
+Mock Provider Server - Stands in for IRCTC / RedBus / MakeMyTrip so the booking
+service's provider adapters can be exercised locally
+
+Usage:
+    python tools/mock_provider.py --mode train --port 7001 --latency-ms 200 --jitter-ms 300 --error-rate 0.1
+    LIVE_PROVIDERS=train IRCTC_API=http://localhost:7001 python booking/app.py
+"""
+
+import argparse
+import json
+import os
+import random
+import sys
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'booking'))
+
+from inventory import generate_train_options, generate_bus_options, generate_flight_options
+
+GENERATORS = {
+    "train": lambda leg, travel_class: generate_train_options(*leg, travel_class),
+    "bus": lambda leg, travel_class: generate_bus_options(*leg),
+    "flight": lambda leg, travel_class: generate_flight_options(*leg)
+}
+
+
+def make_handler(mode, latency_ms, jitter_ms, error_rate):
+    class MockProviderHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            url = urlparse(self.path)
+            if url.path != "/search":
+                self.send_json(404, {"error": "Not found"})
+                return
+
+            # Simulated provider latency with a long tail
+            time.sleep((latency_ms + random.expovariate(1 / jitter_ms) if jitter_ms else latency_ms) / 1000)
+
+            if random.random() < error_rate:
+                self.send_json(503, {"error": "Injected failure"})
+                return
+
+            params = {key: values[0] for key, values in parse_qs(url.query).items()}
+            # The provider API only gets names, so the mock has no coordinates to work with
+            leg = (
+                {"name": params.get("from", "Origin")},
+                {"name": params.get("to", "Destination")},
+                params.get("date", "2025-09-10"),
+                int(params.get("passengers", 1))
+            )
+            self.send_json(200, {"options": GENERATORS[mode](leg, params.get("class"))})
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload).encode()
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    return MockProviderHandler
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Mock transport provider server")
+    parser.add_argument("--mode", choices=sorted(GENERATORS), required=True)
+    parser.add_argument("--port", type=int, default=7001)
+    parser.add_argument("--latency-ms", type=float, default=100)
+    parser.add_argument("--jitter-ms", type=float, default=0, help="Mean of the exponential tail added to the latency")
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("0.0.0.0", args.port), make_handler(args.mode, args.latency_ms, args.jitter_ms, args.error_rate))
+    print(f"Mock {args.mode} provider listening on port {args.port}")
+    server.serve_forever()
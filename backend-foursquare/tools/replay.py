@@ -0,0 +1,246 @@
+"""
+backend/tools/replay.py
+Replay Load Test - Replays captured gateway traffic (see api_gateway/capture.py) and reports
+p50/p95/p99 latency and throughput per endpoint
+
+Usage:
+    # Replay a capture against a running gateway, with the captured timing twice as fast
+    python tools/replay.py capture.jsonl --speed 2
+
+    # Start a fake Gemini server and all five services, then drive them at 5 requests/second
+    python tools/replay.py capture.jsonl --spawn --latency-scale 0.05 --rate 5 --duration 60
+
+The schedule is fixed before the run starts (seeded when --poisson is used), so two runs
+send the same requests at the same offsets. Latency is measured from each request's
+scheduled send time, so a saturated client pool shows up as latency instead of silently
+lowering the request rate.
+"""
+
+import argparse
+import json
+import math
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+SERVICES = [
+    ("trip_planner", 6001),
+    ("router", 6002),
+    ("recommendation", 6003),
+    ("booking", 6004),
+    ("api_gateway", 6000),
+]
+
+
+def load_capture(path):
+    with open(path) as f:
+        records = [json.loads(line) for line in f if line.strip()]
+    return sorted(records, key=lambda record: record["time"])
+
+
+def build_schedule(records, rate=None, speed=1.0, duration=None, poisson=False, seed=0):
+    """Return [(offset seconds, record)] in send order"""
+    rng = random.Random(seed)
+    schedule = []
+    offset = 0.0
+    index = 0
+    first_time = records[0]["time"]
+    loop_length = records[-1]["time"] - first_time
+
+    while True:
+        record = records[index % len(records)]
+        if rate:
+            if index:
+                offset += rng.expovariate(rate) if poisson else 1 / rate
+        else:
+            loops = index // len(records)
+            # One second between loops so the last and first captured requests don't overlap
+            offset = (loops * (loop_length + 1) + record["time"] - first_time) / speed
+
+        if duration is not None and offset >= duration:
+            break
+        schedule.append((offset, record))
+        index += 1
+        if duration is None and index >= len(records):
+            break
+    return schedule
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile"""
+    if not sorted_values:
+        return float("nan")
+    rank = max(1, math.ceil(p / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def replay(target, schedule, concurrency, timeout):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+
+    results = defaultdict(list)  # endpoint -> [(latency seconds, status)]
+    results_lock = threading.Lock()
+
+    def send(scheduled_at, record):
+        headers = {"Accept-Encoding": "gzip"}
+        if record.get("priority"):
+            headers["X-Priority"] = record["priority"]
+        try:
+            response = session.request(
+                record["method"], target + record["path"],
+                json=record.get("request") if record["method"] != "GET" else None,
+                headers=headers, timeout=timeout
+            )
+            status = response.status_code
+        except requests.RequestException:
+            status = 0
+        latency = time.monotonic() - scheduled_at
+        endpoint = f"{record['method']} {record.get('route') or record['path']}"
+        with results_lock:
+            results[endpoint].append((latency, status))
+
+    started = time.monotonic()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for offset, record in schedule:
+            scheduled_at = started + offset
+            delay = scheduled_at - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            executor.submit(send, scheduled_at, record)
+    elapsed = time.monotonic() - started
+    return results, elapsed
+
+
+def summarize(results, elapsed):
+    report = {}
+    for endpoint, samples in sorted(results.items()):
+        latencies = sorted(latency * 1000 for latency, _ in samples)
+        statuses = defaultdict(int)
+        for _, status in samples:
+            statuses[status] += 1
+        report[endpoint] = {
+            "requests": len(samples),
+            "errors": sum(count for status, count in statuses.items() if status == 0 or status >= 500),
+            "statuses": {str(status): count for status, count in sorted(statuses.items())},
+            "p50_ms": round(percentile(latencies, 50), 1),
+            "p95_ms": round(percentile(latencies, 95), 1),
+            "p99_ms": round(percentile(latencies, 99), 1),
+            "max_ms": round(latencies[-1], 1),
+            "throughput_rps": round(len(samples) / elapsed, 3) if elapsed else 0.0
+        }
+    return report
+
+
+def print_report(report, elapsed):
+    print(f"{'endpoint':45s} {'reqs':>6s} {'errs':>5s} {'p50 ms':>9s} {'p95 ms':>9s} {'p99 ms':>9s} {'req/s':>7s}")
+    for endpoint, row in report.items():
+        print(f"{endpoint:45s} {row['requests']:6d} {row['errors']:5d} {row['p50_ms']:9.1f} {row['p95_ms']:9.1f} {row['p99_ms']:9.1f} {row['throughput_rps']:7.2f}")
+    total = sum(row["requests"] for row in report.values())
+    print(f"\n{total} requests in {elapsed:.1f}s ({total / elapsed if elapsed else 0:.2f} req/s)")
+
+
+def spawn_stack(latency_scale, error_rate, fake_port, seed):
+    """Start a fake Gemini server in-process and the five services as subprocesses"""
+    from fake_gemini import serve
+
+    gemini = serve(fake_port, latency_scale, error_rate, seed)
+    threading.Thread(target=gemini.serve_forever, daemon=True).start()
+
+    env = dict(os.environ)
+    env.setdefault("GOOGLE_API_KEY", "fake")
+    env.update({
+        "GEMINI_API_ENDPOINT": f"http://127.0.0.1:{fake_port}",
+        "TRIP_STORE_URL": "memory://",
+        "TRIP_PLANNER_URL": "http://127.0.0.1:6001",
+        "ROUTER_URL": "http://127.0.0.1:6002",
+        "RECOMMENDATION_URL": "http://127.0.0.1:6003",
+        "BOOKING_URL": "http://127.0.0.1:6004",
+    })
+    run_app = "import os, app; app.app.run(host='127.0.0.1', port=int(os.environ['PORT']), threaded=True)"
+
+    processes = []
+    for directory, port in SERVICES:
+        processes.append(subprocess.Popen(
+            [sys.executable, "-c", run_app],
+            cwd=os.path.join(BACKEND_DIR, directory),
+            env=dict(env, PORT=str(port)),
+            stdout=subprocess.DEVNULL,
+            stderr=subprocess.DEVNULL
+        ))
+
+    deadline = time.monotonic() + 60
+    for directory, port in SERVICES:
+        while True:
+            try:
+                if requests.get(f"http://127.0.0.1:{port}/health/live", timeout=1).status_code == 200:
+                    break
+            except requests.RequestException:
+                pass
+            if time.monotonic() > deadline:
+                stop_stack(gemini, processes)
+                raise RuntimeError(f"{directory} did not start on port {port}")
+            time.sleep(0.2)
+    return gemini, processes
+
+
+def stop_stack(gemini, processes):
+    for process in processes:
+        process.terminate()
+    for process in processes:
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+    gemini.shutdown()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Replay captured gateway traffic")
+    parser.add_argument("capture", help="JSONL file written with GATEWAY_CAPTURE")
+    parser.add_argument("--target", default="http://127.0.0.1:6000", help="Gateway base URL")
+    parser.add_argument("--rate", type=float, help="Requests per second; default is the captured timing")
+    parser.add_argument("--speed", type=float, default=1.0, help="Speed-up of the captured timing")
+    parser.add_argument("--poisson", action="store_true", help="Exponential gaps at --rate instead of a fixed interval")
+    parser.add_argument("--duration", type=float, help="Seconds to run, looping over the capture")
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--timeout", type=float, default=180)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--spawn", action="store_true", help="Start a fake Gemini server and the five services")
+    parser.add_argument("--latency-scale", type=float, default=1.0, help="Fake Gemini latency multiplier (with --spawn)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fake Gemini failure rate (with --spawn)")
+    parser.add_argument("--fake-gemini-port", type=int, default=7100)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+
+    records = load_capture(args.capture)
+    if not records:
+        sys.exit("Capture file is empty")
+    schedule = build_schedule(records, args.rate, args.speed, args.duration, args.poisson, args.seed)
+    print(f"Replaying {len(schedule)} requests over {schedule[-1][0]:.1f}s against {args.target}")
+
+    stack = spawn_stack(args.latency_scale, args.error_rate, args.fake_gemini_port, args.seed) if args.spawn else None
+    try:
+        results, elapsed = replay(args.target, schedule, args.concurrency, args.timeout)
+    finally:
+        if stack:
+            stop_stack(*stack)
+
+    report = summarize(results, elapsed)
+    print_report(report, elapsed)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"elapsed_s": round(elapsed, 3), "endpoints": report}, f, indent=2)
\ No newline at end of file
@@ -4,13 +4,31 @@ Trip Planner Service - Core planning logic using Gemini 2.5 Pro
 """
 
 import os
+import sys
+import re
 import json
+import uuid
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FuturesTimeout
 from flask import Flask, request, jsonify
 from flask_cors import CORS
 from dotenv import load_dotenv
-import google.generativeai as genai
-from google.generativeai import types
 import requests
+from trip_store import create_trip_store, PlanConflict
+from cost_engine import BudgetLedger, CATEGORIES, InvalidAmount, normalize_option, parse_amount
+from job_queue import JobQueue, create_job_store
+
+# Shared modules live in backend-foursquare/common
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+from common.tracing import init_tracing, span, trace_headers, propagate
+from common.metrics import init_metrics, track_llm
+from common.serialization import use_orjson
+from common.compression import init_compression
+from common.health import init_health, executor_queue_depth
+from common.admission import AdmissionController, init_admission, remaining_time
+from common.llm import LazyModel, start_prewarm, create_model
+from common import service_client
 
 # Load environment variables
 load_dotenv()
@@ -18,47 +36,158 @@ load_dotenv()
 # Initialize the Flask application
 app = Flask(__name__)
 CORS(app)
+init_tracing(app, "trip-planner")
+init_metrics(app, "trip-planner")
+use_orjson(app)
+init_compression(app)
 
-# Initialize Gemini AI with API key
-GOOGLE_API_KEY = os.getenv("GOOGLE_API_KEY")
-if not GOOGLE_API_KEY:
-    raise ValueError("No GOOGLE_API_KEY found in environment variables")
-
-genai.configure(api_key=GOOGLE_API_KEY)
-model = genai.GenerativeModel(model_name="gemini-2.5-pro")
+# Gemini model, or the offline stand-in with MODEL_BACKEND=fake (see common/llm.py).
+# Created on first use so startup stays fast; start_prewarm does it ahead of traffic.
+model = LazyModel()
 
 # Router service URL for route optimization
 ROUTER_URL = os.getenv("ROUTER_URL", "http://localhost:6002")
 
+# Route optimization runs in the background so a slow router never holds up the plan.
+# ROUTE_DEADLINE is how long /plan waits for it; ROUTE_TIMEOUT bounds the router call itself.
+ROUTE_DEADLINE = float(os.getenv("ROUTE_DEADLINE", 3))
+ROUTE_TIMEOUT = float(os.getenv("ROUTE_TIMEOUT", 30))
+MAX_TRACKED_ROUTES = 1000
+
+route_executor = ThreadPoolExecutor(max_workers=int(os.getenv("ROUTE_WORKERS", 4)))
+route_jobs = OrderedDict()  # plan_id -> Future of the optimized route
+route_jobs_lock = threading.Lock()
+
+route_queue_depth = executor_queue_depth(route_executor)
+init_health(
+    app, "trip-planner",
+    queue_depth=lambda: route_queue_depth() + plan_jobs.store.count("queued"),
+    checks={"model": start_prewarm(model)}
+)
+
+# Admission control for the Gemini-bound endpoints: at most *_CONCURRENCY requests run at
+# once, up to *_QUEUE more wait for a slot, the rest get 503 with Retry-After
+init_admission(app)
+ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", 10))
+plan_admission = AdmissionController(
+    "plan", int(os.getenv("PLAN_CONCURRENCY", 4)), int(os.getenv("PLAN_QUEUE", 16)), ADMISSION_QUEUE_TIMEOUT
+)
+# Chat and replans share one pool of Gemini slots. Replans run as background work, so a
+# chat message is served ahead of queued replans and sheds them when the queue is full.
+chat_replan_admission = AdmissionController(
+    "chat_replan", int(os.getenv("CHAT_REPLAN_CONCURRENCY", 8)), int(os.getenv("CHAT_REPLAN_QUEUE", 32)), ADMISSION_QUEUE_TIMEOUT
+)
+
+# Trip plans are persisted by plan id so chat and re-planning can build on them
+TRIP_STORE_URL = os.getenv("TRIP_STORE_URL", "sqlite:///trips.db")
+trip_store = create_trip_store(TRIP_STORE_URL)
+
+# Every change to a saved plan (budget ledger, replans, finished routes) goes through
+# trip_store.modify_plan, a compare-and-set on the plan's version that retries on a fresh
+# read, so concurrent writers in any thread or worker process never lose each other's
+# changes. LLM and router calls happen before it, their results are applied inside it.
+
+# Plan jobs (POST /plan/jobs) run on PLAN_JOB_WORKERS threads instead of holding a request
+# thread for the whole generation. They are kept in PLAN_JOB_STORE_URL (the trip store's
+# database by default), so any process sharing it can pick them up and retry them.
+PLAN_JOB_STORE_URL = os.getenv("PLAN_JOB_STORE_URL", TRIP_STORE_URL)
+PLAN_JOB_QUEUE = int(os.getenv("PLAN_JOB_QUEUE", 100))
+PLAN_JOB_WAIT_MAX = 30  # Longest a status request may long-poll, in seconds
+
+SAFETY_SETTINGS = [
+    {
+        "category": "HARM_CATEGORY_HARASSMENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_HATE_SPEECH",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    },
+    {
+        "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
+        "threshold": "BLOCK_MEDIUM_AND_ABOVE"
+    }
+]
+
 @app.route('/health', methods=['GET'])
 def health_check():
     """Health check endpoint"""
     return jsonify({"status": "healthy", "service": "trip-planner"})
 
-@app.route('/plan', methods=['POST'])
-def plan_trip():
-    """
-    Create a comprehensive trip plan based on user requirements
-    Expected input:
-    {
-        "query": "Plan a 5-day Kerala trip: backwaters, beaches, budget ₹20K",
-        "preferences": {
-            "budget": 20000,
-            "duration": 5,
-            "interests": ["nature", "beaches", "relaxation"],
-            "dietary": ["vegetarian"],
-            "transportation": ["train", "bus"]
-        },
-        "user_id": "user123"
-    }
-    """
-    data = request.json
-    query = data.get('query', '')
-    preferences = data.get('preferences', {})
+def extract_json_block(text):
+    """Extract the ```json fenced block from a Gemini response"""
+    json_start = text.find('```json') + 7
+    json_end = text.find('```', json_start)
+    return text[json_start:json_end].strip()
+
+def extract_route_locations(trip_plan):
+    """Collect the locations of every day in the plan, in itinerary order"""
+    locations = []
+    for day in trip_plan.get('days', []):
+        for location in day.get('locations', []):
+            locations.append({
+                "name": location['name'],
+                "lat": location['lat'],
+                "lng": location['lng']
+            })
+    return locations
+
+def optimize_trip_route(locations):
+    """Call the router service to optimize the route, returns None if it fails"""
+    with span("router.optimize", locations=len(locations)):
+        route_response = service_client.post(
+            f"{ROUTER_URL}/optimize",
+            json={"locations": locations},
+            headers=trace_headers(),
+            timeout=ROUTE_TIMEOUT
+        )
+    if route_response.status_code == 200:
+        return route_response.json()
+    return None
+
+def start_route_optimization(plan_id, locations):
+    """Submit route optimization for a plan and remember it so it can be fetched later"""
+    future = route_executor.submit(propagate(optimize_trip_route), locations)
+    with route_jobs_lock:
+        route_jobs[plan_id] = future
+        # Forget the oldest plans so the job table stays bounded
+        while len(route_jobs) > MAX_TRACKED_ROUTES:
+            route_jobs.popitem(last=False)
+    future.add_done_callback(lambda f: persist_route(plan_id, f))
+    return future
+
+def persist_route(plan_id, future):
+    """Store a finished route optimization on the saved plan"""
+    try:
+        optimized_route = future.result()
+    except requests.RequestException:
+        return
     
-    if not query:
-        return jsonify({"error": "No query provided"}), 400
+    if not optimized_route:
+        return
     
+    def set_route(record):
+        plan = record['plan']
+        plan['optimized_route'] = optimized_route
+        plan.pop('optimized_route_status', None)
+        plan.pop('optimized_route_url', None)
+        return True, None
+    
+    try:
+        trip_store.modify_plan(plan_id, set_route)
+    except PlanConflict as e:
+        print(f"Storing the route of plan {plan_id} failed: {str(e)}")
+
+def generate_plan(query, preferences, user_id=None, route_wait=ROUTE_DEADLINE, on_saved=None):
+    """
+    Generate, save and route a trip plan, for /plan and for plan jobs. on_saved(trip_plan)
+    is called once the days are saved, before the route is waited on for up to route_wait
+    seconds. Raises when Gemini fails or its answer can't be parsed.
+    """
     # Structured prompt for Gemini
     prompt = f"""
     You are a travel planning expert AI assistant for Horizon - an end-to-end journey planner.
@@ -115,74 +244,602 @@ def plan_trip():
     Ensure all locations have realistic latitude and longitude coordinates. The plan should be optimized for time and cost efficiency. Be creative but realistic in your suggestions.
     """
     
+    # Generate trip plan using Gemini
+    generation_config = {
+        "temperature": 0.4,
+        "top_p": 0.95,
+        "top_k": 40,
+        "max_output_tokens": 8192,
+    }
+    
+    with span("llm.generate_content", prompt="itinerary"), track_llm("itinerary") as llm_call:
+        response = model.generate_content(
+            prompt,
+            generation_config=generation_config,
+            safety_settings=SAFETY_SETTINGS
+        )
+        llm_call.record(response)
+    
+    # Extract the JSON response from Gemini
+    with span("parse.itinerary"):
+        trip_plan = json.loads(extract_json_block(response.text))
+    
+    plan_id = str(uuid.uuid4())
+    trip_plan['plan_id'] = plan_id
+    trip_store.save(plan_id, trip_plan, query, preferences, user_id)
+    if on_saved is not None:
+        on_saved(trip_plan)
+    
+    # Optional: Route optimization using Router service. It is started in the
+    # background and only waited on for route_wait (ROUTE_DEADLINE for /plan); after that the plan is
+    # returned without the route and the client fetches it from /plan/<plan_id>/route
+    locations = extract_route_locations(trip_plan)
+    if len(locations) >= 2:
+        future = start_route_optimization(plan_id, locations)
+        try:
+            # Never wait on the route past the client's own deadline
+            optimized_route = future.result(timeout=remaining_time(route_wait))
+            if optimized_route:
+                trip_plan['optimized_route'] = optimized_route
+        except FuturesTimeout:
+            trip_plan['optimized_route_status'] = "pending"
+            trip_plan['optimized_route_url'] = f"/plan/{plan_id}/route"
+        except requests.RequestException:
+            # Continue even if route optimization fails
+            pass
+    
+    return trip_plan
+
+@app.route('/plan', methods=['POST'])
+@plan_admission.admit()
+def plan_trip():
+    """
+    Create a comprehensive trip plan based on user requirements
+    Expected input:
+    {
+        "query": "Plan a 5-day Kerala trip: backwaters, beaches, budget ₹20K",
+        "preferences": {
+            "budget": 20000,
+            "duration": 5,
+            "interests": ["nature", "beaches", "relaxation"],
+            "dietary": ["vegetarian"],
+            "transportation": ["train", "bus"]
+        },
+        "user_id": "user123"
+    }
+    """
+    data = request.json
+    query = data.get('query', '')
+    preferences = data.get('preferences', {})
+    
+    if not query:
+        return jsonify({"error": "No query provided"}), 400
+    
     try:
-        # Generate trip plan using Gemini
-        generation_config = {
-            "temperature": 0.4,
-            "top_p": 0.95,
-            "top_k": 40,
-            "max_output_tokens": 8192,
-        }
-        
-        safety_settings = [
-            {
-                "category": "HARM_CATEGORY_HARASSMENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_HATE_SPEECH",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            },
-            {
-                "category": "HARM_CATEGORY_DANGEROUS_CONTENT",
-                "threshold": "BLOCK_MEDIUM_AND_ABOVE"
-            }
-        ]
+        trip_plan = generate_plan(query, preferences, data.get('user_id'))
+        return jsonify(trip_plan), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def run_plan_job(payload, context):
+    """Job handler: the plan is visible on the job as soon as its days are saved"""
+    context.progress("generating")
+    return generate_plan(
+        payload['query'], payload.get('preferences', {}), payload.get('user_id'),
+        route_wait=ROUTE_TIMEOUT,
+        on_saved=lambda trip_plan: context.progress("routing", trip_plan)
+    )
+
+plan_jobs = JobQueue(
+    create_job_store(PLAN_JOB_STORE_URL), "plan", run_plan_job,
+    workers=int(os.getenv("PLAN_JOB_WORKERS", 2)),
+    max_attempts=int(os.getenv("PLAN_JOB_ATTEMPTS", 3)),
+    lease_seconds=float(os.getenv("PLAN_JOB_LEASE", 600))
+)
+
+def job_view(job):
+    """The parts of a job record clients see"""
+    result = job['result'] or {}
+    return {
+        "job_id": job['job_id'],
+        "status": job['status'],
+        "stage": job['stage'],
+        "attempts": job['attempts'],
+        "error": job['error'],
+        "version": job['version'],
+        "plan_id": result.get('plan_id'),
+        "plan": job['result'],
+        "created_at": job['created_at'],
+        "updated_at": job['updated_at']
+    }
+
+@app.route('/plan/jobs', methods=['POST'])
+def submit_plan_job():
+    """
+    Queue a trip plan and return at once with a job id to poll, for plans that take
+    longer than a proxy will hold a request open. Same input as /plan.
+    Returns 202 with {"job_id": ..., "status": "queued", "status_url": "/plan/jobs/<job_id>"}
+    """
+    data = request.json
+    if not data.get('query'):
+        return jsonify({"error": "No query provided"}), 400
+    
+    try:
+        if plan_jobs.store.count("queued") >= PLAN_JOB_QUEUE:
+            return jsonify({"error": "Too many plans queued, try again shortly"}), 503, {"Retry-After": "10"}
         
+        job = plan_jobs.submit({
+            "query": data['query'],
+            "preferences": data.get('preferences', {}),
+            "user_id": data.get('user_id')
+        })
+        response = job_view(job)
+        response["status_url"] = f"/plan/jobs/{job['job_id']}"
+        return jsonify(response), 202, {"Location": response["status_url"]}
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/plan/jobs/<job_id>', methods=['GET'])
+def get_plan_job(job_id):
+    """
+    Status of a plan job. "plan" holds the days once they are generated (stage "routing")
+    and the whole plan when the job is complete.
+    Query parameters for long polling: wait=<seconds> (at most 30) returns as soon as the
+    job's version differs from version=<n>, the one the client last saw.
+    """
+    try:
+        wait = min(float(request.args.get('wait', 0)), PLAN_JOB_WAIT_MAX)
+        version = request.args.get('version', type=int)
+    except ValueError:
+        return jsonify({"error": "wait must be a number of seconds"}), 400
+    
+    try:
+        if wait > 0 and version is not None:
+            job = plan_jobs.wait_for_change(job_id, version, remaining_time(wait))
+        else:
+            job = plan_jobs.store.get(job_id)
+        if not job:
+            return jsonify({"error": f"No plan job found with id {job_id}"}), 404
+        return jsonify(job_view(job)), 200
+    
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/plan/<plan_id>/route', methods=['GET'])
+def get_plan_route(plan_id):
+    """
+    Get the optimized route of a plan whose optimization missed the /plan deadline
+    Returns 202 while the router is still working on it
+    """
+    with route_jobs_lock:
+        future = route_jobs.get(plan_id)
+    
+    if future is None:
+        # The job may be gone (evicted or the service restarted) but the route was saved
+        record = trip_store.get(plan_id)
+        if record and record['plan'].get('optimized_route'):
+            return jsonify({
+                "plan_id": plan_id,
+                "status": "complete",
+                "optimized_route": record['plan']['optimized_route']
+            }), 200
+        return jsonify({"error": f"No route found for plan {plan_id}"}), 404
+    
+    if not future.done():
+        return jsonify({"plan_id": plan_id, "status": "pending"}), 202
+    
+    try:
+        optimized_route = future.result()
+    except requests.RequestException as e:
+        return jsonify({"plan_id": plan_id, "status": "failed", "error": str(e)}), 502
+    
+    if not optimized_route:
+        return jsonify({"plan_id": plan_id, "status": "failed", "error": "Route optimization failed"}), 502
+    
+    return jsonify({"plan_id": plan_id, "status": "complete", "optimized_route": optimized_route}), 200
+
+@app.route('/plan/<plan_id>', methods=['GET'])
+def get_plan(plan_id):
+    """Get a saved trip plan"""
+    record = trip_store.get(plan_id)
+    if not record:
+        return jsonify({"error": f"No plan found with id {plan_id}"}), 404
+    return jsonify(record['plan']), 200
+
+def summarize_plan(trip_plan):
+    """Compact day-by-day summary of a plan, used as context in prompts"""
+    lines = [f"Trip: {trip_plan.get('title', '')} ({trip_plan.get('duration', '')})"]
+    for day in trip_plan.get('days', []):
+        names = ', '.join(location.get('name', '') for location in day.get('locations', []))
+        lines.append(f"Day {day.get('day')}: {day.get('title', '')} - {names}")
+    return "\n".join(lines)
+
+def find_referenced_days(instruction, trip_plan):
+    """Find the day numbers an edit instruction refers to, e.g. "swap day 3 for beaches" -> [3]"""
+    day_numbers = {day.get('day') for day in trip_plan.get('days', [])}
+    referenced = set()
+    for match in re.finditer(r'\bdays?\s+((?:\d+\s*(?:,|and|&)?\s*)+)', instruction, re.IGNORECASE):
+        for number in re.findall(r'\d+', match.group(1)):
+            referenced.add(int(number))
+    return sorted(referenced & day_numbers)
+
+def replan_day(trip_plan, day, instruction, preferences):
+    """Regenerate a single day of a plan with a targeted prompt"""
+    prompt = f"""
+    You are a travel planning expert AI assistant for Horizon - an end-to-end journey planner.
+    
+    The user already has this trip plan:
+    {summarize_plan(trip_plan)}
+    
+    USER PREFERENCES:
+    - Budget: {preferences.get('budget', 'Not specified')}
+    - Interests: {', '.join(preferences.get('interests', []))}
+    - Dietary Restrictions: {', '.join(preferences.get('dietary', []))}
+    - Preferred Transportation: {', '.join(preferences.get('transportation', []))}
+    
+    The user asked for this change: "{instruction}"
+    
+    Rewrite ONLY day {day['day']}, which is currently:
+    {json.dumps(day)}
+    
+    Keep it consistent with the days before and after it. Format your response as a single JSON object with exactly the same structure as the current day:
+    
+    ```json
+    {{
+        "day": {day['day']},
+        "title": "Day title",
+        "locations": [...],
+        "transport": {{...}}
+    }}
+    ```
+    
+    Ensure all locations have realistic latitude and longitude coordinates.
+    """
+    
+    with span("llm.generate_content", prompt="replan_day", day=day['day']), track_llm("replan_day") as llm_call:
         response = model.generate_content(
             prompt,
-            generation_config=generation_config,
-            safety_settings=safety_settings
+            generation_config={
+                "temperature": 0.4,
+                "top_p": 0.95,
+                "top_k": 40,
+                "max_output_tokens": 2048,
+            },
+            safety_settings=SAFETY_SETTINGS
         )
+        llm_call.record(response)
+    
+    with span("parse.replan_day"):
+        new_day = json.loads(extract_json_block(response.text))
+    new_day['day'] = day['day']
+    return new_day
+
+def diff_day(old_day, new_day):
+    """Describe what changed between two versions of a day"""
+    old_names = [location.get('name') for location in old_day.get('locations', [])]
+    new_names = [location.get('name') for location in new_day.get('locations', [])]
+    return {
+        "day": new_day['day'],
+        "old_title": old_day.get('title'),
+        "new_title": new_day.get('title'),
+        "added_locations": [name for name in new_names if name not in old_names],
+        "removed_locations": [name for name in old_names if name not in new_names],
+        "kept_locations": [name for name in new_names if name in old_names]
+    }
+
+@app.route('/plan/<plan_id>/replan', methods=['POST'])
+@chat_replan_admission.admit(priority="background")
+def replan_trip(plan_id):
+    """
+    Incrementally re-plan part of a saved trip. Only the affected days are regenerated
+    and only their routes are re-optimized.
+    Expected input:
+    {
+        "instruction": "Swap day 3 for beaches",
+        "days": [3]  // Optional, taken from the instruction if missing
+    }
+    """
+    data = request.json
+    instruction = data.get('instruction', '')
+    
+    if not instruction:
+        return jsonify({"error": "No instruction provided"}), 400
+    
+    requested_days = data.get('days')
+    if requested_days is not None and (
+        not isinstance(requested_days, list)
+        or any(isinstance(number, bool) or not isinstance(number, int) for number in requested_days)
+    ):
+        return jsonify({"error": "days must be a list of day numbers"}), 400
+    
+    record = trip_store.get(plan_id)
+    if not record:
+        return jsonify({"error": f"No plan found with id {plan_id}"}), 404
+    
+    trip_plan = record['plan']
+    day_numbers = requested_days or find_referenced_days(instruction, trip_plan)
+    days_to_change = [day for day in trip_plan.get('days', []) if day.get('day') in day_numbers]
+    
+    if not days_to_change:
+        return jsonify({"error": "Could not tell which days to change, please specify them in 'days'"}), 400
+    
+    try:
+        # Regenerate the affected days in parallel
+        with ThreadPoolExecutor(max_workers=len(days_to_change)) as executor:
+            day_futures = [
+                executor.submit(propagate(replan_day), trip_plan, day, instruction, record['preferences'])
+                for day in days_to_change
+            ]
+            new_days = [future.result() for future in day_futures]
         
-        # Extract the JSON response from Gemini
-        json_start = response.text.find('```json') + 7
-        json_end = response.text.find('```', json_start)
-        json_str = response.text[json_start:json_end].strip()
+        # Re-optimize only the routes of the changed days
+        route_futures = {}
+        for new_day in new_days:
+            locations = extract_route_locations({"days": [new_day]})
+            if len(locations) >= 2:
+                route_futures[new_day['day']] = route_executor.submit(propagate(optimize_trip_route), locations)
         
-        trip_plan = json.loads(json_str)
+        for new_day in new_days:
+            future = route_futures.get(new_day['day'])
+            if future is None:
+                continue
+            try:
+                optimized_route = future.result(timeout=remaining_time(ROUTE_DEADLINE))
+                if optimized_route:
+                    new_day['optimized_route'] = optimized_route
+            except (FuturesTimeout, requests.RequestException):
+                # The day is still usable without its route
+                pass
         
-        # Optional: Route optimization using Router service
-        try:
-            locations = []
-            for day in trip_plan['days']:
-                for location in day['locations']:
-                    locations.append({
-                        "name": location['name'],
-                        "lat": location['lat'],
-                        "lng": location['lng']
-                    })
+        # Only the changed days' transport is re-costed, the rest of the ledger stands
+        transport_costs = cost_days_transport(new_days, record['preferences']) if 'budget_ledger' in trip_plan else None
+        trip_plan, changes = apply_replanned_days(plan_id, new_days, transport_costs, record['preferences'])
+        
+        return jsonify({
+            "plan_id": plan_id,
+            "changed_days": [change['day'] for change in changes],
+            "diff": changes,
+            "plan": trip_plan
+        }), 200
+    
+    except PlanConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def apply_replanned_days(plan_id, new_days, transport_costs, preferences):
+    """
+    Put regenerated days into the saved plan as it is now, so budget updates and routes
+    written while they were generated are kept. transport_costs may be None when the plan
+    had no budget ledger; they are priced here if one was built meanwhile.
+    Returns (plan, changes).
+    """
+    costs = {"transport": transport_costs}
+    
+    def apply(record):
+        trip_plan = record['plan']
+        changes = []
+        new_days_by_number = {new_day['day']: new_day for new_day in new_days}
+        for i, day in enumerate(trip_plan['days']):
+            if day.get('day') in new_days_by_number:
+                new_day = new_days_by_number[day['day']]
+                changes.append(diff_day(day, new_day))
+                trip_plan['days'][i] = new_day
+        
+        # The trip-wide route still reflects the old days
+        if 'optimized_route' in trip_plan:
+            trip_plan['optimized_route_stale'] = True
+        
+        if 'budget_ledger' in trip_plan:
+            if costs["transport"] is None:
+                costs["transport"] = cost_days_transport(new_days, preferences)
+            ledger = BudgetLedger(trip_plan['budget_ledger'])
+            for new_day in new_days:
+                cost, name, source = costs["transport"][new_day['day']]
+                ledger.set_item(new_day['day'], "transport", {"name": name, "cost": cost, "source": source})
+            trip_plan['budget_ledger'] = ledger.to_dict()
+        return True, changes
+    
+    record, changes = trip_store.modify_plan(plan_id, apply)
+    return record['plan'], changes
+
+def cost_day_transport(day, modes):
+    """
+    (cost, description, source) of a day's travel: the router's cheapest modes between its
+    stops, plus the plan's own transport cost when the day moves to another place
+    """
+    transport = day.get('transport') or {}
+    intercity = 0
+    if transport.get('from') and transport.get('to') and transport['from'] != transport['to']:
+        intercity = int(transport.get('cost') or 0)
+    
+    locations = extract_route_locations({"days": [day]})
+    if len(locations) < 2:
+        return intercity, transport.get('mode', ''), "plan"
+    
+    try:
+        with span("router.legs", locations=len(locations)):
+            legs_response = service_client.post(
+                f"{ROUTER_URL}/legs",
+                json={"locations": locations, "objective": "cost", "modes": modes},
+                headers=trace_headers(),
+                timeout=ROUTE_TIMEOUT
+            )
+        if legs_response.status_code == 200:
+            legs = legs_response.json()
+            modes_used = sorted({leg['mode'] for leg in legs['legs']})
+            return legs['total_cost'] + intercity, ", ".join(modes_used), "router"
+    except requests.RequestException:
+        pass
+    # Without the router, fall back to the plan's estimate for the day
+    return int(transport.get('cost') or 0), transport.get('mode', ''), "plan"
+
+def cost_days_transport(days, preferences):
+    """Transport costs of several days, asked from the router in parallel"""
+    modes = preferences.get('transportation') or None
+    futures = {
+        day['day']: route_executor.submit(propagate(cost_day_transport), day, modes)
+        for day in days
+    }
+    return {number: future.result() for number, future in futures.items()}
+
+def budget_response(plan_id, trip_plan, extra=None):
+    ledger = BudgetLedger(trip_plan['budget_ledger'])
+    response = {
+        "plan_id": plan_id,
+        "ledger": ledger.to_dict(),
+        "totals": ledger.summary(),
+        "plan_total_budget": trip_plan.get('total_budget')
+    }
+    response.update(extra or {})
+    return response
+
+@app.route('/plan/<plan_id>/budget', methods=['GET'])
+def get_plan_budget(plan_id):
+    """
+    Get the budget ledger of a saved plan: transport (from the router's cost model),
+    accommodation and food per day against preferences.budget. Built on first request.
+    """
+    record = trip_store.get(plan_id)
+    if not record:
+        return jsonify({"error": f"No plan found with id {plan_id}"}), 404
+    
+    trip_plan = record['plan']
+    if 'budget_ledger' in trip_plan:
+        return jsonify(budget_response(plan_id, trip_plan)), 200
+    
+    try:
+        plan_budget(record)
+    except InvalidAmount as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        priced = {"days": trip_plan.get('days', [])}
+        priced["costs"] = cost_days_transport(priced["days"], record['preferences'])
+        
+        def build(record):
+            trip_plan = record['plan']
+            # Another request may have built it meanwhile
+            if 'budget_ledger' in trip_plan:
+                return False, None
+            # A replan changed the days since they were priced
+            if trip_plan.get('days', []) != priced["days"]:
+                priced["days"] = trip_plan.get('days', [])
+                priced["costs"] = cost_days_transport(priced["days"], record['preferences'])
+            ledger = BudgetLedger.build(trip_plan, plan_budget(record), priced["costs"])
+            trip_plan['budget_ledger'] = ledger.to_dict()
+            return True, None
+        
+        record, _ = trip_store.modify_plan(plan_id, build)
+        return jsonify(budget_response(plan_id, record['plan'])), 200
+    
+    except PlanConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+def plan_budget(record):
+    """preferences.budget of a stored plan, None when the user gave none"""
+    budget = record['preferences'].get('budget')
+    return parse_amount(budget, "preferences.budget") if budget else None
+
+@app.route('/plan/<plan_id>/budget/items', methods=['POST'])
+def update_budget_item(plan_id):
+    """
+    Set one item of the budget ledger, e.g. the hotel picked for a night; only that day
+    and the trip total are updated
+    Expected input:
+    {
+        "day": 2,
+        "category": "accommodation",  // transport, accommodation or food
+        "item": {"name": "Jaipur Hotel 3", "total_price": 4200, "rating": 4.4},  // Optional, booking answers work as is
+        "alternatives": [...]  // Optional: the other options the booking service returned, used by /budget/repair
+    }
+    """
+    data = request.json
+    day_number = data.get('day')
+    category = data.get('category')
+    
+    if category not in CATEGORIES:
+        return jsonify({"error": f"category must be one of {', '.join(CATEGORIES)}"}), 400
+    if not data.get('item') and not data.get('alternatives'):
+        return jsonify({"error": "Provide an item, alternatives or both"}), 400
+    if data.get('alternatives') is not None and not isinstance(data['alternatives'], list):
+        return jsonify({"error": "alternatives must be a list"}), 400
+    
+    try:
+        new_item = dict(normalize_option(data['item']), source="booking") if data.get('item') else None
+        alternatives = [normalize_option(option) for option in data['alternatives']] if data.get('alternatives') is not None else None
+    except InvalidAmount as e:
+        return jsonify({"error": str(e)}), 400
+    
+    try:
+        def set_item(record):
+            """Returns (changed, (error, status) or the delta)"""
+            trip_plan = record['plan']
+            if 'budget_ledger' not in trip_plan:
+                return False, (f"Plan {plan_id} has no budget yet, GET /plan/{plan_id}/budget first", 409)
             
-            if locations:
-                route_data = {"locations": locations}
-                route_response = requests.post(f"{ROUTER_URL}/optimize", json=route_data)
-                if route_response.status_code == 200:
-                    optimized_route = route_response.json()
-                    trip_plan['optimized_route'] = optimized_route
-        except requests.RequestException:
-            # Continue even if route optimization fails
-            pass
+            ledger = BudgetLedger(trip_plan['budget_ledger'])
+            if str(day_number) not in ledger.to_dict()['days']:
+                return False, (f"Plan {plan_id} has no day {day_number}", 400)
+            
+            current = ledger.day(day_number)['items'][category]
+            item = dict(new_item or current)
+            if alternatives is not None:
+                item['alternatives'] = alternatives
+            delta = ledger.set_item(day_number, category, item)
+            trip_plan['budget_ledger'] = ledger.to_dict()
+            return True, delta
         
-        return jsonify(trip_plan), 200
+        modified = trip_store.modify_plan(plan_id, set_item)
+        if modified is None:
+            return jsonify({"error": f"No plan found with id {plan_id}"}), 404
+        record, result = modified
+        if isinstance(result, tuple):
+            return jsonify({"error": result[0]}), result[1]
+        
+        return jsonify(budget_response(plan_id, record['plan'], {"day": day_number, "delta": result})), 200
     
+    except PlanConflict as e:
+        return jsonify({"error": str(e)}), 409
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+
+@app.route('/plan/<plan_id>/budget/repair', methods=['POST'])
+def repair_budget(plan_id):
+    """
+    Bring over-budget days back within budget by swapping in cheaper alternatives the
+    booking service already returned (posted through /budget/items), without a new plan
+    """
+    try:
+        def repair(record):
+            trip_plan = record['plan']
+            if 'budget_ledger' not in trip_plan:
+                return False, None
+            ledger = BudgetLedger(trip_plan['budget_ledger'])
+            swaps = ledger.repair()
+            trip_plan['budget_ledger'] = ledger.to_dict()
+            return bool(swaps), swaps
+        
+        modified = trip_store.modify_plan(plan_id, repair)
+        if modified is None:
+            return jsonify({"error": f"No plan found with id {plan_id}"}), 404
+        record, swaps = modified
+        if swaps is None:
+            return jsonify({"error": f"Plan {plan_id} has no budget yet, GET /plan/{plan_id}/budget first"}), 409
+        
+        return jsonify(budget_response(plan_id, record['plan'], {"swaps": swaps})), 200
+    
+    except PlanConflict as e:
+        return jsonify({"error": str(e)}), 409
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
 @app.route('/chat', methods=['POST'])
+@chat_replan_admission.admit()
 def chat():
     """
     Handle conversational interactions with the AI
@@ -207,14 +864,17 @@ def chat():
     # Fetch trip context if trip_id is provided
     trip_context = ""
     if trip_id:
-        # In a real implementation, you would fetch trip details from a database
-        trip_context = f"This is regarding trip plan {trip_id}."
+        record = trip_store.get(trip_id)
+        if record:
+            trip_context = f"This is regarding trip plan {trip_id}.\n{summarize_plan(record['plan'])}"
+        else:
+            trip_context = f"This is regarding trip plan {trip_id}."
     
     # Prepare conversation for Gemini
     formatted_history = []
     for msg in conversation_history:
         role = "user" if msg['role'] == 'user' else "model"
-        formatted_history.append(types.Content(role=role, parts=[types.Part.from_text(msg['content'])]))
+        formatted_history.append({"role": role, "parts": [msg['content']]})
     
     # Add travel agent system prompt
     system_prompt = """
@@ -240,17 +900,19 @@ def chat():
     
     try:
         # Generate response using Gemini
-        chat = model.start_chat(history=formatted_history)
-        response = chat.send_message(
-            message,
-            system_instruction=system_prompt,
-            generation_config={
-                "temperature": 0.7,
-                "top_p": 0.95,
-                "top_k": 40,
-                "max_output_tokens": 4096,
-            }
-        )
+        # The system prompt is part of the model in google.generativeai, not of send_message
+        chat = create_model(system_instruction=system_prompt).start_chat(history=formatted_history)
+        with span("llm.send_message", prompt="chat"), track_llm("chat") as llm_call:
+            response = chat.send_message(
+                message,
+                generation_config={
+                    "temperature": 0.7,
+                    "top_p": 0.95,
+                    "top_k": 40,
+                    "max_output_tokens": 4096,
+                }
+            )
+            llm_call.record(response)
         
         response_text = response.text
         
@@ -276,4 +938,5 @@ def chat():
 
 if __name__ == '__main__':
     port = int(os.getenv("PORT", 6001))
-    app.run(host='0.0.0.0', port=port, debug=True)
\ No newline at end of file
+    # Development server with FLASK_DEBUG=1 for the reloader and debugger; use serve.py in production
+    app.run(host='0.0.0.0', port=port, debug=os.getenv("FLASK_DEBUG") == "1")
\ No newline at end of file
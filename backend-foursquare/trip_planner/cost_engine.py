@@ -0,0 +1,198 @@
+"""
+backend/trip_planner/cost_engine.py
+Cost Engine - Per-day budget ledger of a trip plan, kept up to date item by item
+"""
+
+import math
+import os
+
+CATEGORIES = ("transport", "accommodation", "food")
+
+# Used until the booking service's prices for a day are posted, in INR
+DEFAULT_ACCOMMODATION_PER_NIGHT = int(os.getenv("DEFAULT_ACCOMMODATION_PER_NIGHT", 2500))
+DEFAULT_FOOD_PER_DAY = int(os.getenv("DEFAULT_FOOD_PER_DAY", 1200))
+
+
+class InvalidAmount(ValueError):
+    """A cost or budget in a request that isn't a usable amount, answered with 400"""
+
+
+def parse_amount(value, field="cost"):
+    """An amount in INR as a whole number; numbers and numeric strings are accepted"""
+    if isinstance(value, bool) or not isinstance(value, (int, float, str)):
+        raise InvalidAmount(f"{field} must be a number, got {value!r}")
+    try:
+        amount = float(value)
+    except ValueError:
+        raise InvalidAmount(f"{field} must be a number, got {value!r}")
+    if not math.isfinite(amount) or amount < 0:
+        raise InvalidAmount(f"{field} must be a non-negative number, got {value!r}")
+    return round(amount)
+
+
+def normalize_option(option):
+    """
+    An item or alternative as {"name", "cost", "rating"}, from either a plain item or a
+    booking service answer (accommodation total_price / price_per_night, restaurant
+    total_cost / average_cost)
+    """
+    if not isinstance(option, dict):
+        raise InvalidAmount(f"Items and alternatives must be objects, got {option!r}")
+    for key in ("cost", "total_price", "total_cost", "price_per_night", "average_cost"):
+        if option.get(key) is not None:
+            return {"name": option.get("name", ""), "cost": parse_amount(option[key], key), "rating": option.get("rating")}
+    return {"name": option.get("name", ""), "cost": 0, "rating": option.get("rating")}
+
+
+class BudgetLedger:
+    """
+    Budget ledger of a plan, stored on the plan as "budget_ledger":
+    {
+        "budget": 20000,  // preferences.budget, None when the user gave none
+        "day_budget": 4000,  // budget / days
+        "total": 18450,
+        "over_budget": false,
+        "over_budget_days": [3],
+        "days": {
+            "1": {
+                "total": 3650,
+                "items": {
+                    "transport": {"name": "...", "cost": 950, "source": "router", "alternatives": []},
+                    "accommodation": {...},
+                    "food": {...}
+                }
+            }
+        }
+    }
+    Totals are kept up to date by set_item from the difference between the old and new
+    cost, so one changed item never re-sums the whole plan.
+    """
+
+    def __init__(self, data):
+        self.data = data
+
+    @classmethod
+    def build(cls, trip_plan, budget, transport_costs):
+        """
+        Ledger for a plan. transport_costs maps day number -> (cost, name, source); the
+        last day has no accommodation as nobody stays the night.
+        """
+        days = trip_plan.get('days', [])
+        ledger = cls({
+            "budget": budget,
+            "day_budget": round(budget / len(days)) if budget and days else None,
+            "total": 0,
+            "over_budget": False,
+            "over_budget_days": [],
+            "days": {}
+        })
+        for i, day in enumerate(days):
+            number = day.get('day', i + 1)
+            cost, name, source = transport_costs.get(number, (0, "", "estimate"))
+            ledger.set_item(number, "transport", {"name": name, "cost": cost, "source": source})
+            last_night = i == len(days) - 1
+            ledger.set_item(number, "accommodation", {
+                "name": next((location.get('accommodation') for location in day.get('locations', []) if location.get('accommodation')), ""),
+                "cost": 0 if last_night else DEFAULT_ACCOMMODATION_PER_NIGHT,
+                "source": "estimate"
+            })
+            ledger.set_item(number, "food", {
+                "name": ", ".join(location['food'] for location in day.get('locations', []) if location.get('food'))[:200],
+                "cost": DEFAULT_FOOD_PER_DAY,
+                "source": "estimate"
+            })
+        return ledger
+
+    def to_dict(self):
+        return self.data
+
+    def day(self, number):
+        return self.data["days"].setdefault(str(number), {"total": 0, "items": {}})
+
+    def set_item(self, number, category, item):
+        """Replace one item of a day and update the day and trip totals by the difference"""
+        if category not in CATEGORIES:
+            raise ValueError(f"Unknown category {category}, expected one of {', '.join(CATEGORIES)}")
+        day = self.day(number)
+        old = day["items"].get(category)
+        item = dict(item)
+        item["cost"] = parse_amount(item.get("cost") or 0)
+        item.setdefault("alternatives", old.get("alternatives", []) if old else [])
+        delta = item["cost"] - (old["cost"] if old else 0)
+        day["items"][category] = item
+        day["total"] += delta
+        self.data["total"] += delta
+        self.refresh_flags(number)
+        return delta
+
+    def refresh_flags(self, number):
+        """Over-budget state of one day and of the trip"""
+        over_days = set(self.data["over_budget_days"])
+        if self.data["day_budget"] is not None and self.day(number)["total"] > self.data["day_budget"]:
+            over_days.add(int(number))
+        else:
+            over_days.discard(int(number))
+        self.data["over_budget_days"] = sorted(over_days)
+        self.data["over_budget"] = self.data["budget"] is not None and self.data["total"] > self.data["budget"]
+
+    def cheapest_swap(self, number, overage):
+        """
+        The best cheaper alternative on a day: the smallest rating drop among those that
+        cover the overage, else the biggest saving. Returns (category, alternative) or None.
+        """
+        candidates = []
+        for category, item in self.day(number)["items"].items():
+            for alternative in item.get("alternatives", []):
+                saving = item["cost"] - alternative["cost"]
+                if saving <= 0 or alternative["name"] == item.get("name"):
+                    continue
+                rating_drop = (item.get("rating") or 0) - (alternative.get("rating") or 0)
+                candidates.append((saving >= overage, -rating_drop if saving >= overage else saving, category, alternative))
+        if not candidates:
+            return None
+        _, _, category, alternative = max(candidates, key=lambda candidate: candidate[:2])
+        return category, alternative
+
+    def repair(self):
+        """
+        Swap in cheaper alternatives until every day fits its share of the budget, worst
+        day first, then keep saving on any day while the trip is still over budget.
+        Returns the swaps made.
+        """
+        swaps = []
+
+        def swap(number, overage):
+            choice = self.cheapest_swap(number, overage)
+            if choice is None:
+                return False
+            category, alternative = choice
+            old = self.day(number)["items"][category]
+            self.set_item(number, category, dict(alternative, source="swap", alternatives=old["alternatives"]))
+            swaps.append({
+                "day": int(number),
+                "category": category,
+                "from": old.get("name"),
+                "to": alternative["name"],
+                "saving": old["cost"] - alternative["cost"]
+            })
+            return True
+
+        day_budget = self.data["day_budget"]
+        if day_budget is not None:
+            for number in sorted(self.data["over_budget_days"], key=lambda n: -self.day(n)["total"]):
+                while self.day(number)["total"] > day_budget and swap(number, self.day(number)["total"] - day_budget):
+                    pass
+
+        while self.data["over_budget"]:
+            overage = self.data["total"] - self.data["budget"]
+            if not any(swap(number, overage) for number in list(self.data["days"])):
+                break
+        return swaps
+
+    def summary(self):
+        """Totals per category, for responses"""
+        totals = {category: 0 for category in CATEGORIES}
+        for day in self.data["days"].values():
+            for category, item in day["items"].items():
+                totals[category] += item["cost"]
+        return totals
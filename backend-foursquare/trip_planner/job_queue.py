@@ -0,0 +1,317 @@
+"""
+backend/trip_planner/job_queue.py
+Job Queue - Runs long plan generations on a worker pool instead of a request thread
+
+A job moves queued -> running -> complete, or back to queued for a retry and finally to
+failed. Running jobs report a stage and, once they have one, the partial result, so
+clients polling the job see the days as soon as they are generated. Jobs live in a
+JobStore; workers claim them with a lease, so a job whose worker died is picked up again
+when the lease runs out. Every claim gets a new token (claimed_by) and the worker's writes
+only land while the job still carries its token, so a worker that outlived its lease can't
+overwrite the result of the one that re-claimed the job. Another store (e.g. a message
+broker) can take the place of the SQLite one as long as claim() hands each job to one
+worker at a time.
+
+Each record looks like:
+{
+    "job_id": "...",
+    "kind": "plan",
+    "status": "running",  // queued, running, complete, failed
+    "stage": "routing",  // set by the handler
+    "payload": {...},  // The request body
+    "result": {...},  // Partial while running, final when complete
+    "error": null,
+    "attempts": 1,
+    "claimed_by": "...",  // Token of the worker's current claim
+    "version": 4,  // Bumped on every change, for long polling
+    "created_at": 1757500000.0,
+    "updated_at": 1757500003.2
+}
+"""
+
+import json
+import sqlite3
+import threading
+import time
+import uuid
+
+
+class LeaseLost(Exception):
+    """The job was re-claimed by another worker after this one's lease ran out"""
+
+
+class JobStore:
+    def create(self, kind, payload):
+        raise NotImplementedError
+
+    def get(self, job_id):
+        raise NotImplementedError
+
+    def update(self, job_id, claim=None, **fields):
+        """
+        Change fields of a job; with claim, only while the job still carries that claim
+        token. Returns whether the job was updated.
+        """
+        raise NotImplementedError
+
+    def claim(self, kind, lease_seconds):
+        """
+        Take the oldest runnable job of a kind, or None. The job is running and leased to
+        the caller under a new claimed_by token.
+        """
+        raise NotImplementedError
+
+    def count(self, status):
+        raise NotImplementedError
+
+
+class MemoryJobStore(JobStore):
+    """In-process store, for tests and single-process deployments"""
+
+    def __init__(self):
+        self.jobs = {}
+        self.lock = threading.Lock()
+
+    def create(self, kind, payload):
+        now = time.time()
+        job = {
+            "job_id": str(uuid.uuid4()), "kind": kind, "status": "queued", "stage": None,
+            "payload": payload, "result": None, "error": None, "attempts": 0, "version": 0,
+            "run_after": now, "lease_until": None, "created_at": now, "updated_at": now, "claimed_by": None
+        }
+        with self.lock:
+            self.jobs[job["job_id"]] = job
+            return json.loads(json.dumps(job))
+
+    def get(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            return json.loads(json.dumps(job)) if job else None
+
+    def update(self, job_id, claim=None, **fields):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None or (claim is not None and job["claimed_by"] != claim):
+                return False
+            job.update(json.loads(json.dumps(fields)))
+            job["version"] += 1
+            job["updated_at"] = time.time()
+            return True
+
+    def claim(self, kind, lease_seconds):
+        now = time.time()
+        with self.lock:
+            runnable = [
+                job for job in self.jobs.values()
+                if job["kind"] == kind and (
+                    (job["status"] == "queued" and job["run_after"] <= now)
+                    or (job["status"] == "running" and job["lease_until"] < now)
+                )
+            ]
+            if not runnable:
+                return None
+            job = min(runnable, key=lambda job: job["created_at"])
+            job.update(
+                status="running", lease_until=now + lease_seconds, claimed_by=str(uuid.uuid4()),
+                attempts=job["attempts"] + 1, updated_at=now
+            )
+            job["version"] += 1
+            return json.loads(json.dumps(job))
+
+    def count(self, status):
+        with self.lock:
+            return sum(1 for job in self.jobs.values() if job["status"] == status)
+
+
+class SQLiteJobStore(JobStore):
+    """SQLite backed store, shared by every worker process using the same file"""
+
+    COLUMNS = ("job_id", "kind", "status", "stage", "payload", "result", "error", "attempts", "version",
+               "run_after", "lease_until", "created_at", "updated_at", "claimed_by")
+    JSON_COLUMNS = ("payload", "result")
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS jobs (
+                    job_id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    status TEXT NOT NULL,
+                    stage TEXT,
+                    payload TEXT,
+                    result TEXT,
+                    error TEXT,
+                    attempts INTEGER NOT NULL,
+                    version INTEGER NOT NULL,
+                    run_after REAL NOT NULL,
+                    lease_until REAL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    claimed_by TEXT
+                )
+            """)
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+            conn.execute("CREATE INDEX IF NOT EXISTS jobs_kind_status ON jobs (kind, status, created_at)")
+
+    def _connect(self):
+        # A connection per call keeps the store safe to use from Flask worker threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def _row(self, row):
+        if not row:
+            return None
+        job = dict(zip(self.COLUMNS, row))
+        for column in self.JSON_COLUMNS:
+            job[column] = json.loads(job[column]) if job[column] else None
+        return job
+
+    def create(self, kind, payload):
+        now = time.time()
+        job_id = str(uuid.uuid4())
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs VALUES (?, ?, 'queued', NULL, ?, NULL, NULL, 0, 0, ?, NULL, ?, ?, NULL)",
+                (job_id, kind, json.dumps(payload), now, now, now)
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        with self._connect() as conn:
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE job_id = ?", (job_id,)).fetchone()
+        return self._row(row)
+
+    def update(self, job_id, claim=None, **fields):
+        fields = {key: json.dumps(value) if key in self.JSON_COLUMNS else value for key, value in fields.items()}
+        assignments = ", ".join(f"{key} = ?" for key in fields)
+        condition, params = "job_id = ?", [job_id]
+        if claim is not None:
+            # Checked in the same statement, so a re-claim can't slip in between
+            condition += " AND claimed_by = ?"
+            params.append(claim)
+        with self._connect() as conn:
+            cursor = conn.execute(
+                f"UPDATE jobs SET {assignments}, version = version + 1, updated_at = ? WHERE {condition}",
+                (*fields.values(), time.time(), *params)
+            )
+            return cursor.rowcount > 0
+
+    def claim(self, kind, lease_seconds):
+        now = time.time()
+        token = str(uuid.uuid4())
+        with self._connect() as conn:
+            # One statement, so two workers can never claim the same job; the token finds
+            # the claimed row again
+            conn.execute(
+                "UPDATE jobs SET status = 'running', lease_until = ?, claimed_by = ?, attempts = attempts + 1, "
+                "version = version + 1, updated_at = ? WHERE job_id = ("
+                "SELECT job_id FROM jobs WHERE kind = ? AND ((status = 'queued' AND run_after <= ?) "
+                "OR (status = 'running' AND lease_until < ?)) ORDER BY created_at LIMIT 1)",
+                (now + lease_seconds, token, now, kind, now, now)
+            )
+            row = conn.execute(f"SELECT {', '.join(self.COLUMNS)} FROM jobs WHERE claimed_by = ?", (token,)).fetchone()
+        return self._row(row)
+
+    def count(self, status):
+        with self._connect() as conn:
+            return conn.execute("SELECT COUNT(*) FROM jobs WHERE status = ?", (status,)).fetchone()[0]
+
+
+def create_job_store(url):
+    """
+    Create a job store from a URL, like create_trip_store:
+    - sqlite:///jobs.db  (relative path) or sqlite:////var/data/jobs.db (absolute path)
+    - memory://
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteJobStore(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        return MemoryJobStore()
+    raise ValueError(f"Unsupported job store URL: {url}")
+
+
+class JobContext:
+    """What a handler gets to report progress with"""
+
+    def __init__(self, store, job):
+        self.store = store
+        self.job = job
+
+    def progress(self, stage, result=None):
+        """Report a stage; raises LeaseLost once another worker has re-claimed the job"""
+        fields = {"stage": stage}
+        if result is not None:
+            fields["result"] = result
+        if not self.store.update(self.job["job_id"], claim=self.job["claimed_by"], **fields):
+            raise LeaseLost(f"{self.job['kind']} job {self.job['job_id']} was claimed by another worker")
+
+
+class JobQueue:
+    """
+    Worker threads running handler(payload, context) for the jobs of one kind. A handler
+    that raises is retried with exponential backoff until max_attempts, then the job fails.
+    """
+
+    def __init__(self, store, kind, handler, workers=2, max_attempts=3, lease_seconds=600, poll_interval=1.0):
+        self.store = store
+        self.kind = kind
+        self.handler = handler
+        self.max_attempts = max_attempts
+        self.lease_seconds = lease_seconds
+        self.poll_interval = poll_interval
+        self.wakeup = threading.Event()
+        for i in range(workers):
+            threading.Thread(target=self.run, name=f"{kind}-job-{i}", daemon=True).start()
+
+    def submit(self, payload):
+        job = self.store.create(self.kind, payload)
+        self.wakeup.set()
+        return job
+
+    def run(self):
+        while True:
+            try:
+                job = self.store.claim(self.kind, self.lease_seconds)
+            except sqlite3.Error as e:
+                print(f"Claiming a {self.kind} job failed: {str(e)}")
+                job = None
+            if job is None:
+                # Jobs submitted by other processes are found by polling
+                self.wakeup.wait(self.poll_interval)
+                self.wakeup.clear()
+                continue
+            self.execute(job)
+
+    def execute(self, job):
+        claim = job["claimed_by"]
+        try:
+            result = self.handler(job["payload"], JobContext(self.store, job))
+            updated = self.store.update(
+                job["job_id"], claim=claim, status="complete", stage="complete", result=result, error=None, lease_until=None
+            )
+        except LeaseLost:
+            updated = False
+        except Exception as e:
+            print(f"{self.kind} job {job['job_id']} attempt {job['attempts']} failed: {str(e)}")
+            if job["attempts"] < self.max_attempts:
+                # Back off 2s, 4s, 8s... before the next worker picks it up
+                updated = self.store.update(
+                    job["job_id"], claim=claim, status="queued", stage="retrying", error=str(e),
+                    run_after=time.time() + 2 ** job["attempts"], lease_until=None
+                )
+            else:
+                updated = self.store.update(
+                    job["job_id"], claim=claim, status="failed", stage="failed", error=str(e), lease_until=None
+                )
+        if not updated:
+            # The lease ran out and the job belongs to another worker now, which writes its outcome
+            print(f"{self.kind} job {job['job_id']} attempt {job['attempts']} lost its lease, result dropped")
+
+    def wait_for_change(self, job_id, version, timeout):
+        """The job once its version differs from `version`, or as it is after timeout seconds"""
+        deadline = time.monotonic() + timeout
+        job = self.store.get(job_id)
+        while job is not None and job["version"] == version and time.monotonic() < deadline:
+            time.sleep(0.2)
+            job = self.store.get(job_id)
+        return job
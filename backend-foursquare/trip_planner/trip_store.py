@@ -0,0 +1,197 @@
+"""
+backend/trip_planner/trip_store.py
+Trip Store - Persists trip plans by plan id
+"""
+
+import json
+import random
+import sqlite3
+import threading
+import time
+
+
+class PlanConflict(Exception):
+    """A plan kept being changed by other writers during modify_plan"""
+
+
+class TripStore:
+    """
+    Storage interface for trip plans. Each record looks like:
+    {
+        "plan_id": "...",
+        "user_id": "user123",
+        "query": "Plan a 5-day Kerala trip...",
+        "preferences": {...},
+        "plan": {...},  // The itinerary returned by /plan
+        "version": 3,  // Bumped on every update_plan, for compare-and-set
+        "created_at": 1757500000.0,
+        "updated_at": 1757500000.0
+    }
+    """
+
+    def save(self, plan_id, plan, query="", preferences=None, user_id=None):
+        raise NotImplementedError
+
+    def get(self, plan_id):
+        raise NotImplementedError
+
+    def update_plan(self, plan_id, plan, expected_version=None):
+        """
+        Replace a plan. With expected_version the write only happens while the stored
+        version still matches; returns whether the plan was written.
+        """
+        raise NotImplementedError
+
+    def modify_plan(self, plan_id, change, attempts=8):
+        """
+        Read-modify-write of a plan that is safe across threads and worker processes.
+        change(record) edits record["plan"] in place and returns (changed, result). When
+        another writer got in first it is called again on a fresh record, so it must not
+        carry over anything from an earlier attempt's record. Returns (record, result),
+        or None when there is no such plan.
+        """
+        for attempt in range(attempts):
+            record = self.get(plan_id)
+            if record is None:
+                return None
+            changed, result = change(record)
+            if not changed or self.update_plan(plan_id, record["plan"], expected_version=record["version"]):
+                return record, result
+            # Back off a little so writers racing on the same plan spread out
+            time.sleep(random.uniform(0, 0.01 * 2 ** attempt))
+        raise PlanConflict(f"Plan {plan_id} kept changing, please try again")
+
+
+class MemoryTripStore(TripStore):
+    """In-process store, useful for tests and single-process deployments"""
+
+    def __init__(self):
+        self.records = {}
+        self.lock = threading.Lock()
+
+    def save(self, plan_id, plan, query="", preferences=None, user_id=None):
+        now = time.time()
+        with self.lock:
+            self.records[plan_id] = {
+                "plan_id": plan_id,
+                "user_id": user_id,
+                "query": query,
+                "preferences": preferences or {},
+                "plan": json.loads(json.dumps(plan)),
+                "version": 0,
+                "created_at": now,
+                "updated_at": now
+            }
+
+    def get(self, plan_id):
+        with self.lock:
+            record = self.records.get(plan_id)
+            return json.loads(json.dumps(record)) if record else None
+
+    def update_plan(self, plan_id, plan, expected_version=None):
+        with self.lock:
+            record = self.records.get(plan_id)
+            if record is None or (expected_version is not None and record["version"] != expected_version):
+                return False
+            record["plan"] = json.loads(json.dumps(plan))
+            record["version"] += 1
+            record["updated_at"] = time.time()
+            return True
+
+
+class SQLiteTripStore(TripStore):
+    """SQLite backed store, the default for local deployments"""
+
+    def __init__(self, path):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS trips (
+                    plan_id TEXT PRIMARY KEY,
+                    user_id TEXT,
+                    query TEXT,
+                    preferences TEXT,
+                    plan TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    updated_at REAL NOT NULL,
+                    version INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            # Databases created before plans were versioned
+            columns = [row[1] for row in conn.execute("PRAGMA table_info(trips)")]
+            if "version" not in columns:
+                conn.execute("ALTER TABLE trips ADD COLUMN version INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        # A connection per call keeps the store safe to use from Flask worker threads
+        return sqlite3.connect(self.path, timeout=10)
+
+    def save(self, plan_id, plan, query="", preferences=None, user_id=None):
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO trips (plan_id, user_id, query, preferences, plan, created_at, updated_at, version) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, 0)",
+                (plan_id, user_id, query, json.dumps(preferences or {}), json.dumps(plan), now, now)
+            )
+
+    def get(self, plan_id):
+        with self._connect() as conn:
+            row = conn.execute(
+                "SELECT plan_id, user_id, query, preferences, plan, created_at, updated_at, version "
+                "FROM trips WHERE plan_id = ?",
+                (plan_id,)
+            ).fetchone()
+
+        if not row:
+            return None
+
+        return {
+            "plan_id": row[0],
+            "user_id": row[1],
+            "query": row[2],
+            "preferences": json.loads(row[3]) if row[3] else {},
+            "plan": json.loads(row[4]),
+            "version": row[7],
+            "created_at": row[5],
+            "updated_at": row[6]
+        }
+
+    def update_plan(self, plan_id, plan, expected_version=None):
+        conn = self._connect()
+        conn.isolation_level = None  # Transactions are opened explicitly below
+        try:
+            # Take the write lock up front, so the version check and the write can't
+            # interleave with another process's
+            conn.execute("BEGIN IMMEDIATE")
+            if expected_version is None:
+                cursor = conn.execute(
+                    "UPDATE trips SET plan = ?, updated_at = ?, version = version + 1 WHERE plan_id = ?",
+                    (json.dumps(plan), time.time(), plan_id)
+                )
+            else:
+                cursor = conn.execute(
+                    "UPDATE trips SET plan = ?, updated_at = ?, version = version + 1 WHERE plan_id = ? AND version = ?",
+                    (json.dumps(plan), time.time(), plan_id, expected_version)
+                )
+            conn.execute("COMMIT")
+            return cursor.rowcount > 0
+        except Exception:
+            if conn.in_transaction:
+                conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+
+def create_trip_store(url):
+    """
+    Create a trip store from a URL:
+    - sqlite:///trips.db  (relative path) or sqlite:////var/data/trips.db (absolute path)
+    - memory://
+    """
+    if url.startswith("sqlite:///"):
+        return SQLiteTripStore(url[len("sqlite:///"):])
+    if url.startswith("memory://"):
+        return MemoryTripStore()
+    raise ValueError(f"Unsupported TRIP_STORE_URL: {url}")